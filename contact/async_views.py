@@ -0,0 +1,62 @@
+import logging
+
+from rest_framework.response import Response
+
+from mailer.dispatcher import adeliver
+from payments.async_api import AsyncAPIView
+
+from .views import (
+    ADMIN_EMAIL,
+    SENDGRID_API_KEY,
+    VERIFIED_SENDER_EMAIL,
+    ContactFormMixin,
+    build_contact_mail,
+)
+
+logger = logging.getLogger(__name__)
+
+
+class AsyncContactFormAPIView(ContactFormMixin, AsyncAPIView):
+    """
+    ASGI variant of ContactFormAPIView
+    """
+
+    async def post(self, request):
+        """Handle contact form submission"""
+        try:
+            error, email_data = self.prepare_submission(request.data, request.META.get('REMOTE_ADDR'))
+            if error:
+                return self.error_response(error)
+
+            if not SENDGRID_API_KEY:
+                logger.error("SendGrid API key not configured - email cannot be sent")
+                return self.success_response(
+                    "Thank you for your message. We'll get back to you soon!"
+                )
+
+            try:
+                await adeliver(build_contact_mail(email_data), category="contact")
+                logger.info(f"Contact email queued for {email_data['full_name']} <{email_data['reply_to_email']}>")
+            except Exception as e:
+                logger.error(f"Failed to queue contact email: {str(e)}")
+
+            return self.success_response(
+                "Thank you for reaching out! We've received your message and will respond within 24 hours."
+            )
+
+        except Exception as e:
+            logger.error(f"Unexpected error in contact form: {str(e)}")
+            return self.error_response(
+                "We're experiencing technical difficulties. Please try again later or contact us directly."
+            )
+
+    async def get(self, request):
+        """Health check and configuration status"""
+        return Response({
+            "status": "healthy",
+            "service": "Contact Form API",
+            "sendgrid_configured": bool(SENDGRID_API_KEY),
+            "admin_email": ADMIN_EMAIL,
+            "sender_email": VERIFIED_SENDER_EMAIL,
+            "version": "2.0"
+        })
@@ -1,6 +1,8 @@
 from django.urls import path
 from .views import ContactFormAPIView
+from .async_views import AsyncContactFormAPIView
 
 urlpatterns = [
     path('contact/', ContactFormAPIView.as_view(), name='contact-form'),
+    path('async/contact/', AsyncContactFormAPIView.as_view(), name='async-contact-form'),
 ]
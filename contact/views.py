@@ -2,7 +2,6 @@ import logging
 from datetime import datetime
 import pytz
 from threading import Thread
-from concurrent.futures import ThreadPoolExecutor
 import html
 import re
 
@@ -10,12 +9,14 @@ from rest_framework.views import APIView
 from rest_framework.response import Response
 from rest_framework import status
 from rest_framework.permissions import AllowAny
-from sendgrid import SendGridAPIClient
 from sendgrid.helpers.mail import Mail
 from django.conf import settings
 from django.core.validators import validate_email
 from django.core.exceptions import ValidationError
 
+from mailer.dispatcher import deliver
+from mailer.rendering import load_templates
+
 # Set up logging
 logger = logging.getLogger(__name__)
 
@@ -23,33 +24,34 @@ logger = logging.getLogger(__name__)
 SENDGRID_API_KEY = getattr(settings, 'SENDGRID_API_KEY', None)
 ADMIN_EMAIL = getattr(settings, 'ADMIN_EMAIL', 'admin@advolcano.io')
 VERIFIED_SENDER_EMAIL = getattr(settings, 'VERIFIED_SENDER_EMAIL', 'noreply@advolcano.io')
-MAX_EMAIL_WORKERS = getattr(settings, 'MAX_EMAIL_WORKERS', 3)
 
-# Global thread pool for async email sending
-email_executor = ThreadPoolExecutor(max_workers=MAX_EMAIL_WORKERS, thread_name_prefix="contact_email")
+# Admin enquiry email, compiled once per worker
+CONTACT_ENQUIRY_HTML, = load_templates(__file__, 'contact_enquiry.html')
+NO_MESSAGE_HTML = '<span style="color: #a0aec0; font-style: italic;">No message provided</span>'
+
+def build_contact_mail(email_data):
+    # Create email with professional template
+    mail = Mail(
+        from_email=VERIFIED_SENDER_EMAIL,
+        to_emails=ADMIN_EMAIL,
+        subject=f"Contact Enquiry from {email_data['full_name']}",
+        html_content=email_data['html_content']
+    )
+
+    # Add reply-to header
+    mail.reply_to = email_data['reply_to_email']
+    return mail
 
 def send_contact_email_async(email_data):
-    """Send contact form email in background thread"""
+    """Queue contact form email on the shared mail dispatcher"""
     try:
         if not SENDGRID_API_KEY:
             logger.error("SendGrid API key is not configured")
             return False
         
-        # Create email with professional template
-        mail = Mail(
-            from_email=VERIFIED_SENDER_EMAIL,
-            to_emails=ADMIN_EMAIL,
-            subject=f"Contact Enquiry from {email_data['full_name']}",
-            html_content=email_data['html_content']
-        )
-        
-        # Add reply-to header
-        mail.reply_to = email_data['reply_to_email']
+        response = deliver(build_contact_mail(email_data), category="contact")
         
-        sg = SendGridAPIClient(SENDGRID_API_KEY)
-        response = sg.send(mail)
-        
-        logger.info(f"Contact email sent successfully. Status: {response.status_code}")
+        logger.info(f"Contact email queued successfully. Status: {response.status_code}")
         logger.info(f"Contact from: {email_data['full_name']} <{email_data['reply_to_email']}>")
         
         return True
@@ -79,272 +81,100 @@ def create_simple_professional_template(data, timestamp):
     
     full_name = f"{first_name} {last_name}".strip()
     
+    if not message.strip():
+        message = NO_MESSAGE_HTML
+
     # Professional email template matching your exact structure
-    html_content = f"""<!DOCTYPE html>
-<html lang="en">
-<head>
-    <meta charset="UTF-8">
-    <meta name="viewport" content="width=device-width, initial-scale=1.0">
-    <title>Contact Enquiry</title>
-</head>
-<body style="margin: 0; padding: 0; font-family: -apple-system, BlinkMacSystemFont, 'Segoe UI', Roboto, Arial, sans-serif; line-height: 1.5; color: #333333; background-color: #f5f5f5;">
-    <table cellpadding="0" cellspacing="0" border="0" width="100%" style="background-color: #f5f5f5; margin: 0; padding: 20px 0;">
-        <tr>
-            <td align="center" valign="top">
-                <!-- Main Container -->
-                <table cellpadding="0" cellspacing="0" border="0" width="600" style="max-width: 600px; background-color: #ffffff; border: 1px solid #e0e0e0; border-radius: 8px; overflow: hidden;">
-                    
-                    <!-- Header -->
-                    <tr>
-                        <td style="background-color: #ffffff; padding: 30px 30px 20px 30px; text-align: center;">
-                            <h1 style="margin: 0; font-size: 24px; font-weight: 600; color: #4a5568; font-family: -apple-system, BlinkMacSystemFont, 'Segoe UI', Roboto, Arial, sans-serif;">
-                                Contact Enquiry
-                            </h1>
-                        </td>
-                    </tr>
-                    
-                    <!-- Content -->
-                    <tr>
-                        <td style="padding: 0 30px 30px 30px;">
-                            
-                            <!-- Greeting -->
-                            <div style="margin-bottom: 25px; font-size: 15px; color: #718096; line-height: 1.5;">
-                                Hello Team,
-                            </div>
-                            
-                            <div style="margin-bottom: 30px; font-size: 15px; color: #718096; line-height: 1.5;">
-                                You have received a new enquiry from website.
-                            </div>
-                            
-                            <!-- Contact Information Table -->
-                            <table cellpadding="0" cellspacing="0" border="0" width="100%" style="background-color: #f7fafc; border: 1px solid #e2e8f0; border-radius: 6px; margin: 25px 0;">
-                                <tr>
-                                    <td style="padding: 25px;">
-                                        
-                                        <!-- Name Row -->
-                                        <table cellpadding="0" cellspacing="0" border="0" width="100%" style="margin-bottom: 15px;">
-                                            <tr>
-                                                <td width="100" style="font-weight: 600; color: #4a5568; padding-right: 15px; vertical-align: top; font-size: 14px;">
-                                                    Name:
-                                                </td>
-                                                <td style="color: #2d3748; font-size: 14px;">
-                                                    {full_name}
-                                                </td>
-                                            </tr>
-                                        </table>
-                                        
-                                        <!-- Email Row -->
-                                        <table cellpadding="0" cellspacing="0" border="0" width="100%" style="margin-bottom: 15px;">
-                                            <tr>
-                                                <td width="100" style="font-weight: 600; color: #4a5568; padding-right: 15px; vertical-align: top; font-size: 14px;">
-                                                    Email:
-                                                </td>
-                                                <td style="color: #2d3748; font-size: 14px;">
-                                                    <a href="mailto:{email}" style="color: #3182ce; text-decoration: none;">
-                                                        {email}
-                                                    </a>
-                                                </td>
-                                            </tr>
-                                        </table>
-                                        
-                                        <!-- Company Row -->
-                                        <table cellpadding="0" cellspacing="0" border="0" width="100%" style="margin-bottom: 15px;">
-                                            <tr>
-                                                <td width="100" style="font-weight: 600; color: #4a5568; padding-right: 15px; vertical-align: top; font-size: 14px;">
-                                                    Company:
-                                                </td>
-                                                <td style="color: #2d3748; font-size: 14px;">
-                                                    {company}
-                                                </td>
-                                            </tr>
-                                        </table>
-                                        
-                                        <!-- Subject Row -->
-                                        <table cellpadding="0" cellspacing="0" border="0" width="100%" style="margin-bottom: 15px;">
-                                            <tr>
-                                                <td width="100" style="font-weight: 600; color: #4a5568; padding-right: 15px; vertical-align: top; font-size: 14px;">
-                                                    Subject:
-                                                </td>
-                                                <td style="color: #2d3748; font-size: 14px;">
-                                                    {subject}
-                                                </td>
-                                            </tr>
-                                        </table>
-                                        
-                                        <!-- Phone Row -->
-                                        <table cellpadding="0" cellspacing="0" border="0" width="100%">
-                                            <tr>
-                                                <td width="100" style="font-weight: 600; color: #4a5568; padding-right: 15px; vertical-align: top; font-size: 14px;">
-                                                    Phone:
-                                                </td>
-                                                <td style="color: #2d3748; font-size: 14px;">
-                                                    {phone}
-                                                </td>
-                                            </tr>
-                                        </table>
-                                        
-                                    </td>
-                                </tr>
-                            </table>
-                            
-                            <!-- Message Section -->
-                            <div style="margin: 30px 0 0 0;">
-                                <div style="font-weight: 600; color: #4a5568; margin-bottom: 15px; font-size: 14px;">
-                                    Message:
-                                </div>
-                                <div style="background-color: #f7fafc; border: 1px solid #e2e8f0; border-radius: 6px; padding: 20px; color: #2d3748; line-height: 1.6; min-height: 60px; font-size: 14px;">
-                                    {message if message.strip() else '<span style="color: #a0aec0; font-style: italic;">No message provided</span>'}
-                                </div>
-                            </div>
-                            
-                        </td>
-                    </tr>
-                    
-                    <!-- Footer -->
-                    <tr>
-                        <td style="background-color: #f7fafc; padding: 20px 30px; border-top: 1px solid #e2e8f0; font-size: 13px; color: #718096;">
-                            
-                            <div style="margin-bottom: 8px;">
-                                <strong>Submitted:</strong> {timestamp}
-                            </div>
-                            <div style="margin-bottom: 8px;">
-                                <strong>Source:</strong> Website Contact Form
-                            </div>
-                            <div>
-                                <strong>Reply to:</strong> 
-                                <a href="mailto:{email}" style="color: #3182ce; text-decoration: none;">
-                                    {email}
-                                </a>
-                            </div>
-                            
-                        </td>
-                    </tr>
-                    
-                </table>
-            </td>
-        </tr>
-    </table>
-</body>
-</html>"""
+    html_content = CONTACT_ENQUIRY_HTML.render({
+        'full_name': full_name,
+        'email': email,
+        'company': company,
+        'subject': subject,
+        'phone': phone,
+        'message': message,
+        'timestamp': timestamp,
+    })
     
     return html_content
 
-class ContactFormAPIView(APIView):
+class ContactFormMixin:
     """
-    Professional contact form API endpoint with async email sending
+    Validation, spam checks and response helpers shared by the sync and async
+    contact form views
     """
-    permission_classes = [AllowAny]
-    
-    def post(self, request):
-        """Handle contact form submission"""
+
+    def prepare_submission(self, data, remote_addr=None):
+        """
+        Validate a contact form submission and render the admin email.
+        Returns ``(error, email_data)``; exactly one of them is set.
+        """
+        # Extract and validate required fields
+        first_name = data.get('first_name', '').strip()
+        last_name = data.get('last_name', '').strip()
+        email = data.get('email', '').strip()
+        subject = data.get('subject', '').strip()
+        message = data.get('message', '').strip()
+        
+        # Optional fields
+        company = data.get('company', '').strip()
+        phone = data.get('phone', '').strip()
+        
+        # Validate required fields
+        if not all([first_name, last_name, email, subject]):
+            logger.warning(f"Contact form validation failed - missing required fields from {remote_addr}")
+            return "Please fill in all required fields: First Name, Last Name, Email, and Subject.", None
+        
+        # Validate email format
         try:
-            data = request.data
-            
-            # Extract and validate required fields
-            first_name = data.get('first_name', '').strip()
-            last_name = data.get('last_name', '').strip()
-            email = data.get('email', '').strip()
-            subject = data.get('subject', '').strip()
-            message = data.get('message', '').strip()
-            
-            # Optional fields
-            company = data.get('company', '').strip()
-            phone = data.get('phone', '').strip()
-            
-            # Validate required fields
-            if not all([first_name, last_name, email, subject]):
-                logger.warning(f"Contact form validation failed - missing required fields from {request.META.get('REMOTE_ADDR')}")
-                return self.error_response(
-                    "Please fill in all required fields: First Name, Last Name, Email, and Subject."
-                )
-            
-            # Validate email format
-            try:
-                validate_email(email)
-            except ValidationError:
-                logger.warning(f"Invalid email format attempted: {email}")
-                return self.error_response("Please provide a valid email address.")
-            
-            # Additional email validation
-            if len(email) > 254:
-                return self.error_response("Email address is too long.")
-            
-            # Validate name lengths
-            if len(first_name) > 50 or len(last_name) > 50:
-                return self.error_response("Names must be less than 50 characters.")
-            
-            # Validate subject and message lengths
-            if len(subject) > 200:
-                return self.error_response("Subject must be less than 200 characters.")
-                
-            if len(message) > 2000:
-                return self.error_response("Message must be less than 2000 characters.")
-            
-            # Validate phone number if provided
-            if phone and len(phone) > 20:
-                return self.error_response("Phone number must be less than 20 characters.")
-            
-            # Basic spam protection - check for suspicious patterns
-            if self.is_spam_content(first_name, last_name, email, message):
-                logger.warning(f"Potential spam detected from {email}")
-                return self.error_response("Your message appears to contain spam content. Please revise and try again.")
-            
-            # Log the contact form submission
-            full_name = f"{first_name} {last_name}"
-            logger.info(f"Contact form submitted by {full_name} <{email}> - Subject: {subject}")
-            
-            # Generate timestamp with timezone
-            timestamp = self.get_formatted_timestamp()
-            
-            # Create professional email template
-            html_content = create_simple_professional_template(data, timestamp)
-            
-            # Prepare email data
-            email_data = {
-                'full_name': full_name,
-                'reply_to_email': email,
-                'subject': subject,
-                'html_content': html_content
-            }
-            
-            # Check SendGrid configuration
-            if not SENDGRID_API_KEY:
-                logger.error("SendGrid API key not configured - email cannot be sent")
-                return self.success_response(
-                    "Thank you for your message. We'll get back to you soon!"
-                )
-            
-            # Send email asynchronously
-            try:
-                email_executor.submit(send_contact_email_async, email_data)
-                logger.info(f"Contact email queued for {full_name} <{email}>")
-            except Exception as e:
-                logger.error(f"Failed to queue contact email: {str(e)}")
-                # Don't fail the request if email queueing fails
-            
-            # Return immediate success response
-            return self.success_response(
-                "Thank you for reaching out! We've received your message and will respond within 24 hours."
-            )
+            validate_email(email)
+        except ValidationError:
+            logger.warning(f"Invalid email format attempted: {email}")
+            return "Please provide a valid email address.", None
+        
+        # Additional email validation
+        if len(email) > 254:
+            return "Email address is too long.", None
+        
+        # Validate name lengths
+        if len(first_name) > 50 or len(last_name) > 50:
+            return "Names must be less than 50 characters.", None
+        
+        # Validate subject and message lengths
+        if len(subject) > 200:
+            return "Subject must be less than 200 characters.", None
             
-        except Exception as e:
-            logger.error(f"Unexpected error in contact form: {str(e)}")
-            logger.error(f"Request data: {request.data}")
-            return self.error_response(
-                "We're experiencing technical difficulties. Please try again later or contact us directly."
-            )
-    
-    def get(self, request):
-        """Health check and configuration status"""
-        return Response({
-            "status": "healthy",
-            "service": "Contact Form API",
-            "sendgrid_configured": bool(SENDGRID_API_KEY),
-            "admin_email": ADMIN_EMAIL,
-            "sender_email": VERIFIED_SENDER_EMAIL,
-            "version": "2.0"
-        })
-    
+        if len(message) > 2000:
+            return "Message must be less than 2000 characters.", None
+        
+        # Validate phone number if provided
+        if phone and len(phone) > 20:
+            return "Phone number must be less than 20 characters.", None
+        
+        # Basic spam protection - check for suspicious patterns
+        if self.is_spam_content(first_name, last_name, email, message):
+            logger.warning(f"Potential spam detected from {email}")
+            return "Your message appears to contain spam content. Please revise and try again.", None
+        
+        # Log the contact form submission
+        full_name = f"{first_name} {last_name}"
+        logger.info(f"Contact form submitted by {full_name} <{email}> - Subject: {subject}")
+        
+        # Generate timestamp with timezone
+        timestamp = self.get_formatted_timestamp()
+        
+        # Create professional email template
+        html_content = create_simple_professional_template(data, timestamp)
+        
+        # Prepare email data
+        email_data = {
+            'full_name': full_name,
+            'reply_to_email': email,
+            'subject': subject,
+            'html_content': html_content
+        }
+
+        return None, email_data
+
     def is_spam_content(self, first_name, last_name, email, message):
         """Basic spam detection"""
         # Check for suspicious patterns
@@ -387,6 +217,58 @@ class ContactFormAPIView(APIView):
             now = datetime.utcnow()
             return now.strftime("%B %d, %Y at %I:%M %p UTC")
 
+
+class ContactFormAPIView(ContactFormMixin, APIView):
+    """
+    Professional contact form API endpoint with async email sending
+    """
+    permission_classes = [AllowAny]
+    
+    def post(self, request):
+        """Handle contact form submission"""
+        try:
+            error, email_data = self.prepare_submission(request.data, request.META.get('REMOTE_ADDR'))
+            if error:
+                return self.error_response(error)
+
+            # Check SendGrid configuration
+            if not SENDGRID_API_KEY:
+                logger.error("SendGrid API key not configured - email cannot be sent")
+                return self.success_response(
+                    "Thank you for your message. We'll get back to you soon!"
+                )
+            
+            # Send email asynchronously (via the shared mail dispatcher)
+            try:
+                send_contact_email_async(email_data)
+                logger.info(f"Contact email queued for {email_data['full_name']} <{email_data['reply_to_email']}>")
+            except Exception as e:
+                logger.error(f"Failed to queue contact email: {str(e)}")
+                # Don't fail the request if email queueing fails
+            
+            # Return immediate success response
+            return self.success_response(
+                "Thank you for reaching out! We've received your message and will respond within 24 hours."
+            )
+            
+        except Exception as e:
+            logger.error(f"Unexpected error in contact form: {str(e)}")
+            logger.error(f"Request data: {request.data}")
+            return self.error_response(
+                "We're experiencing technical difficulties. Please try again later or contact us directly."
+            )
+    
+    def get(self, request):
+        """Health check and configuration status"""
+        return Response({
+            "status": "healthy",
+            "service": "Contact Form API",
+            "sendgrid_configured": bool(SENDGRID_API_KEY),
+            "admin_email": ADMIN_EMAIL,
+            "sender_email": VERIFIED_SENDER_EMAIL,
+            "version": "2.0"
+        })
+
 # Test function for SendGrid configuration
 def test_contact_email():
     """Test function to verify contact email setup"""
@@ -510,8 +392,7 @@ def send_auto_reply_email(user_email, user_name):
             html_content=auto_reply_content
         )
         
-        sg = SendGridAPIClient(SENDGRID_API_KEY)
-        response = sg.send(mail)
+        response = deliver(mail, category="contact_auto_reply")
         
         logger.info(f"Auto-reply sent to {user_email}")
         return True
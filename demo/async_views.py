@@ -0,0 +1,40 @@
+import logging
+
+from rest_framework.response import Response
+from rest_framework import status
+
+from mailer.dispatcher import adeliver
+from payments.async_api import AsyncAPIView
+
+from .views import ADMIN_EMAIL, SENDGRID_API_KEY, build_demo_mail, prepare_demo_request
+
+logger = logging.getLogger(__name__)
+
+
+class AsyncRequestDemoAPIView(AsyncAPIView):
+    """
+    ASGI variant of RequestDemoAPIView
+    """
+
+    async def post(self, request):
+        error, email_content = prepare_demo_request(request.data)
+        if error:
+            return Response({"error": error}, status=status.HTTP_400_BAD_REQUEST)
+
+        if not SENDGRID_API_KEY:
+            logger.error("SendGrid API key not configured - email will not be sent")
+            return Response(
+                {"message": "Demo request submitted. Our team will contact you soon."},
+                status=status.HTTP_200_OK,
+            )
+
+        try:
+            await adeliver(build_demo_mail(email_content), category="demo")
+            logger.info(f"Email queued for sending to {ADMIN_EMAIL}")
+        except Exception as e:
+            logger.error(f"Failed to queue email: {e}")
+
+        return Response(
+            {"message": "Demo request submitted successfully. Our team will contact you soon."},
+            status=status.HTTP_200_OK,
+        )
@@ -1,6 +1,8 @@
 from django.urls import path
 from .views import RequestDemoAPIView
+from .async_views import AsyncRequestDemoAPIView
 
 urlpatterns = [
     path('request-demo/', RequestDemoAPIView.as_view(), name='request_demo'),
+    path('async/request-demo/', AsyncRequestDemoAPIView.as_view(), name='async_request_demo'),
 ]
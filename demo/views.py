@@ -4,15 +4,17 @@ import pytz
 from threading import Thread
 from queue import Queue
 import asyncio
-from concurrent.futures import ThreadPoolExecutor
 
 from rest_framework.views import APIView
 from rest_framework.response import Response
 from rest_framework import status
-from sendgrid import SendGridAPIClient
 from sendgrid.helpers.mail import Mail
 from django.conf import settings
 
+from mailer.dispatcher import deliver
+from mailer.rendering import load_templates
+from mailer.transport import get_transport
+
 # Set up logging
 logger = logging.getLogger(__name__)
 
@@ -22,29 +24,28 @@ ADMIN_EMAIL = 'sales@advolcano.io'
 # Use verified sender email - change this to your verified SendGrid sender
 VERIFIED_SENDER_EMAIL = 'noreply@advolcano.io'  # Must be verified in SendGrid
 
-# Global thread pool for async email sending
-email_executor = ThreadPoolExecutor(max_workers=3, thread_name_prefix="email_sender")
+# Admin demo request email, compiled once per worker
+DEMO_REQUEST_HTML, = load_templates(__file__, 'demo_request.html')
+
+def build_demo_mail(content):
+    return Mail(
+        from_email=VERIFIED_SENDER_EMAIL,  # Use verified sender
+        to_emails=ADMIN_EMAIL,
+        subject='[AdVolcano] New Demo Request',
+        html_content=content
+    )
 
 def send_email_async(email_data):
-    """Send email in background thread with enhanced error handling"""
+    """Queue email on the shared mail dispatcher with enhanced error handling"""
     try:
         # Validate API key exists
         if not SENDGRID_API_KEY:
             logger.error("SendGrid API key is not set")
             return
         
-        mail = Mail(
-            from_email=VERIFIED_SENDER_EMAIL,  # Use verified sender
-            to_emails=ADMIN_EMAIL,
-            subject='[AdVolcano] New Demo Request',
-            html_content=email_data['content']
-        )
-        
-        sg = SendGridAPIClient(SENDGRID_API_KEY)
-        response = sg.send(mail)
+        response = deliver(build_demo_mail(email_data['content']), category="demo")
         
-        logger.info(f"Email sent successfully. Status: {response.status_code}")
-        logger.info(f"Response headers: {response.headers}")
+        logger.info(f"Email queued successfully. Status: {response.status_code}")
         
     except Exception as e:
         logger.error(f"Background email sending failed: {str(e)}")
@@ -68,117 +69,79 @@ def test_sendgrid_connection():
             logger.error("SendGrid API key is not configured")
             return False
             
-        sg = SendGridAPIClient(SENDGRID_API_KEY)
         mail = Mail(
             from_email=VERIFIED_SENDER_EMAIL,
             to_emails=ADMIN_EMAIL,
             subject='SendGrid Connection Test',
             html_content='<p>This is a test email to verify SendGrid configuration.</p>'
         )
-        response = sg.send(mail)
+        response = get_transport(SENDGRID_API_KEY).send(mail)
         logger.info(f"SendGrid test successful: Status {response.status_code}")
         return True
     except Exception as e:
         logger.error(f"SendGrid test failed: {e}")
         return False
 
-class RequestDemoAPIView(APIView):
+def prepare_demo_request(data):
     """
-    Optimized endpoint for demo requests with async email sending.
+    Validate a demo request and render the admin email.
+    Returns ``(error, email_content)``; exactly one of them is set.
     """
+    interest = data.get('interest')
+    full_name = data.get('full_name')
+    email = data.get('email')
+    company = data.get('company', 'N/A')
+    message = data.get('message', 'N/A')
 
-    def post(self, request):
-        data = request.data
-        interest = data.get('interest')
-        full_name = data.get('full_name')
-        email = data.get('email')
-        company = data.get('company', 'N/A')
-        message = data.get('message', 'N/A')
-
-        # Validate required fields (fast validation)
-        if not all([interest, full_name, email]):
-            return Response(
-                {"error": "interest, full_name, and email are required."},
-                status=status.HTTP_400_BAD_REQUEST,
-            )
+    # Validate required fields (fast validation)
+    if not all([interest, full_name, email]):
+        return "interest, full_name, and email are required.", None
 
-        # Enhanced email format validation
-        if not email or '@' not in email or '.' not in email.split('@')[-1]:
-            return Response(
-                {"error": "Please provide a valid email address."},
-                status=status.HTTP_400_BAD_REQUEST,
-            )
+    # Enhanced email format validation
+    if not email or '@' not in email or '.' not in email.split('@')[-1]:
+        return "Please provide a valid email address.", None
 
-        # Validate email length and basic format
-        if len(email) > 254 or len(email.split('@')[0]) > 64:
-            return Response(
-                {"error": "Email address is too long."},
-                status=status.HTTP_400_BAD_REQUEST,
-            )
+    # Validate email length and basic format
+    if len(email) > 254 or len(email.split('@')[0]) > 64:
+        return "Email address is too long.", None
 
-        # Log the demo request (minimal logging)
-        logger.info(f"Demo request received from {email} for {interest}")
+    # Log the demo request (minimal logging)
+    logger.info(f"Demo request received from {email} for {interest}")
 
-        # Pre-calculate timestamp (optimize timezone handling)
-        try:
-            tz = pytz.timezone('Asia/Kolkata')
-            now = datetime.now(tz)
-            timestamp = now.strftime("on %d %b, %Y %I:%M:%S %p UTC%z")
-            timestamp = timestamp[:-2] + ':' + timestamp[-2:]
-        except Exception as e:
-            logger.error(f"Timezone conversion failed: {e}")
-            # Fallback to UTC
-            now = datetime.utcnow()
-            timestamp = now.strftime("on %d %b, %Y %I:%M:%S %p UTC")
-
-        # Email content with improved HTML structure
-        email_content = f"""<!DOCTYPE html>
-<html lang="en">
-<head>
-    <meta charset="UTF-8">
-    <meta name="viewport" content="width=device-width, initial-scale=1.0">
-    <title>New Demo Request</title>
-</head>
-<body style="margin: 0; padding: 0; font-family: -apple-system, BlinkMacSystemFont, 'Segoe UI', Roboto, sans-serif;">
-    <div style="max-width: 650px; margin: 0 auto; padding: 40px; background-color: #f9f9f9;">
-        <div style="background-color: white; padding: 32px; border-radius: 8px; box-shadow: 0 1px 3px rgba(0,0,0,0.1);">
-            <h2 style="color: #4a5568; font-size: 20px; font-weight: 600; margin: 0 0 24px 0; display: flex; align-items: center;">
-                <span style="margin-right: 8px;">📩</span> New Demo Request
-            </h2>
-            <p style="font-size: 16px; color: #2d3748; margin: 0 0 24px 0;">
-                You've received a new demo request from <a href="https://advolcano.io" style="color: #3182ce; text-decoration: none;">advolcano.io</a>
-            </p>
-            <div style="background-color: #f7fafc; padding: 20px; border-radius: 6px; margin: 24px 0;">
-                <table style="width: 100%; border-collapse: collapse;">
-                    <tr>
-                        <td style="padding: 8px 0; color: #4a5568; font-weight: 600; width: 140px; vertical-align: top;">Interest</td>
-                        <td style="padding: 8px 0; color: #2d3748;">: {interest}</td>
-                    </tr>
-                    <tr>
-                        <td style="padding: 8px 0; color: #4a5568; font-weight: 600; vertical-align: top;">Full Name</td>
-                        <td style="padding: 8px 0; color: #2d3748;">: {full_name}</td>
-                    </tr>
-                    <tr>
-                        <td style="padding: 8px 0; color: #4a5568; font-weight: 600; vertical-align: top;">Email</td>
-                        <td style="padding: 8px 0; color: #2d3748;">: <a href="mailto:{email}" style="color: #3182ce; text-decoration: none;">{email}</a></td>
-                    </tr>
-                    <tr>
-                        <td style="padding: 8px 0; color: #4a5568; font-weight: 600; vertical-align: top;">Company</td>
-                        <td style="padding: 8px 0; color: #2d3748;">: {company}</td>
-                    </tr>
-                    <tr>
-                        <td style="padding: 8px 0; color: #4a5568; font-weight: 600; vertical-align: top;">Message</td>
-                        <td style="padding: 8px 0; color: #2d3748;">: {message}</td>
-                    </tr>
-                </table>
-            </div>
-            <p style="margin: 24px 0 0 0; font-size: 14px; color: #718096;">
-                This demo request generated from <strong>Advolcano.io</strong> {timestamp}
-            </p>
-        </div>
-    </div>
-</body>
-</html>"""
+    # Pre-calculate timestamp (optimize timezone handling)
+    try:
+        tz = pytz.timezone('Asia/Kolkata')
+        now = datetime.now(tz)
+        timestamp = now.strftime("on %d %b, %Y %I:%M:%S %p UTC%z")
+        timestamp = timestamp[:-2] + ':' + timestamp[-2:]
+    except Exception as e:
+        logger.error(f"Timezone conversion failed: {e}")
+        # Fallback to UTC
+        now = datetime.utcnow()
+        timestamp = now.strftime("on %d %b, %Y %I:%M:%S %p UTC")
+
+    # Email content with improved HTML structure
+    email_content = DEMO_REQUEST_HTML.render({
+        'interest': interest,
+        'full_name': full_name,
+        'email': email,
+        'company': company,
+        'message': message,
+        'timestamp': timestamp,
+    })
+
+    return None, email_content
+
+
+class RequestDemoAPIView(APIView):
+    """
+    Optimized endpoint for demo requests with async email sending.
+    """
+
+    def post(self, request):
+        error, email_content = prepare_demo_request(request.data)
+        if error:
+            return Response({"error": error}, status=status.HTTP_400_BAD_REQUEST)
 
         # Check if SendGrid is properly configured
         if not SENDGRID_API_KEY:
@@ -188,10 +151,10 @@ class RequestDemoAPIView(APIView):
                 status=status.HTTP_200_OK,
             )
 
-        # Send email asynchronously (non-blocking)
+        # Send email asynchronously (non-blocking, via the shared mail dispatcher)
         try:
             email_data = {'content': email_content}
-            email_executor.submit(send_email_async, email_data)
+            send_email_async(email_data)
             logger.info(f"Email queued for sending to {ADMIN_EMAIL}")
         except Exception as e:
             logger.error(f"Failed to queue email: {e}")
@@ -0,0 +1,11 @@
+from django.contrib import admin
+
+from .models import OutboundEmail
+
+
+@admin.register(OutboundEmail)
+class OutboundEmailAdmin(admin.ModelAdmin):
+    list_display = ('id', 'category', 'subject', 'to_emails', 'status', 'attempts', 'created_at', 'sent_at')
+    list_filter = ('status', 'category')
+    search_fields = ('subject', 'to_emails')
+    readonly_fields = ('payload', 'created_at', 'sent_at', 'claimed_at', 'response_status', 'last_error')
@@ -0,0 +1,370 @@
+import logging
+import random
+import threading
+import time
+from collections import deque
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+
+from payments.breakers import CircuitOpen
+from payments.events import log_event
+from payments.metrics import registry
+
+from .governor import SendThrottled
+from .outbox import EMAIL_OUTBOX_ENABLED, QueuedMail, enqueue_mail, record_email, send_mail_now
+
+logger = logging.getLogger(__name__)
+
+# === Dispatcher configuration ===
+MAIL_QUEUE_SIZE = getattr(settings, 'MAIL_QUEUE_SIZE', 1000)
+MAIL_DISPATCH_WORKERS = getattr(settings, 'MAIL_DISPATCH_WORKERS', 3)
+MAIL_OVERFLOW_POLICY = getattr(settings, 'MAIL_OVERFLOW_POLICY', 'spill')
+MAIL_THROTTLE_RETRIES = getattr(settings, 'MAIL_THROTTLE_RETRIES', 5)
+MAIL_DRAIN_TIMEOUT = getattr(settings, 'MAIL_DRAIN_TIMEOUT', 30)
+
+OVERFLOW_REJECT = 'reject'
+OVERFLOW_DROP_OLDEST = 'drop_oldest'
+OVERFLOW_SPILL = 'spill'
+
+# Lower number = sent first. Payment mail jumps ahead of contact/demo enquiries.
+DEFAULT_CATEGORY_PRIORITY = {
+    'payment_receipt': 0,
+    'payment_failure': 0,
+    'payment_admin': 1,
+    'payment_initiated': 2,
+    'demo': 3,
+    'contact': 4,
+    'contact_auto_reply': 5,
+}
+MAIL_CATEGORY_PRIORITY = getattr(settings, 'MAIL_CATEGORY_PRIORITY', DEFAULT_CATEGORY_PRIORITY)
+LOWEST_PRIORITY = max(MAIL_CATEGORY_PRIORITY.values(), default=0)
+
+LATENCY_SAMPLES = 1000
+
+# How long a worker backs off when SendGrid's breaker refuses a send
+PARK_MIN_SECONDS = 1.0
+
+
+email_queue_wait = registry.histogram(
+    'email_queue_wait_seconds', 'Time emails wait in the dispatcher queue before a send starts',
+    ('category', ),
+)
+
+
+class MailQueueFull(Exception):
+    """Raised when the dispatcher queue is full and the overflow policy is 'reject'."""
+
+
+class _Job:
+    __slots__ = ('mail', 'category', 'enqueued_at', 'throttled', 'ready_at')
+
+    def __init__(self, mail, category):
+        self.mail = mail
+        self.category = category
+        self.enqueued_at = time.monotonic()
+        self.throttled = 0
+        self.ready_at = 0.0  # monotonic time before which a requeued job is not retried
+
+
+def _percentile(samples, fraction):
+    if not samples:
+        return None
+    ordered = sorted(samples)
+    index = min(int(round(fraction * (len(ordered) - 1))), len(ordered) - 1)
+    return round(ordered[index] * 1000, 1)
+
+
+class MailDispatcher:
+    """
+    Bounded, prioritised in-process mail queue shared by every app.
+
+    One FIFO per priority level; worker threads always take from the most
+    important non-empty level. When ``max_size`` messages are waiting the
+    overflow policy decides what happens to a new one:
+
+    - ``reject``: raise ``MailQueueFull``
+    - ``drop_oldest``: discard the oldest message of the least important level
+      (or the new message, if it is the least important)
+    - ``spill``: write the new message to the durable outbox, where
+      ``manage.py send_outbox`` picks it up
+
+    While the SendGrid breaker is open, messages a worker takes are parked
+    back at the head of their level and the worker waits out the breaker.
+    Messages SendGrid rate-limits (429) are requeued and not retried before
+    Retry-After (plus jitter); after MAIL_THROTTLE_RETRIES they move to the
+    outbox rather than being dropped. While the key's governor is paused for
+    longer than a send may wait, workers sleep the pause out.
+    """
+
+    def __init__(self, max_size=MAIL_QUEUE_SIZE, workers=MAIL_DISPATCH_WORKERS,
+                 overflow_policy=MAIL_OVERFLOW_POLICY, priorities=MAIL_CATEGORY_PRIORITY):
+        if overflow_policy not in (OVERFLOW_REJECT, OVERFLOW_DROP_OLDEST, OVERFLOW_SPILL):
+            raise ValueError(f"Unknown mail overflow policy: {overflow_policy}")
+        self.max_size = max_size
+        self.workers = workers
+        self.overflow_policy = overflow_policy
+        self.priorities = priorities
+        self._levels = {}
+        self._size = 0
+        self._busy = 0  # jobs taken by a worker and not finished yet
+        lock = threading.RLock()
+        self._cond = threading.Condition(lock)
+        self._idle = threading.Condition(lock)
+        self._threads = []
+        self._counters = {
+            'enqueued': 0, 'sent': 0, 'failed': 0,
+            'rejected': 0, 'dropped': 0, 'spilled': 0, 'parked': 0, 'requeued': 0,
+        }
+        self._send_latency = deque(maxlen=LATENCY_SAMPLES)
+        self._queue_wait = deque(maxlen=LATENCY_SAMPLES)
+
+    def priority_for(self, category):
+        return self.priorities.get(category, LOWEST_PRIORITY)
+
+    # --- producer side ---
+    def submit(self, mail, category="general"):
+        """Queue ``mail`` for background delivery. Returns a ``QueuedMail``."""
+        priority = self.priority_for(category)
+        with self._cond:
+            self._ensure_workers()
+            if self._size >= self.max_size:
+                if self.overflow_policy == OVERFLOW_REJECT:
+                    self._counters['rejected'] += 1
+                    raise MailQueueFull(f"Mail queue full ({self.max_size} waiting)")
+                if self.overflow_policy == OVERFLOW_SPILL:
+                    self._counters['spilled'] += 1
+                    spill = True
+                else:
+                    spill = False
+                    victim_priority = max(p for p, level in self._levels.items() if level)
+                    if victim_priority < priority:
+                        self._counters['dropped'] += 1
+                        logger.warning(f"Mail queue full, dropped new {category} message")
+                        return QueuedMail(None)
+                    victim = self._levels[victim_priority].popleft()
+                    self._size -= 1
+                    self._counters['dropped'] += 1
+                    logger.warning(f"Mail queue full, dropped oldest {victim.category} message")
+            else:
+                spill = False
+
+            if not spill:
+                self._levels.setdefault(priority, deque()).append(_Job(mail, category))
+                self._size += 1
+                self._counters['enqueued'] += 1
+                self._cond.notify()
+                return QueuedMail(None)
+
+        # Outbox insert happens outside the lock: it is a database write
+        outbound = enqueue_mail(mail, category)
+        logger.warning(f"Mail queue full, spilled {category} message to outbox id={outbound.id}")
+        return QueuedMail(outbound.id)
+
+    # --- worker side ---
+    def _ensure_workers(self):
+        self._threads = [thread for thread in self._threads if thread.is_alive()]
+        while len(self._threads) < self.workers:
+            thread = threading.Thread(
+                target=self._run, name=f"mail_dispatch_{len(self._threads)}", daemon=True
+            )
+            thread.start()
+            self._threads.append(thread)
+
+    def _take(self):
+        """Highest-priority job that is ready; waits for the earliest requeued one otherwise."""
+        with self._cond:
+            while True:
+                if not self._size:
+                    self._cond.wait()
+                    continue
+                now = time.monotonic()
+                next_ready = None
+                for priority in sorted(p for p, level in self._levels.items() if level):
+                    level = self._levels[priority]
+                    for index, job in enumerate(level):
+                        if job.ready_at <= now:
+                            del level[index]
+                            self._size -= 1
+                            self._busy += 1
+                            return job
+                        if next_ready is None or job.ready_at < next_ready:
+                            next_ready = job.ready_at
+                self._cond.wait(next_ready - now)
+
+    def _park(self, job):
+        with self._cond:
+            self._levels.setdefault(self.priority_for(job.category), deque()).appendleft(job)
+            self._size += 1
+            self._counters['parked'] += 1
+
+    def _requeue_throttled(self, job, retry_after):
+        """
+        Put a rate-limited message back, not to be retried for ``retry_after``
+        seconds plus up to 20% jitter. Once out of retries it moves to the
+        outbox instead; False if that fails too (the message is lost).
+        """
+        job.throttled += 1
+        if job.throttled > MAIL_THROTTLE_RETRIES:
+            try:
+                outbound = enqueue_mail(job.mail, job.category)
+            except Exception as e:
+                logger.error(f"{job.category} email still rate limited and could not be moved to the outbox: {e}")
+                return False
+            with self._cond:
+                self._counters['spilled'] += 1
+            logger.warning(f"{job.category} email still rate limited, moved to outbox id={outbound.id}")
+            return True
+        job.ready_at = time.monotonic() + retry_after * random.uniform(1.0, 1.2)
+        self._park(job)
+        with self._cond:
+            self._counters['requeued'] += 1
+        return True
+
+    def _run(self):
+        while True:
+            job = self._take()
+            try:
+                self._handle(job)
+            finally:
+                with self._cond:
+                    self._busy -= 1
+                    if not self._size and not self._busy:
+                        self._idle.notify_all()
+
+    def _handle(self, job):
+        started = time.monotonic()
+        try:
+            response = send_mail_now(job.mail)
+            outcome, status_code = 'sent', response.status_code
+            logger.info(f"Dispatched {job.category} email. Status: {response.status_code}")
+        except CircuitOpen as e:
+            self._park(job)
+            time.sleep(max(e.retry_in, PARK_MIN_SECONDS))
+            return
+        except SendThrottled as e:
+            # The governor is paused for longer than a send may wait: so is every worker
+            self._park(job)
+            time.sleep(e.wait)
+            return
+        except Exception as e:
+            if getattr(e, 'retry_after', None) is not None and self._requeue_throttled(job, e.retry_after):
+                return
+            outcome, status_code = 'failed', getattr(e, 'status_code', None)
+            logger.error(f"Failed to send {job.category} email: {str(e)}")
+            if hasattr(e, 'body'):
+                logger.error(f"SendGrid Response: {e.body}")
+        finished = time.monotonic()
+        log_event(
+            f'email.{outcome}', category=job.category, via='dispatcher', status=status_code,
+            duration_ms=round((finished - started) * 1000, 1),
+            queue_wait_ms=round((started - job.enqueued_at) * 1000, 1)
+        )
+        record_email(job.category, 'dispatcher', outcome, finished - started)
+        email_queue_wait.observe(started - job.enqueued_at, job.category)
+        with self._cond:
+            self._counters[outcome] += 1
+            self._send_latency.append(finished - started)
+            self._queue_wait.append(started - job.enqueued_at)
+
+    # --- shutdown ---
+    def drain(self, timeout=MAIL_DRAIN_TIMEOUT):
+        """
+        Wait for every queued message to be sent (or fail) before the process
+        exits: the workers are daemon threads, so whatever is still queued when
+        a management command returns would be lost. Messages still waiting
+        after ``timeout`` seconds (breaker open, rate limited) move to the
+        outbox. Returns the number moved.
+        """
+        deadline = time.monotonic() + timeout
+        with self._cond:
+            while self._size or self._busy:
+                left = deadline - time.monotonic()
+                if left <= 0:
+                    break
+                self._idle.wait(left)
+            leftovers = [job for level in self._levels.values() for job in level]
+            for level in self._levels.values():
+                level.clear()
+            self._size = 0
+            busy = self._busy
+        if busy:
+            logger.warning(f"Mail dispatcher drained with {busy} send(s) still in progress")
+        for job in leftovers:
+            outbound = enqueue_mail(job.mail, job.category)
+            logger.warning(f"{job.category} email not sent before shutdown, moved to outbox id={outbound.id}")
+        if leftovers:
+            with self._cond:
+                self._counters['spilled'] += len(leftovers)
+        return len(leftovers)
+
+    def _depth_by_category(self):
+        depth_by_category = {}
+        for level in self._levels.values():
+            for job in level:
+                depth_by_category[job.category] = depth_by_category.get(job.category, 0) + 1
+        return depth_by_category
+
+    def depth_by_category(self):
+        with self._cond:
+            return self._depth_by_category()
+
+    def stats(self):
+        """Queue depth (total and per category), outcome counters and latency percentiles in ms."""
+        with self._cond:
+            depth_by_category = self._depth_by_category()
+            send_latency = list(self._send_latency)
+            queue_wait = list(self._queue_wait)
+            return {
+                'queue_depth': self._size,
+                'queue_capacity': self.max_size,
+                'depth_by_category': depth_by_category,
+                'overflow_policy': self.overflow_policy,
+                'workers': len([thread for thread in self._threads if thread.is_alive()]),
+                **self._counters,
+                'send_latency_ms': {
+                    'p50': _percentile(send_latency, 0.5),
+                    'p95': _percentile(send_latency, 0.95),
+                    'max': _percentile(send_latency, 1.0),
+                },
+                'queue_wait_ms': {
+                    'p50': _percentile(queue_wait, 0.5),
+                    'p95': _percentile(queue_wait, 0.95),
+                    'max': _percentile(queue_wait, 1.0),
+                },
+            }
+
+
+dispatcher = MailDispatcher()
+
+registry.gauge(
+    'email_queue_depth', 'Emails waiting in the dispatcher queues, by category',
+    ('category', ), collect=lambda: {(category, ): depth for category, depth in dispatcher.depth_by_category().items()},
+)
+registry.gauge(
+    'email_queue_capacity', 'Dispatcher queue capacity', collect=lambda: {(): dispatcher.max_size},
+)
+
+
+def deliver(mail, category="general"):
+    """
+    Hand a message to the configured delivery path without blocking on SendGrid.
+
+    With EMAIL_OUTBOX_ENABLED the message is written to the durable outbox;
+    otherwise it joins the shared in-process dispatcher queue. Either way a
+    ``QueuedMail`` is returned. Raises ``MailQueueFull`` when the queue is full
+    under the 'reject' policy.
+    """
+    if EMAIL_OUTBOX_ENABLED:
+        outbound = enqueue_mail(mail, category)
+        logger.info(f"Email queued in outbox: id={outbound.id} category={category}")
+        return QueuedMail(outbound.id)
+    return dispatcher.submit(mail, category)
+
+
+async def adeliver(mail, category="general"):
+    """
+    ``deliver`` for async views. The outbox (and queue spill) write through the
+    ORM, so the hand-off runs on Django's sync thread rather than in the loop.
+    """
+    return await sync_to_async(deliver)(mail, category)
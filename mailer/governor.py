@@ -0,0 +1,137 @@
+import logging
+import random
+import threading
+import time
+from email.utils import parsedate_to_datetime
+
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
+
+# === Governor configuration (sends per second) ===
+SENDGRID_RATE = getattr(settings, 'SENDGRID_RATE', 10.0)
+SENDGRID_BURST = getattr(settings, 'SENDGRID_BURST', 20)
+SENDGRID_MIN_RATE = getattr(settings, 'SENDGRID_MIN_RATE', 0.5)
+SENDGRID_DEFAULT_RETRY_AFTER = getattr(settings, 'SENDGRID_DEFAULT_RETRY_AFTER', 5)
+
+# Rate is halved on every 429 and regains this share of the configured rate
+# per second of successful sending
+RECOVERY_PER_SECOND = 0.05
+
+
+class SendThrottled(Exception):
+    """No send slot could be had within the time the caller had left."""
+
+    def __init__(self, wait):
+        super().__init__(f"SendGrid send slot not available for another {wait:.1f}s")
+        self.wait = wait
+
+
+def retry_after_seconds(headers, now=None, default=SENDGRID_DEFAULT_RETRY_AFTER):
+    """
+    Seconds to hold off after a 429: ``Retry-After`` (delta or HTTP date), else
+    SendGrid's ``X-RateLimit-Reset`` epoch, else ``default``.
+    """
+    now = now or time.time()
+    value = headers.get('Retry-After') if headers else None
+    if value:
+        try:
+            return max(float(value), 0.0)
+        except ValueError:
+            try:
+                return max(parsedate_to_datetime(value).timestamp() - now, 0.0)
+            except (TypeError, ValueError):
+                pass
+    reset = headers.get('X-RateLimit-Reset') if headers else None
+    if reset:
+        try:
+            return max(float(reset) - now, 0.0)
+        except ValueError:
+            pass
+    return float(default)
+
+
+class RateGovernor:
+    """
+    Token bucket in front of one SendGrid API key, shared by every sender.
+
+    ``acquire`` hands out up to ``burst`` sends at once, then ``rate`` per
+    second. A 429 halves the rate and pauses the bucket for Retry-After plus
+    up to 20% jitter, so workers in other processes do not all resume at the
+    same instant; successful sends bring the rate back up gradually (AIMD).
+    """
+
+    def __init__(self, rate=SENDGRID_RATE, burst=SENDGRID_BURST, min_rate=SENDGRID_MIN_RATE):
+        self.max_rate = float(rate)
+        self.min_rate = min(float(min_rate), self.max_rate)
+        self.burst = burst
+        self.rate = self.max_rate
+        self._tokens = float(burst)
+        self._updated = time.monotonic()
+        self._paused_until = 0.0
+        self._lock = threading.Lock()
+        # deferred: no slot within max_wait; the caller parks or outboxes the message
+        self._counters = {'granted': 0, 'delayed': 0, 'deferred': 0, 'throttled': 0}
+        self._delay_total = 0.0
+
+    def _refill(self, now):
+        # Nothing accrues while paused, so a 429 is not followed by a full burst
+        elapsed = now - max(self._updated, self._paused_until)
+        self._updated = now
+        if elapsed > 0:
+            self._tokens = min(self.burst, self._tokens + elapsed * self.rate)
+
+    def acquire(self, max_wait=None):
+        """
+        Take one send slot, sleeping until one is free. Raises ``SendThrottled``
+        if that would take longer than ``max_wait`` seconds. Returns the wait.
+        """
+        waited = 0.0
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._refill(now)
+                pause = self._paused_until - now
+                if pause <= 0 and self._tokens >= 1:
+                    self._tokens -= 1
+                    self._counters['granted'] += 1
+                    if waited:
+                        self._counters['delayed'] += 1
+                        self._delay_total += waited
+                    return waited
+                wait = max(pause, (1 - self._tokens) / self.rate)
+                if max_wait is not None and waited + wait > max_wait:
+                    self._counters['deferred'] += 1
+                    raise SendThrottled(wait)
+            time.sleep(wait)
+            waited += wait
+
+    def throttled(self, retry_after):
+        """SendGrid answered 429: back off for ``retry_after`` seconds and halve the rate."""
+        retry_after *= random.uniform(1.0, 1.2)
+        with self._lock:
+            now = time.monotonic()
+            self._refill(now)
+            self._paused_until = max(self._paused_until, now + retry_after)
+            self._tokens = 0.0
+            self.rate = max(self.rate / 2, self.min_rate)
+            self._counters['throttled'] += 1
+        logger.warning(f"SendGrid rate limited: pausing {retry_after:.1f}s, rate now {self.rate:.2f}/s")
+
+    def succeeded(self):
+        with self._lock:
+            if self.rate < self.max_rate:
+                self.rate = min(self.max_rate, self.rate + self.max_rate * RECOVERY_PER_SECOND / self.rate)
+
+    def stats(self):
+        with self._lock:
+            now = time.monotonic()
+            self._refill(now)
+            return {
+                'rate': round(self.rate, 2),
+                'max_rate': self.max_rate,
+                'tokens': round(self._tokens, 1),
+                'paused_for': round(max(self._paused_until - now, 0.0), 1),
+                **self._counters,
+                'delay_total_s': round(self._delay_total, 1),
+            }
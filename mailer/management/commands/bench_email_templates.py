@@ -0,0 +1,104 @@
+import time
+from decimal import Decimal
+
+from django.core.management.base import BaseCommand
+
+from contact import views as contact_views
+from demo import views as demo_views
+from mailer.tests import email_baseline as inline
+from payments_razorpay import views as payment
+
+ORDER = {
+    'name': 'Bench User',
+    'email': 'bench@example.com',
+    'amount_usd': Decimal('10.00'),
+    'amount_inr': Decimal('877.50'),
+    'commission': Decimal('26.33'),
+    'gst': Decimal('4.74'),
+    'total_amount': Decimal('908.57'),
+}
+PAYMENT = {
+    'razorpay_order_id': 'order_bench0000001',
+    'timestamp': 1760000000,
+    'failure_reason': 'Signature verification failed',
+}
+DEMO = {
+    'interest': 'Advertiser',
+    'full_name': 'Bench User',
+    'email': 'bench@example.com',
+    'company': 'Bench & Co',
+    'message': 'Looking for a walkthrough.',
+}
+
+
+class Command(BaseCommand):
+    help = (
+        'Benchmark email body rendering: the compiled templates used by the views '
+        'against the inline f-strings they replaced, on the same inputs.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--repeat', type=int, default=20000, help='Renders per measurement')
+
+    def handle(self, *args, **options):
+        repeat = options['repeat']
+        self.stdout.write(f'{repeat} renders per measurement')
+
+        for label, inline, compiled in self._cases():
+            if inline() != compiled():
+                self.stdout.write(self.style.ERROR(f'{label}: compiled output differs from the inline f-string!'))
+                return
+            before = self._time(repeat, inline)
+            after = self._time(repeat, compiled)
+            self._report(label, repeat, before, after)
+        self.stdout.write(self.style.SUCCESS('Compiled output matches the inline f-strings byte for byte'))
+
+    def _cases(self):
+        def payment_context(formatted_time):
+            context = payment.customer_email_context(ORDER, PAYMENT, formatted_time)
+            context['failure_reason'] = PAYMENT['failure_reason']
+            return context
+
+        def compiled_payment(html, text):
+            def render():
+                context = payment_context(payment.customer_email_time(PAYMENT['timestamp']))
+                return html.render(context), text.render(context)
+            return render
+
+        timestamp = 'on 01 Jan, 2026 10:00:00 AM UTC+05:30'
+        contact_context = {
+            'full_name': 'Bench User', 'email': 'bench@example.com', 'company': 'Bench &amp; Co',
+            'subject': 'Pricing', 'phone': '+91 90000 00000',
+            'message': 'Hello &lt;team&gt;, please call me back.', 'timestamp': timestamp,
+        }
+        demo_context = dict(DEMO, timestamp=timestamp)
+
+        return [
+            ('payment success (html + text)',
+             lambda: inline.payment_success(ORDER, PAYMENT),
+             compiled_payment(payment.SUCCESS_HTML, payment.SUCCESS_TEXT)),
+            ('payment failure (html + text)',
+             lambda: inline.payment_failure(ORDER, PAYMENT),
+             compiled_payment(payment.FAILURE_HTML, payment.FAILURE_TEXT)),
+            ('contact enquiry (html)',
+             lambda: inline.contact_enquiry(**contact_context),
+             lambda: contact_views.CONTACT_ENQUIRY_HTML.render(contact_context)),
+            ('demo request (html)',
+             lambda: inline.demo_request(**demo_context),
+             lambda: demo_views.DEMO_REQUEST_HTML.render(demo_context)),
+        ]
+
+    def _time(self, repeat, func):
+        func()  # warm-up
+        started = time.perf_counter()
+        for _ in range(repeat):
+            func()
+        return time.perf_counter() - started
+
+    def _report(self, label, repeat, before, after):
+        before_us = before / repeat * 1e6
+        after_us = after / repeat * 1e6
+        self.stdout.write(
+            f'  {label:<32} inline {before_us:8.2f} us  compiled {after_us:8.2f} us  '
+            f'{before / after:5.2f}x'
+        )
@@ -0,0 +1,37 @@
+import signal
+import time
+
+from django.core.management.base import BaseCommand
+
+from mailer.outbox import OUTBOX_MAX_ATTEMPTS, process_batch, release_stale_claims
+
+
+class Command(BaseCommand):
+    help = 'Deliver queued emails from the outbox table with retry/backoff'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=50, help='Messages claimed per batch')
+        parser.add_argument('--max-attempts', type=int, default=OUTBOX_MAX_ATTEMPTS, help='Attempts before a message is marked failed')
+        parser.add_argument('--poll-interval', type=float, default=5.0, help='Seconds to sleep when the outbox is empty')
+        parser.add_argument('--once', action='store_true', help='Process a single batch and exit')
+
+    def handle(self, *args, **options):
+        self.running = True
+        signal.signal(signal.SIGTERM, self.stop)
+        signal.signal(signal.SIGINT, self.stop)
+
+        self.stdout.write('Outbox worker started')
+        while self.running:
+            release_stale_claims()
+            sent, failed = process_batch(options['batch_size'], options['max_attempts'])
+            if sent or failed:
+                self.stdout.write(f'Batch done: {sent} sent, {failed} failed')
+            if options['once']:
+                break
+            if not (sent or failed):
+                time.sleep(options['poll_interval'])
+
+        self.stdout.write(self.style.SUCCESS('Outbox worker stopped'))
+
+    def stop(self, signum, frame):
+        self.running = False
@@ -0,0 +1,203 @@
+import logging
+import random
+import time
+from datetime import timedelta
+
+from django.conf import settings
+from django.utils import timezone
+
+from payments.breakers import CircuitOpen
+from payments.deadlines import EMAIL_SEND_DEADLINE, deadline
+from payments.events import log_event, ms_since
+from payments.metrics import registry, task_duration
+
+from .governor import SendThrottled
+from .models import OutboundEmail
+from .transport import get_transport, sendgrid_breaker
+
+logger = logging.getLogger(__name__)
+
+# === Outbox configuration ===
+EMAIL_OUTBOX_ENABLED = getattr(settings, 'EMAIL_OUTBOX_ENABLED', False)
+OUTBOX_MAX_ATTEMPTS = getattr(settings, 'OUTBOX_MAX_ATTEMPTS', 5)
+OUTBOX_BACKOFF_BASE = getattr(settings, 'OUTBOX_BACKOFF_BASE', 30)
+OUTBOX_BACKOFF_MAX = getattr(settings, 'OUTBOX_BACKOFF_MAX', 60 * 60)
+OUTBOX_CLAIM_LEASE = getattr(settings, 'OUTBOX_CLAIM_LEASE', 10 * 60)
+
+
+email_deliveries = registry.counter(
+    'emails_total', 'Email send attempts by category, delivery path and outcome',
+    ('category', 'via', 'outcome'),
+)
+
+
+def record_email(category, via, outcome, seconds):
+    email_deliveries.inc(category, via, outcome)
+    task_duration.observe(seconds, f'email.{via}', outcome)
+
+
+class QueuedMail:
+    """Stand-in for a SendGrid response when a message was accepted for later delivery."""
+
+    status_code = "queued"
+    headers = {}
+
+    def __init__(self, outbox_id=None):
+        self.outbox_id = outbox_id
+
+
+def _recipients(payload):
+    emails = []
+    for personalization in payload.get('personalizations', []):
+        emails.extend(to.get('email', '') for to in personalization.get('to', []))
+    return ", ".join(emails)[:500]
+
+
+def enqueue_mail(mail, category="general"):
+    """Store ``mail`` (a sendgrid ``Mail`` or a v3 payload dict) in the outbox."""
+    payload = mail if isinstance(mail, dict) else mail.get()
+    return OutboundEmail.objects.create(
+        category=category,
+        subject=str(payload.get('subject', ''))[:255],
+        to_emails=_recipients(payload),
+        payload=payload,
+    )
+
+
+def send_mail_now(mail):
+    """
+    Send ``mail`` to SendGrid immediately over the pooled transport and return
+    the response, within EMAIL_SEND_DEADLINE (or the caller's shorter deadline).
+    """
+    with deadline(EMAIL_SEND_DEADLINE, "email send"):
+        return get_transport().send(mail)
+
+
+# === Worker side ===
+def release_stale_claims(lease=OUTBOX_CLAIM_LEASE):
+    """Return rows stuck in 'sending' (worker died mid-batch) to the pending pool."""
+    cutoff = timezone.now() - timedelta(seconds=lease)
+    released = OutboundEmail.objects.filter(
+        status=OutboundEmail.STATUS_SENDING, claimed_at__lt=cutoff
+    ).update(status=OutboundEmail.STATUS_PENDING, claimed_at=None)
+    if released:
+        logger.warning(f"Released {released} stale outbox claims")
+    return released
+
+
+def claim_batch(batch_size=50):
+    """
+    Claim up to ``batch_size`` due messages for this worker.
+
+    Each row is claimed with a conditional update, so several workers can poll
+    the same table without sending a message twice.
+    """
+    now = timezone.now()
+    candidate_ids = list(
+        OutboundEmail.objects.filter(
+            status=OutboundEmail.STATUS_PENDING, next_attempt_at__lte=now
+        ).order_by('next_attempt_at').values_list('id', flat=True)[:batch_size]
+    )
+    claimed_ids = [
+        outbox_id for outbox_id in candidate_ids
+        if OutboundEmail.objects.filter(
+            id=outbox_id, status=OutboundEmail.STATUS_PENDING
+        ).update(status=OutboundEmail.STATUS_SENDING, claimed_at=now)
+    ]
+    return list(OutboundEmail.objects.filter(id__in=claimed_ids).order_by('next_attempt_at'))
+
+
+def _backoff_seconds(attempts):
+    delay = min(OUTBOX_BACKOFF_BASE * (2 ** (attempts - 1)), OUTBOX_BACKOFF_MAX)
+    return delay * random.uniform(0.8, 1.2)
+
+
+def _is_permanent_failure(exc):
+    # 4xx other than 429 means SendGrid rejected the payload itself; retrying won't help
+    status_code = getattr(exc, 'status_code', None)
+    return isinstance(status_code, int) and 400 <= status_code < 500 and status_code != 429
+
+
+def _park(outbound, retry_in):
+    # Refused by the breaker or the rate governor, or rate limited by SendGrid:
+    # nothing is wrong with the message, so this does not use up an attempt
+    outbound.status = OutboundEmail.STATUS_PENDING
+    outbound.claimed_at = None
+    outbound.next_attempt_at = timezone.now() + timedelta(seconds=max(retry_in, 1))
+    outbound.save(update_fields=['status', 'next_attempt_at', 'claimed_at', 'last_error', 'response_status'])
+
+
+def send_outbound(outbound, max_attempts=OUTBOX_MAX_ATTEMPTS):
+    """
+    Send one claimed message and record the outcome. Returns True when sent,
+    False when the attempt failed and None when it was parked because the
+    SendGrid breaker is open or the send was rate limited (rescheduled after
+    Retry-After, with jitter).
+    """
+    started = time.monotonic()
+    try:
+        response = send_mail_now(outbound.payload)
+    except CircuitOpen as e:
+        _park(outbound, e.retry_in)
+        return None
+    except SendThrottled as e:
+        _park(outbound, e.wait * random.uniform(1.0, 1.2))
+        return None
+    except Exception as e:
+        if getattr(e, 'retry_after', None) is not None:
+            outbound.last_error = f"{type(e).__name__}: {e}"[:2000]
+            outbound.response_status = e.status_code
+            _park(outbound, e.retry_after * random.uniform(1.0, 1.2))
+            logger.warning(f"Outbox email {outbound.id} rate limited, retrying at {outbound.next_attempt_at}")
+            return None
+        outbound.attempts += 1
+        outbound.last_error = f"{type(e).__name__}: {e}"[:2000]
+        outbound.response_status = getattr(e, 'status_code', None)
+        outbound.claimed_at = None
+        if outbound.attempts >= max_attempts or _is_permanent_failure(e):
+            outbound.status = OutboundEmail.STATUS_FAILED
+            logger.error(f"Outbox email {outbound.id} failed permanently after {outbound.attempts} attempts: {e}")
+        else:
+            outbound.status = OutboundEmail.STATUS_PENDING
+            outbound.next_attempt_at = timezone.now() + timedelta(seconds=_backoff_seconds(outbound.attempts))
+            logger.warning(f"Outbox email {outbound.id} attempt {outbound.attempts} failed, retrying at {outbound.next_attempt_at}: {e}")
+        outbound.save(update_fields=['attempts', 'status', 'next_attempt_at', 'claimed_at', 'last_error', 'response_status'])
+        log_event(
+            'email.failed', category=outbound.category, via='outbox', status=outbound.response_status,
+            attempt=outbound.attempts, final=outbound.status == OutboundEmail.STATUS_FAILED,
+            duration_ms=ms_since(started)
+        )
+        record_email(outbound.category, 'outbox', 'failed', time.monotonic() - started)
+        return False
+
+    outbound.attempts += 1
+    outbound.status = OutboundEmail.STATUS_SENT
+    outbound.response_status = response.status_code
+    outbound.sent_at = timezone.now()
+    outbound.claimed_at = None
+    outbound.last_error = ''
+    outbound.save(update_fields=['attempts', 'status', 'response_status', 'sent_at', 'claimed_at', 'last_error'])
+    logger.info(f"Outbox email {outbound.id} ({outbound.category}) sent. Status: {response.status_code}")
+    log_event(
+        'email.sent', category=outbound.category, via='outbox', status=response.status_code,
+        attempt=outbound.attempts, duration_ms=ms_since(started)
+    )
+    record_email(outbound.category, 'outbox', 'sent', time.monotonic() - started)
+    return True
+
+
+def process_batch(batch_size=50, max_attempts=OUTBOX_MAX_ATTEMPTS):
+    """
+    Claim and send one batch. Returns ``(sent, failed)`` counts. Nothing is
+    claimed while the SendGrid breaker is open.
+    """
+    sent = failed = 0
+    if sendgrid_breaker.retry_in():
+        return sent, failed
+    for outbound in claim_batch(batch_size):
+        outcome = send_outbound(outbound, max_attempts=max_attempts)
+        if outcome:
+            sent += 1
+        elif outcome is False:
+            failed += 1
+    return sent, failed
@@ -0,0 +1,530 @@
+"""
+The email bodies as the views built them before they moved to compiled
+templates (payments_razorpay, contact and demo email_templates/), kept
+verbatim as the reference the tests and bench_email_templates check the
+templates against.
+"""
+from datetime import datetime
+
+
+def payment_success(order_details, payment_details):
+    timestamp = payment_details.get('timestamp', datetime.now())
+    if isinstance(timestamp, (int, float)):
+        formatted_time = datetime.fromtimestamp(timestamp).strftime('%B %d, %Y at %I:%M %p IST')
+    else:
+        formatted_time = datetime.now().strftime('%B %d, %Y at %I:%M %p IST')
+
+    html_body = f"""
+<!DOCTYPE html>
+<html>
+<head>
+    <meta charset="UTF-8">
+    <style>
+        body {{ font-family: Arial, sans-serif; margin: 0; padding: 20px; background-color: #f5f5f5; }}
+        .container {{ max-width: 600px; margin: 0 auto; background-color: white; border-radius: 8px; overflow: hidden; box-shadow: 0 2px 10px rgba(0,0,0,0.1); }}
+        .header {{ background-color: #4CAF50; color: white; padding: 20px; text-align: center; }}
+        .header h1 {{ margin: 0; font-size: 24px; }}
+        .content {{ padding: 30px; }}
+        .order-id {{ background-color: #e8f5e8; padding: 15px; border-radius: 5px; margin: 20px 0; text-align: center; font-weight: bold; }}
+        .section {{ margin-bottom: 30px; }}
+        .section h3 {{ color: #333; border-bottom: 2px solid #4CAF50; padding-bottom: 5px; margin-bottom: 15px; }}
+        .details-row {{ display: flex; justify-content: space-between; margin: 10px 0; padding: 8px 0; }}
+        .details-label {{ font-weight: 500; color: #555; }}
+        .details-value {{ color: #333; }}
+        .total-row {{ background-color: #4CAF50; color: white; padding: 15px; margin: 10px 0; border-radius: 5px; font-weight: bold; font-size: 18px; }}
+        .next-steps {{ background-color: #fff3cd; border: 1px solid #ffeaa7; border-radius: 5px; padding: 20px; margin: 20px 0; }}
+        .next-steps h3 {{ color: #856404; margin-top: 0; }}
+        .next-steps ol {{ color: #856404; }}
+        .important {{ background-color: #e7f3ff; border-left: 4px solid #2196F3; padding: 15px; margin: 20px 0; }}
+        .footer {{ text-align: center; padding: 20px; background-color: #333; color: white; }}
+        .support-link {{ color: #4CAF50; text-decoration: none; }}
+    </style>
+</head>
+<body>
+    <div class="container">
+        <div class="header">
+            <h1>Payment Process Complete</h1>
+        </div>
+        
+        <div class="content">
+            <p>Dear <strong>{order_details.get('name', 'N/A')}</strong>,</p>
+            
+            <p>Thank you for your order with <a href="https://advolcano.io" style="color: #4CAF50; text-decoration: none;">advolcano.io</a>. We have received your payment with the following details:</p>
+            
+            <div class="order-id">
+                Order ID: {payment_details.get('razorpay_order_id', 'N/A')}
+            </div>
+            
+            <div class="section">
+                <h3>Customer Details</h3>
+                <div class="details-row">
+                    <span class="details-label">AdVolcano Name :</span>
+                    <span class="details-value">{order_details.get('name', 'N/A')}</span>
+                </div>
+                <div class="details-row">
+                    <span class="details-label">AdVolcano Email :</span>
+                    <span class="details-value">{order_details.get('email', 'N/A')}</span>
+                </div>
+                <div class="details-row">
+                    <span class="details-label">Date & Time :</span>
+                    <span class="details-value">{formatted_time}</span>
+                </div>
+            </div>
+            
+            <div class="section">
+                <h3>Payment Summary</h3>
+                <div class="details-row">
+                    <span class="details-label">Base Amount (USD)</span>
+                    <span class="details-value">${order_details.get('amount_usd', 0):.2f}</span>
+                </div>
+                <div class="details-row">
+                    <span class="details-label">Base Amount (INR)</span>
+                    <span class="details-value">₹{order_details.get('amount_inr', 0):.2f}</span>
+                </div>
+                <div class="details-row">
+                    <span class="details-label">Platform Fee</span>
+                    <span class="details-value">₹{order_details.get('commission', 0):.2f}</span>
+                </div>
+                <div class="details-row">
+                    <span class="details-label">TAX (GST - 18%)</span>
+                    <span class="details-value">₹{order_details.get('gst', 0):.2f}</span>
+                </div>
+                <div class="total-row">
+                    <div style="display: flex; justify-content: space-between;">
+                        <span>TOTAL AMOUNT:</span>
+                        <span>₹{order_details.get('total_amount', 0):.2f}</span>
+                    </div>
+                </div>
+            </div>
+            
+            <div class="next-steps">
+                <h3>Next Steps</h3>
+                <ol>
+                    <li>We'll credit your AdVolcano wallet within 24hrs</li>
+                </ol>
+            </div>
+            
+            <div class="important">
+                <strong>Important:</strong> This order will reflect in your wallet in 24 to 48 hours. For any communication related to this payment please quote your payment order ID <strong>{payment_details.get('razorpay_order_id', 'N/A')}</strong>.
+            </div>
+            
+            <p>Need help? Contact us at <a href="mailto:support@advolcano.io" class="support-link">support@advolcano.io</a></p>
+            
+            <p>Best regards,<br>
+            <strong>AdVolcano Team</strong></p>
+        </div>
+        
+        <div class="footer">
+            © 2025 AdVolcano. All rights reserved.
+        </div>
+    </div>
+</body>
+</html>
+"""
+
+    plain_text_body = f"""
+Payment Process Complete
+
+Dear {order_details.get('name', 'N/A')},
+
+Thank you for your order with advolcano.io. We have received your payment with the following details:
+
+Order ID: {payment_details.get('razorpay_order_id', 'N/A')}
+
+Customer Details
+AdVolcano Name : {order_details.get('name', 'N/A')}
+AdVolcano Email : {order_details.get('email', 'N/A')}
+Date & Time : {formatted_time}
+
+Payment Summary
+Base Amount (USD): ${order_details.get('amount_usd', 0):.2f}
+Base Amount (INR): ₹{order_details.get('amount_inr', 0):.2f}
+Platform Fee: ₹{order_details.get('commission', 0):.2f}
+TAX (GST - 18%): ₹{order_details.get('gst', 0):.2f}
+TOTAL AMOUNT: ₹{order_details.get('total_amount', 0):.2f}
+
+Next Steps
+1. Payment confirmed on Razorpay gateway
+2. We'll credit your AdVolcano wallet within 24hrs
+3. Order will be processed after payment confirmation
+
+Important: This order will reflect in your wallet in 24 to 48 hours. For any communication related to this payment please quote your payment order ID {payment_details.get('razorpay_order_id', 'N/A')}.
+
+Need help? Contact us at support@advolcano.io
+
+Best regards,
+AdVolcano Team
+
+© 2025 AdVolcano. All rights reserved.
+"""
+    return html_body, plain_text_body
+
+
+def payment_failure(order_details, payment_details):
+    timestamp = payment_details.get('timestamp', datetime.now())
+    if isinstance(timestamp, (int, float)):
+        formatted_time = datetime.fromtimestamp(timestamp).strftime('%B %d, %Y at %I:%M %p IST')
+    else:
+        formatted_time = datetime.now().strftime('%B %d, %Y at %I:%M %p IST')
+
+    html_body = f"""
+<!DOCTYPE html>
+<html>
+<head>
+    <meta charset="UTF-8">
+    <style>
+        body {{ font-family: Arial, sans-serif; margin: 0; padding: 20px; background-color: #f5f5f5; }}
+        .container {{ max-width: 600px; margin: 0 auto; background-color: white; border-radius: 8px; overflow: hidden; box-shadow: 0 2px 10px rgba(0,0,0,0.1); }}
+        .header {{ background-color: #dc3545; color: white; padding: 20px; text-align: center; }}
+        .header h1 {{ margin: 0; font-size: 24px; }}
+        .content {{ padding: 30px; }}
+        .order-id {{ background-color: #f8d7da; padding: 15px; border-radius: 5px; margin: 20px 0; text-align: center; font-weight: bold; color: #721c24; }}
+        .section {{ margin-bottom: 30px; }}
+        .section h3 {{ color: #333; border-bottom: 2px solid #dc3545; padding-bottom: 5px; margin-bottom: 15px; }}
+        .details-row {{ display: flex; justify-content: space-between; margin: 10px 0; padding: 8px 0; }}
+        .details-label {{ font-weight: 500; color: #555; }}
+        .details-value {{ color: #333; }}
+        .total-row {{ background-color: #dc3545; color: white; padding: 15px; margin: 10px 0; border-radius: 5px; font-weight: bold; font-size: 18px; }}
+        .retry-steps {{ background-color: #fff3cd; border: 1px solid #ffeaa7; border-radius: 5px; padding: 20px; margin: 20px 0; }}
+        .retry-steps h3 {{ color: #856404; margin-top: 0; }}
+        .retry-steps ol {{ color: #856404; }}
+        .error-info {{ background-color: #f8d7da; border-left: 4px solid #dc3545; padding: 15px; margin: 20px 0; color: #721c24; }}
+        .footer {{ text-align: center; padding: 20px; background-color: #333; color: white; }}
+        .support-link {{ color: #dc3545; text-decoration: none; }}
+        .retry-button {{ display: inline-block; background-color: #28a745; color: white; padding: 12px 24px; text-decoration: none; border-radius: 5px; margin: 10px 0; }}
+    </style>
+</head>
+<body>
+    <div class="container">
+        <div class="header">
+            <h1>⚠️ Payment Failed</h1>
+        </div>
+        
+        <div class="content">
+            <p>Dear <strong>{order_details.get('name', 'N/A')}</strong>,</p>
+            
+            <p>We're sorry to inform you that your payment for <a href="https://advolcano.io" style="color: #dc3545; text-decoration: none;">advolcano.io</a> could not be processed.</p>
+            
+            <div class="order-id">
+                Order ID: {payment_details.get('razorpay_order_id', 'N/A')}
+            </div>
+            
+            <div class="error-info">
+                <strong>Payment Status:</strong> Failed<br>
+                <strong>Reason:</strong> {payment_details.get('failure_reason', 'Payment verification failed')}<br>
+                <strong>Failed On:</strong> {formatted_time}
+            </div>
+            
+            <div class="section">
+                <h3>Order Details</h3>
+                <div class="details-row">
+                    <span class="details-label">AdVolcano Name :</span>
+                    <span class="details-value">{order_details.get('name', 'N/A')}</span>
+                </div>
+                <div class="details-row">
+                    <span class="details-label">AdVolcano Email :</span>
+                    <span class="details-value">{order_details.get('email', 'N/A')}</span>
+                </div>
+                <div class="details-row">
+                    <span class="details-label">Order ID :</span>
+                    <span class="details-value">{payment_details.get('razorpay_order_id', 'N/A')}</span>
+                </div>
+            </div>
+            
+            <div class="section">
+                <h3>Payment Summary</h3>
+                <div class="details-row">
+                    <span class="details-label">Base Amount (USD)</span>
+                    <span class="details-value">${order_details.get('amount_usd', 0):.2f}</span>
+                </div>
+                <div class="details-row">
+                    <span class="details-label">Base Amount (INR)</span>
+                    <span class="details-value">₹{order_details.get('amount_inr', 0):.2f}</span>
+                </div>
+                <div class="details-row">
+                    <span class="details-label">Platform Fee</span>
+                    <span class="details-value">₹{order_details.get('commission', 0):.2f}</span>
+                </div>
+                <div class="details-row">
+                    <span class="details-label">TAX (GST - 18%)</span>
+                    <span class="details-value">₹{order_details.get('gst', 0):.2f}</span>
+                </div>
+                <div class="total-row">
+                    <div style="display: flex; justify-content: space-between;">
+                        <span>TOTAL AMOUNT:</span>
+                        <span>₹{order_details.get('total_amount', 0):.2f}</span>
+                    </div>
+                </div>
+            </div>
+            
+            <div class="retry-steps">
+                <h3>What to do next?</h3>
+                <ol>
+                    <li>Check your internet connection and try again</li>
+                    <li>Ensure you have sufficient balance in your payment method</li>
+                    <li>Try using a different payment method (card/UPI/net banking)</li>
+                    <li>Contact your bank if the issue persists</li>
+                    <li>Contact our support team for assistance</li>
+                </ol>
+                
+                <div style="text-align: center; margin-top: 20px;">
+                    <a href="https://advolcano.io/retry-payment?order_id={payment_details.get('razorpay_order_id', 'N/A')}" class="retry-button">Retry Payment</a>
+                </div>
+            </div>
+            
+            <p>If you continue to experience issues, please contact us at <a href="mailto:support@advolcano.io" class="support-link">support@advolcano.io</a> with your Order ID: <strong>{payment_details.get('razorpay_order_id', 'N/A')}</strong></p>
+            
+            <p>Best regards,<br>
+            <strong>AdVolcano Team</strong></p>
+        </div>
+        
+        <div class="footer">
+            © 2025 AdVolcano. All rights reserved.
+        </div>
+    </div>
+</body>
+</html>
+"""
+
+    plain_text_body = f"""
+⚠️ Payment Failed
+
+Dear {order_details.get('name', 'N/A')},
+
+We're sorry to inform you that your payment for advolcano.io could not be processed.
+
+Order ID: {payment_details.get('razorpay_order_id', 'N/A')}
+
+Payment Status: Failed
+Reason: {payment_details.get('failure_reason', 'Payment verification failed')}
+Failed On: {formatted_time}
+
+Order Details
+AdVolcano Name : {order_details.get('name', 'N/A')}
+AdVolcano Email : {order_details.get('email', 'N/A')}
+Order ID : {payment_details.get('razorpay_order_id', 'N/A')}
+
+Payment Summary
+Base Amount (USD): ${order_details.get('amount_usd', 0):.2f}
+Base Amount (INR): ₹{order_details.get('amount_inr', 0):.2f}
+Platform Fee: ₹{order_details.get('commission', 0):.2f}
+TAX (GST - 18%): ₹{order_details.get('gst', 0):.2f}
+TOTAL AMOUNT: ₹{order_details.get('total_amount', 0):.2f}
+
+What to do next?
+1. Check your internet connection and try again
+2. Ensure you have sufficient balance in your payment method
+3. Try using a different payment method (card/UPI/net banking)
+4. Contact your bank if the issue persists
+5. Contact our support team for assistance
+
+Retry Payment: https://advolcano.io/retry-payment?order_id={payment_details.get('razorpay_order_id', 'N/A')}
+
+If you continue to experience issues, please contact us at support@advolcano.io with your Order ID: {payment_details.get('razorpay_order_id', 'N/A')}
+
+Best regards,
+AdVolcano Team
+
+© 2025 AdVolcano. All rights reserved.
+"""
+    return html_body, plain_text_body
+
+
+def contact_enquiry(full_name, email, company, subject, phone, message, timestamp):
+    """Arguments already HTML-escaped, as create_simple_professional_template did."""
+    return f"""<!DOCTYPE html>
+<html lang="en">
+<head>
+    <meta charset="UTF-8">
+    <meta name="viewport" content="width=device-width, initial-scale=1.0">
+    <title>Contact Enquiry</title>
+</head>
+<body style="margin: 0; padding: 0; font-family: -apple-system, BlinkMacSystemFont, 'Segoe UI', Roboto, Arial, sans-serif; line-height: 1.5; color: #333333; background-color: #f5f5f5;">
+    <table cellpadding="0" cellspacing="0" border="0" width="100%" style="background-color: #f5f5f5; margin: 0; padding: 20px 0;">
+        <tr>
+            <td align="center" valign="top">
+                <!-- Main Container -->
+                <table cellpadding="0" cellspacing="0" border="0" width="600" style="max-width: 600px; background-color: #ffffff; border: 1px solid #e0e0e0; border-radius: 8px; overflow: hidden;">
+                    
+                    <!-- Header -->
+                    <tr>
+                        <td style="background-color: #ffffff; padding: 30px 30px 20px 30px; text-align: center;">
+                            <h1 style="margin: 0; font-size: 24px; font-weight: 600; color: #4a5568; font-family: -apple-system, BlinkMacSystemFont, 'Segoe UI', Roboto, Arial, sans-serif;">
+                                Contact Enquiry
+                            </h1>
+                        </td>
+                    </tr>
+                    
+                    <!-- Content -->
+                    <tr>
+                        <td style="padding: 0 30px 30px 30px;">
+                            
+                            <!-- Greeting -->
+                            <div style="margin-bottom: 25px; font-size: 15px; color: #718096; line-height: 1.5;">
+                                Hello Team,
+                            </div>
+                            
+                            <div style="margin-bottom: 30px; font-size: 15px; color: #718096; line-height: 1.5;">
+                                You have received a new enquiry from website.
+                            </div>
+                            
+                            <!-- Contact Information Table -->
+                            <table cellpadding="0" cellspacing="0" border="0" width="100%" style="background-color: #f7fafc; border: 1px solid #e2e8f0; border-radius: 6px; margin: 25px 0;">
+                                <tr>
+                                    <td style="padding: 25px;">
+                                        
+                                        <!-- Name Row -->
+                                        <table cellpadding="0" cellspacing="0" border="0" width="100%" style="margin-bottom: 15px;">
+                                            <tr>
+                                                <td width="100" style="font-weight: 600; color: #4a5568; padding-right: 15px; vertical-align: top; font-size: 14px;">
+                                                    Name:
+                                                </td>
+                                                <td style="color: #2d3748; font-size: 14px;">
+                                                    {full_name}
+                                                </td>
+                                            </tr>
+                                        </table>
+                                        
+                                        <!-- Email Row -->
+                                        <table cellpadding="0" cellspacing="0" border="0" width="100%" style="margin-bottom: 15px;">
+                                            <tr>
+                                                <td width="100" style="font-weight: 600; color: #4a5568; padding-right: 15px; vertical-align: top; font-size: 14px;">
+                                                    Email:
+                                                </td>
+                                                <td style="color: #2d3748; font-size: 14px;">
+                                                    <a href="mailto:{email}" style="color: #3182ce; text-decoration: none;">
+                                                        {email}
+                                                    </a>
+                                                </td>
+                                            </tr>
+                                        </table>
+                                        
+                                        <!-- Company Row -->
+                                        <table cellpadding="0" cellspacing="0" border="0" width="100%" style="margin-bottom: 15px;">
+                                            <tr>
+                                                <td width="100" style="font-weight: 600; color: #4a5568; padding-right: 15px; vertical-align: top; font-size: 14px;">
+                                                    Company:
+                                                </td>
+                                                <td style="color: #2d3748; font-size: 14px;">
+                                                    {company}
+                                                </td>
+                                            </tr>
+                                        </table>
+                                        
+                                        <!-- Subject Row -->
+                                        <table cellpadding="0" cellspacing="0" border="0" width="100%" style="margin-bottom: 15px;">
+                                            <tr>
+                                                <td width="100" style="font-weight: 600; color: #4a5568; padding-right: 15px; vertical-align: top; font-size: 14px;">
+                                                    Subject:
+                                                </td>
+                                                <td style="color: #2d3748; font-size: 14px;">
+                                                    {subject}
+                                                </td>
+                                            </tr>
+                                        </table>
+                                        
+                                        <!-- Phone Row -->
+                                        <table cellpadding="0" cellspacing="0" border="0" width="100%">
+                                            <tr>
+                                                <td width="100" style="font-weight: 600; color: #4a5568; padding-right: 15px; vertical-align: top; font-size: 14px;">
+                                                    Phone:
+                                                </td>
+                                                <td style="color: #2d3748; font-size: 14px;">
+                                                    {phone}
+                                                </td>
+                                            </tr>
+                                        </table>
+                                        
+                                    </td>
+                                </tr>
+                            </table>
+                            
+                            <!-- Message Section -->
+                            <div style="margin: 30px 0 0 0;">
+                                <div style="font-weight: 600; color: #4a5568; margin-bottom: 15px; font-size: 14px;">
+                                    Message:
+                                </div>
+                                <div style="background-color: #f7fafc; border: 1px solid #e2e8f0; border-radius: 6px; padding: 20px; color: #2d3748; line-height: 1.6; min-height: 60px; font-size: 14px;">
+                                    {message if message.strip() else '<span style="color: #a0aec0; font-style: italic;">No message provided</span>'}
+                                </div>
+                            </div>
+                            
+                        </td>
+                    </tr>
+                    
+                    <!-- Footer -->
+                    <tr>
+                        <td style="background-color: #f7fafc; padding: 20px 30px; border-top: 1px solid #e2e8f0; font-size: 13px; color: #718096;">
+                            
+                            <div style="margin-bottom: 8px;">
+                                <strong>Submitted:</strong> {timestamp}
+                            </div>
+                            <div style="margin-bottom: 8px;">
+                                <strong>Source:</strong> Website Contact Form
+                            </div>
+                            <div>
+                                <strong>Reply to:</strong> 
+                                <a href="mailto:{email}" style="color: #3182ce; text-decoration: none;">
+                                    {email}
+                                </a>
+                            </div>
+                            
+                        </td>
+                    </tr>
+                    
+                </table>
+            </td>
+        </tr>
+    </table>
+</body>
+</html>"""
+
+
+def demo_request(interest, full_name, email, company, message, timestamp):
+    return f"""<!DOCTYPE html>
+<html lang="en">
+<head>
+    <meta charset="UTF-8">
+    <meta name="viewport" content="width=device-width, initial-scale=1.0">
+    <title>New Demo Request</title>
+</head>
+<body style="margin: 0; padding: 0; font-family: -apple-system, BlinkMacSystemFont, 'Segoe UI', Roboto, sans-serif;">
+    <div style="max-width: 650px; margin: 0 auto; padding: 40px; background-color: #f9f9f9;">
+        <div style="background-color: white; padding: 32px; border-radius: 8px; box-shadow: 0 1px 3px rgba(0,0,0,0.1);">
+            <h2 style="color: #4a5568; font-size: 20px; font-weight: 600; margin: 0 0 24px 0; display: flex; align-items: center;">
+                <span style="margin-right: 8px;">📩</span> New Demo Request
+            </h2>
+            <p style="font-size: 16px; color: #2d3748; margin: 0 0 24px 0;">
+                You've received a new demo request from <a href="https://advolcano.io" style="color: #3182ce; text-decoration: none;">advolcano.io</a>
+            </p>
+            <div style="background-color: #f7fafc; padding: 20px; border-radius: 6px; margin: 24px 0;">
+                <table style="width: 100%; border-collapse: collapse;">
+                    <tr>
+                        <td style="padding: 8px 0; color: #4a5568; font-weight: 600; width: 140px; vertical-align: top;">Interest</td>
+                        <td style="padding: 8px 0; color: #2d3748;">: {interest}</td>
+                    </tr>
+                    <tr>
+                        <td style="padding: 8px 0; color: #4a5568; font-weight: 600; vertical-align: top;">Full Name</td>
+                        <td style="padding: 8px 0; color: #2d3748;">: {full_name}</td>
+                    </tr>
+                    <tr>
+                        <td style="padding: 8px 0; color: #4a5568; font-weight: 600; vertical-align: top;">Email</td>
+                        <td style="padding: 8px 0; color: #2d3748;">: <a href="mailto:{email}" style="color: #3182ce; text-decoration: none;">{email}</a></td>
+                    </tr>
+                    <tr>
+                        <td style="padding: 8px 0; color: #4a5568; font-weight: 600; vertical-align: top;">Company</td>
+                        <td style="padding: 8px 0; color: #2d3748;">: {company}</td>
+                    </tr>
+                    <tr>
+                        <td style="padding: 8px 0; color: #4a5568; font-weight: 600; vertical-align: top;">Message</td>
+                        <td style="padding: 8px 0; color: #2d3748;">: {message}</td>
+                    </tr>
+                </table>
+            </div>
+            <p style="margin: 24px 0 0 0; font-size: 14px; color: #718096;">
+                This demo request generated from <strong>Advolcano.io</strong> {timestamp}
+            </p>
+        </div>
+    </div>
+</body>
+</html>"""
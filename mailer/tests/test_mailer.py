@@ -0,0 +1,386 @@
+import html
+import threading
+import time
+from datetime import timedelta
+from io import StringIO
+from unittest import mock
+
+from django.core.management import call_command
+from django.db import connection
+from django.test import TestCase, TransactionTestCase, override_settings
+from django.utils import timezone
+
+from contact.views import create_simple_professional_template
+from payments_razorpay import views as payment_views
+
+from mailer import dispatcher as dispatcher_module
+from mailer import outbox
+from mailer import transport as transport_module
+from mailer.dispatcher import MailDispatcher, MailQueueFull
+from mailer.governor import RateGovernor, SendThrottled
+from mailer.models import OutboundEmail
+from payments.breakers import CircuitBreaker, CircuitOpen
+from mailer.transport import SendGridError, get_transport
+
+from . import email_baseline as baseline
+
+
+def wait_for(condition, timeout=5.0):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        if time.monotonic() > deadline:
+            raise AssertionError("condition not met in time")
+        time.sleep(0.01)
+
+
+class Sent:
+    status_code = 202
+
+
+class DispatcherOverflowTests(TestCase):
+    def full_dispatcher(self, policy, *categories):
+        # No workers: whatever is submitted stays queued
+        dispatcher = MailDispatcher(max_size=len(categories), workers=0, overflow_policy=policy)
+        for n, category in enumerate(categories):
+            dispatcher.submit({'n': n}, category)
+        return dispatcher
+
+    def test_reject_raises_when_full(self):
+        dispatcher = self.full_dispatcher('reject', 'contact', 'contact')
+
+        with self.assertRaises(MailQueueFull):
+            dispatcher.submit({'n': 2}, 'payment_receipt')
+
+        stats = dispatcher.stats()
+        self.assertEqual((stats['rejected'], stats['queue_depth']), (1, 2))
+
+    def test_drop_oldest_discards_the_oldest_least_important_message(self):
+        dispatcher = self.full_dispatcher('drop_oldest', 'contact', 'payment_receipt', 'contact')
+
+        dispatcher.submit({'n': 3}, 'payment_failure')
+
+        self.assertEqual(dispatcher.depth_by_category(), {'payment_receipt': 1, 'payment_failure': 1, 'contact': 1})
+        self.assertEqual(dispatcher._levels[dispatcher.priority_for('contact')][0].mail, {'n': 2})
+        self.assertEqual(dispatcher.stats()['dropped'], 1)
+
+    def test_drop_oldest_discards_a_new_message_less_important_than_the_queue(self):
+        dispatcher = self.full_dispatcher('drop_oldest', 'payment_receipt', 'payment_receipt')
+
+        queued = dispatcher.submit({'n': 2}, 'contact')
+
+        self.assertIsNone(queued.outbox_id)
+        self.assertEqual(dispatcher.depth_by_category(), {'payment_receipt': 2})
+        self.assertEqual(dispatcher.stats()['dropped'], 1)
+
+    def test_spill_moves_the_new_message_to_the_outbox(self):
+        dispatcher = self.full_dispatcher('spill', 'contact', 'contact')
+
+        with mock.patch.object(dispatcher_module, 'enqueue_mail', return_value=mock.Mock(id=9)) as enqueue:
+            queued = dispatcher.submit({'n': 2}, 'payment_receipt')
+
+        enqueue.assert_called_once_with({'n': 2}, 'payment_receipt')
+        self.assertEqual(queued.outbox_id, 9)
+        stats = dispatcher.stats()
+        self.assertEqual((stats['spilled'], stats['queue_depth']), (1, 2))
+
+    def test_payment_mail_is_taken_first(self):
+        dispatcher = self.full_dispatcher('reject', 'contact', 'demo', 'payment_receipt')
+
+        taken = [dispatcher._take().category for _ in range(3)]
+
+        self.assertEqual(taken, ['payment_receipt', 'demo', 'contact'])
+
+
+class DispatcherThrottlingTests(TestCase):
+    def test_rate_limited_message_is_requeued_and_retried_after_retry_after(self):
+        calls = []
+
+        def send(mail):
+            calls.append(time.monotonic())
+            if len(calls) == 1:
+                raise SendGridError(429, 'slow down', {'Retry-After': '0.2'})
+            return Sent()
+
+        dispatcher = MailDispatcher(workers=1)
+        with mock.patch.object(dispatcher_module, 'send_mail_now', send):
+            dispatcher.submit({'n': 1}, 'contact')
+            wait_for(lambda: dispatcher.stats()['sent'] == 1)
+
+        stats = dispatcher.stats()
+        self.assertEqual(stats['requeued'], 1)
+        self.assertEqual(stats['failed'], 0)
+        self.assertEqual(len(calls), 2)
+        # Retry-After plus up to 20% jitter
+        self.assertGreaterEqual(calls[1] - calls[0], 0.2)
+        self.assertLess(calls[1] - calls[0], 0.2 * 1.2 + 0.2)
+
+    def test_message_out_of_retries_moves_to_outbox(self):
+        def send(mail):
+            raise SendGridError(429, 'slow down', {'Retry-After': '0'})
+
+        dispatcher = MailDispatcher(workers=0)
+        job = dispatcher_module._Job({'n': 1}, 'contact')
+        job.throttled = dispatcher_module.MAIL_THROTTLE_RETRIES
+        outbound = mock.Mock(id=7)
+        with mock.patch.object(dispatcher_module, 'enqueue_mail', return_value=outbound) as enqueue:
+            self.assertTrue(dispatcher._requeue_throttled(job, 0))
+        enqueue.assert_called_once_with({'n': 1}, 'contact')
+        self.assertEqual(dispatcher.stats()['spilled'], 1)
+        self.assertEqual(dispatcher.stats()['queue_depth'], 0)
+
+    def test_requeue_reports_failure_when_outbox_is_unavailable(self):
+        dispatcher = MailDispatcher(workers=0)
+        job = dispatcher_module._Job({'n': 1}, 'contact')
+        job.throttled = dispatcher_module.MAIL_THROTTLE_RETRIES
+        with mock.patch.object(dispatcher_module, 'enqueue_mail', side_effect=RuntimeError('db down')):
+            self.assertFalse(dispatcher._requeue_throttled(job, 0))
+
+    def test_worker_sleeps_while_governor_is_paused(self):
+        calls = []
+
+        def send(mail):
+            calls.append(time.monotonic())
+            if len(calls) == 1:
+                raise SendThrottled(0.3)
+            return Sent()
+
+        dispatcher = MailDispatcher(workers=1)
+        with mock.patch.object(dispatcher_module, 'send_mail_now', send):
+            dispatcher.submit({'n': 1}, 'contact')
+            wait_for(lambda: dispatcher.stats()['sent'] == 1)
+
+        # One retry after the pause, not a busy loop of take/raise/park
+        self.assertEqual(len(calls), 2)
+        self.assertGreaterEqual(calls[1] - calls[0], 0.3)
+
+
+class DispatcherDrainTests(TestCase):
+    def test_drain_waits_for_queued_messages(self):
+        sent = []
+
+        def send(mail):
+            time.sleep(0.05)
+            sent.append(mail)
+            return Sent()
+
+        dispatcher = MailDispatcher(workers=1)
+        with mock.patch.object(dispatcher_module, 'send_mail_now', send):
+            for n in range(3):
+                dispatcher.submit({'n': n}, 'contact')
+            self.assertEqual(dispatcher.drain(timeout=5), 0)
+        self.assertEqual(len(sent), 3)
+
+    def test_drain_moves_what_is_left_to_the_outbox(self):
+        dispatcher = MailDispatcher(workers=0)
+        dispatcher.submit({'n': 1}, 'payment_success')
+        with mock.patch.object(dispatcher_module, 'enqueue_mail', return_value=mock.Mock(id=3)) as enqueue:
+            self.assertEqual(dispatcher.drain(timeout=0.05), 1)
+        enqueue.assert_called_once_with({'n': 1}, 'payment_success')
+        self.assertEqual(dispatcher.stats()['queue_depth'], 0)
+
+
+def queue_outbound(count=1, **fields):
+    return [
+        OutboundEmail.objects.create(category='contact', subject=f'm{n}', payload={'n': n}, **fields)
+        for n in range(count)
+    ]
+
+
+class OutboxClaimTests(TransactionTestCase):
+    def test_concurrent_workers_claim_each_message_once(self):
+        if connection.vendor == 'sqlite' and connection.is_in_memory_db():
+            # Shared-cache mode: a second thread's write fails at once with "table is locked"
+            self.skipTest('in-memory SQLite does not allow concurrent writers')
+        queue_outbound(20)
+        claimed = []
+        start = threading.Barrier(4)
+
+        def worker():
+            try:
+                start.wait()
+                claimed.extend(outbound.id for outbound in outbox.claim_batch(10))
+            finally:
+                connection.close()
+
+        threads = [threading.Thread(target=worker) for _ in range(4)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(len(claimed), len(set(claimed)))
+        self.assertEqual(
+            sorted(claimed),
+            sorted(OutboundEmail.objects.filter(status=OutboundEmail.STATUS_SENDING).values_list('id', flat=True)),
+        )
+
+    def test_workers_split_the_due_messages(self):
+        queue_outbound(5)
+        queue_outbound(1, next_attempt_at=timezone.now() + timedelta(minutes=5))
+
+        first = {outbound.id for outbound in outbox.claim_batch(3)}
+        second = {outbound.id for outbound in outbox.claim_batch(3)}
+
+        self.assertEqual((len(first), len(second)), (3, 2))
+        self.assertFalse(first & second)
+        self.assertEqual(outbox.claim_batch(3), [])
+
+    def test_stale_claims_are_released(self):
+        stale, fresh = queue_outbound(2, status=OutboundEmail.STATUS_SENDING)
+        OutboundEmail.objects.filter(pk=stale.pk).update(claimed_at=timezone.now() - timedelta(hours=1))
+        OutboundEmail.objects.filter(pk=fresh.pk).update(claimed_at=timezone.now())
+
+        self.assertEqual(outbox.release_stale_claims(lease=600), 1)
+        self.assertEqual(OutboundEmail.objects.get(pk=stale.pk).status, OutboundEmail.STATUS_PENDING)
+
+
+@mock.patch.object(outbox.random, 'uniform', lambda low, high: 1.0)
+class OutboxRetryTests(TestCase):
+    def setUp(self):
+        self.outbound, = queue_outbound(status=OutboundEmail.STATUS_SENDING)
+
+    def send(self, error, **kwargs):
+        with mock.patch.object(outbox, 'send_mail_now', side_effect=error):
+            outcome = outbox.send_outbound(self.outbound, **kwargs)
+        self.outbound.refresh_from_db()
+        return outcome
+
+    def retry_in(self):
+        return (self.outbound.next_attempt_at - timezone.now()).total_seconds()
+
+    def test_backoff_doubles_up_to_the_cap(self):
+        delays = [outbox._backoff_seconds(attempts) for attempts in range(1, 10)]
+        self.assertEqual(delays, [30, 60, 120, 240, 480, 960, 1920, 3600, 3600])
+
+    def test_failed_attempt_is_rescheduled_with_backoff(self):
+        self.assertIs(self.send(SendGridError(500, 'oops')), False)
+        self.send(SendGridError(500, 'oops'))
+
+        self.assertEqual((self.outbound.status, self.outbound.attempts), (OutboundEmail.STATUS_PENDING, 2))
+        self.assertAlmostEqual(self.retry_in(), 60, delta=2)
+        self.assertEqual(self.outbound.response_status, 500)
+
+    def test_message_fails_for_good_after_max_attempts(self):
+        OutboundEmail.objects.filter(pk=self.outbound.pk).update(attempts=4)
+        self.outbound.refresh_from_db()
+
+        self.assertIs(self.send(SendGridError(503, 'unavailable'), max_attempts=5), False)
+
+        self.assertEqual((self.outbound.status, self.outbound.attempts), (OutboundEmail.STATUS_FAILED, 5))
+
+    def test_rejected_payload_is_not_retried(self):
+        self.send(SendGridError(400, 'bad request'))
+        self.assertEqual((self.outbound.status, self.outbound.attempts), (OutboundEmail.STATUS_FAILED, 1))
+
+    def test_open_breaker_parks_without_using_an_attempt(self):
+        self.assertIsNone(self.send(CircuitOpen('sendgrid', 20)))
+
+        self.assertEqual((self.outbound.status, self.outbound.attempts), (OutboundEmail.STATUS_PENDING, 0))
+        self.assertAlmostEqual(self.retry_in(), 20, delta=2)
+
+    def test_rate_limited_send_parks_until_retry_after(self):
+        self.assertIsNone(self.send(SendGridError(429, 'slow down', {'Retry-After': '45'})))
+
+        self.assertEqual((self.outbound.status, self.outbound.attempts), (OutboundEmail.STATUS_PENDING, 0))
+        self.assertAlmostEqual(self.retry_in(), 45, delta=2)
+
+
+class OutboxSpillTests(TestCase):
+    def test_spilled_message_is_delivered_by_send_outbox(self):
+        dispatcher = MailDispatcher(max_size=1, workers=0, overflow_policy='spill')
+        dispatcher.submit({'subject': 'queued', 'personalizations': []}, 'contact')
+
+        queued = dispatcher.submit(
+            {'subject': 'spilled', 'personalizations': [{'to': [{'email': 'a@example.com'}]}]}, 'payment_success'
+        )
+
+        outbound = OutboundEmail.objects.get(pk=queued.outbox_id)
+        self.assertEqual((outbound.category, outbound.to_emails), ('payment_success', 'a@example.com'))
+
+        out = StringIO()
+        with mock.patch.object(outbox, 'send_mail_now', return_value=Sent()) as send:
+            call_command('send_outbox', '--once', stdout=out)
+
+        send.assert_called_once_with(outbound.payload)
+        outbound.refresh_from_db()
+        self.assertEqual((outbound.status, outbound.response_status), (OutboundEmail.STATUS_SENT, 202))
+        self.assertIn('1 sent, 0 failed', out.getvalue())
+
+
+class CompiledTemplateTests(TestCase):
+    ORDER = {
+        'name': 'Asha <Rao>', 'email': 'asha@example.com', 'amount_usd': 12.5,
+        'amount_inr': 1096.88, 'commission': 32.91, 'gst': 5.92, 'total_amount': 1135.71,
+    }
+    PAYMENT = {'razorpay_order_id': 'order_1', 'timestamp': 1760000000, 'failure_reason': 'Card declined'}
+
+    def render(self, html, text):
+        formatted_time = payment_views.customer_email_time(self.PAYMENT['timestamp'])
+        context = payment_views.customer_email_context(self.ORDER, self.PAYMENT, formatted_time)
+        context['failure_reason'] = self.PAYMENT['failure_reason']
+        return html.render(context), text.render(context)
+
+    def test_payment_emails_match_the_inline_fstrings(self):
+        self.assertEqual(
+            self.render(payment_views.SUCCESS_HTML, payment_views.SUCCESS_TEXT),
+            baseline.payment_success(self.ORDER, self.PAYMENT),
+        )
+        self.assertEqual(
+            self.render(payment_views.FAILURE_HTML, payment_views.FAILURE_TEXT),
+            baseline.payment_failure(self.ORDER, self.PAYMENT),
+        )
+
+    def test_contact_email_matches_the_inline_fstring(self):
+        for message in ('Call me <back>', '   '):
+            data = {'first_name': 'Asha', 'last_name': 'Rao', 'email': 'asha@example.com', 'message': message}
+            expected = baseline.contact_enquiry(
+                'Asha Rao', 'asha@example.com', 'Not specified', 'General Inquiry', 'Not provided',
+                html.escape(message.strip()), 'now',
+            )
+            self.assertEqual(create_simple_professional_template(data, 'now'), expected)
+
+
+@override_settings(SENDGRID_API_KEY='SG.configured')
+class TransportCacheTests(TestCase):
+    def setUp(self):
+        patcher = mock.patch.object(transport_module, '_transports', {})
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_configured_key_shares_one_transport(self):
+        self.assertIs(get_transport(), get_transport('SG.configured'))
+
+    def test_other_keys_are_not_cached(self):
+        first = get_transport('SG.admin-supplied')
+        self.assertIsNot(get_transport('SG.admin-supplied'), first)
+        self.assertEqual(list(transport_module._transports), [])
+        first.close()
+
+
+class TransportGovernorTests(TestCase):
+    def setUp(self):
+        self.transport = transport_module.SendGridTransport('SG.test', url='http://sendgrid.invalid/v3/mail/send')
+        self.addCleanup(self.transport.close)
+
+    def test_open_breaker_rejects_before_taking_a_send_slot(self):
+        breaker = CircuitBreaker('sendgrid-test', min_calls=1, open_seconds=60)
+        with self.assertRaises(RuntimeError), breaker:
+            raise RuntimeError('sendgrid down')
+        with mock.patch.object(transport_module, 'sendgrid_breaker', breaker), \
+                mock.patch.object(self.transport.session, 'post') as post:
+            with self.assertRaises(CircuitOpen):
+                self.transport.send({'n': 1})
+
+        post.assert_not_called()
+        self.assertEqual(self.transport.governor.stats()['granted'], 0)
+        self.assertEqual(self.transport.governor.stats()['tokens'], self.transport.governor.burst)
+
+    def test_no_slot_in_time_counts_as_deferred(self):
+        governor = RateGovernor(rate=1, burst=1)
+        governor.acquire()
+        with self.assertRaises(SendThrottled):
+            governor.acquire(max_wait=0.01)
+
+        stats = governor.stats()
+        self.assertEqual((stats['granted'], stats['deferred']), (1, 1))
+        self.assertNotIn('dropped', stats)
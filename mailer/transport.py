@@ -0,0 +1,163 @@
+import json
+import logging
+import threading
+
+from requests import Session
+from django.conf import settings
+
+from payments.breakers import CircuitOpen, get_breaker
+from payments.deadlines import upstream_call, upstream_timeout
+from payments.pools import TrackingHTTPAdapter
+
+from .governor import RateGovernor, retry_after_seconds
+
+logger = logging.getLogger(__name__)
+
+# === Transport configuration ===
+SENDGRID_API_URL = getattr(settings, 'SENDGRID_API_URL', 'https://api.sendgrid.com/v3/mail/send')
+SENDGRID_POOL_SIZE = getattr(settings, 'SENDGRID_POOL_SIZE', 10)
+SENDGRID_CONNECT_TIMEOUT = getattr(settings, 'SENDGRID_CONNECT_TIMEOUT', 3.05)
+SENDGRID_READ_TIMEOUT = getattr(settings, 'SENDGRID_READ_TIMEOUT', 10)
+
+
+class SendGridError(Exception):
+    """Non-2xx answer from the SendGrid API."""
+
+    def __init__(self, status_code, body, headers=None):
+        super().__init__(f"HTTP Error {status_code}: {body[:500] if body else ''}")
+        self.status_code = status_code
+        self.body = body
+        self.headers = headers or {}
+        self.retry_after = retry_after_seconds(self.headers) if status_code == 429 else None
+
+
+def _is_sendgrid_failure(exc):
+    # 4xx is a problem with the message, not with SendGrid; 429s are the governor's job
+    if isinstance(exc, SendGridError):
+        return exc.status_code >= 500
+    return True
+
+
+sendgrid_breaker = get_breaker('sendgrid', is_failure=_is_sendgrid_failure)
+
+
+class SendGridTransport:
+    """
+    Keep-alive HTTPS transport for SendGrid's v3 ``mail/send`` endpoint.
+
+    ``SendGridAPIClient`` goes through urllib and opens a new TLS connection per
+    message; this keeps a pooled requests Session per API key instead, with
+    one ``RateGovernor`` pacing every send made with that key.
+    """
+
+    def __init__(self, api_key, pool_size=SENDGRID_POOL_SIZE,
+                 connect_timeout=SENDGRID_CONNECT_TIMEOUT, read_timeout=SENDGRID_READ_TIMEOUT,
+                 url=SENDGRID_API_URL):
+        self.url = url
+        self.connect_timeout = connect_timeout
+        self.read_timeout = read_timeout
+        self.session = Session()
+        self.adapter = TrackingHTTPAdapter(pool_connections=1, pool_maxsize=pool_size)
+        self.session.mount('https://', self.adapter)
+        self.session.mount('http://', self.adapter)
+        self.session.headers.update({
+            'Authorization': f'Bearer {api_key}',
+            'Content-Type': 'application/json',
+            'User-Agent': 'advolcano-mailer',
+        })
+        self.governor = RateGovernor()
+        self._lock = threading.Lock()
+        self.sent = 0
+        self.errors = 0
+
+    def send(self, mail, timeout=None):
+        """
+        POST ``mail`` (a sendgrid ``Mail`` or a v3 payload dict) and return the response.
+
+        Raises ``CircuitOpen`` straight away while the SendGrid breaker is
+        open, so a send that would be rejected does not use up rate budget.
+        Otherwise waits for a slot from the key's governor, for no longer than
+        the current deadline allows (``SendThrottled`` otherwise). Raises
+        ``SendGridError`` on a non-2xx status (with ``retry_after`` set on a
+        429), ``UpstreamTimeout`` (or ``DeadlineExceeded``) when SendGrid is
+        too slow; connection problems surface as the usual ``requests``
+        exceptions. The read timeout is capped by whatever is left of the
+        current deadline.
+        """
+        payload = mail if isinstance(mail, dict) else mail.get()
+        sendgrid_breaker.check()
+        self.governor.acquire(max_wait=upstream_timeout('sendgrid'))
+        try:
+            with upstream_call('sendgrid', timeout or self.read_timeout, 'mail.send') as read_timeout, sendgrid_breaker:
+                response = self.session.post(
+                    self.url,
+                    data=json.dumps(payload),
+                    timeout=(min(self.connect_timeout, read_timeout), read_timeout),
+                )
+                if response.status_code >= 300:
+                    raise SendGridError(response.status_code, response.text, response.headers)
+        except SendGridError as e:
+            if e.retry_after is not None:
+                self.governor.throttled(e.retry_after)
+            with self._lock:
+                self.errors += 1
+            raise
+        except CircuitOpen:
+            raise
+        except Exception:
+            with self._lock:
+                self.errors += 1
+            raise
+
+        self.governor.succeeded()
+        with self._lock:
+            self.sent += 1
+        return response
+
+    def stats(self):
+        connections, requests_served = self.adapter.pool_stats()
+        return {
+            'sent': self.sent,
+            'errors': self.errors,
+            'connections_opened': connections,
+            'requests_served': requests_served,
+            'connections_reused': max(requests_served - connections, 0),
+            'governor': self.governor.stats(),
+        }
+
+    def close(self):
+        self.session.close()
+
+
+_transports = {}
+_transports_lock = threading.Lock()
+
+
+def get_transport(api_key=None):
+    """
+    Shared transport for settings.SENDGRID_API_KEY (the default). Only that key
+    is cached: any other one, such as a key being tried out in admin setup,
+    gets a transport of its own that the caller closes when done.
+    """
+    if api_key is None:
+        api_key = settings.SENDGRID_API_KEY
+    elif api_key != settings.SENDGRID_API_KEY:
+        return SendGridTransport(api_key)
+    transport = _transports.get(api_key)
+    if transport is None:
+        with _transports_lock:
+            transport = _transports.get(api_key)
+            if transport is None:
+                transport = SendGridTransport(api_key)
+                _transports[api_key] = transport
+    return transport
+
+
+def transport_stats():
+    """Reuse metrics for every transport in this process, keyed by a masked API key."""
+    with _transports_lock:
+        transports = dict(_transports)
+    return {
+        f"{(api_key or '')[:6]}...": transport.stats()
+        for api_key, transport in transports.items()
+    }
@@ -0,0 +1,6 @@
+from django.urls import path
+from .views import MailQueueStatsAPIView
+
+urlpatterns = [
+    path('mail/stats/', MailQueueStatsAPIView.as_view(), name='mail-stats'),
+]
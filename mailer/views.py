@@ -0,0 +1,18 @@
+from rest_framework.views import APIView
+from rest_framework.response import Response
+from rest_framework import status
+
+from .dispatcher import dispatcher
+from .transport import transport_stats
+
+
+class MailQueueStatsAPIView(APIView):
+    """
+    Queue depth, outcome counters and send latency of this worker's mail dispatcher,
+    plus connection reuse of the pooled SendGrid transport
+    """
+    def get(self, request):
+        return Response({
+            **dispatcher.stats(),
+            "transport": transport_stats(),
+        }, status=status.HTTP_200_OK)
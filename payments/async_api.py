@@ -0,0 +1,46 @@
+import json
+
+from rest_framework.response import Response
+from django.http import JsonResponse
+from django.utils.decorators import classonlymethod
+from django.views import View
+from django.views.decorators.csrf import csrf_exempt
+
+
+class AsyncAPIView(View):
+    """
+    Small async counterpart to DRF's ``APIView`` for the ASGI endpoints.
+
+    DRF views are sync-only. Subclasses define ``async def post/get`` that read
+    ``request.data`` (parsed JSON or form data) and return a DRF ``Response``,
+    exactly like the sync views, which is rendered here as a ``JsonResponse``.
+    CSRF is not enforced, as with DRF's unauthenticated views.
+    """
+
+    @classonlymethod
+    def as_view(cls, **initkwargs):
+        return csrf_exempt(super().as_view(**initkwargs))
+
+    def setup(self, request, *args, **kwargs):
+        super().setup(request, *args, **kwargs)
+        self.parse_error = None
+        if request.content_type == 'application/json':
+            try:
+                request.data = json.loads(request.body or b'{}')
+            except ValueError as e:
+                request.data = {}
+                self.parse_error = f"JSON parse error - {e}"
+        else:
+            request.data = request.POST
+
+    async def dispatch(self, request, *args, **kwargs):
+        if self.parse_error:
+            return JsonResponse({"detail": self.parse_error}, status=400)
+        response = await super().dispatch(request, *args, **kwargs)
+        if isinstance(response, Response):
+            rendered = JsonResponse(response.data, status=response.status_code, safe=False)
+            for header, value in response.items():
+                if header.lower() != 'content-type':
+                    rendered[header] = value
+            return rendered
+        return response
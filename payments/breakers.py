@@ -0,0 +1,216 @@
+import logging
+import threading
+import time
+from collections import deque
+
+from rest_framework.response import Response
+from rest_framework import status
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
+
+# === Circuit breaker configuration ===
+BREAKER_WINDOW = getattr(settings, 'BREAKER_WINDOW', 30)
+BREAKER_FAILURE_RATE = getattr(settings, 'BREAKER_FAILURE_RATE', 0.5)
+BREAKER_MIN_CALLS = getattr(settings, 'BREAKER_MIN_CALLS', 10)
+BREAKER_OPEN_SECONDS = getattr(settings, 'BREAKER_OPEN_SECONDS', 30)
+BREAKER_HALF_OPEN_CALLS = getattr(settings, 'BREAKER_HALF_OPEN_CALLS', 1)
+
+CLOSED = 'closed'
+OPEN = 'open'
+HALF_OPEN = 'half_open'
+
+
+class CircuitOpen(Exception):
+    """The upstream's breaker is open: the call was refused without being made."""
+
+    def __init__(self, name, retry_in):
+        super().__init__(f"{name} circuit open, retry in {retry_in:.1f}s")
+        self.name = name
+        self.retry_in = retry_in
+
+
+class CircuitBreaker:
+    """
+    Closed / open / half-open breaker for one upstream, shared by every thread
+    of the process.
+
+    - closed: calls go through; outcomes from the last ``window`` seconds are
+      kept, and once at least ``min_calls`` of them show a failure rate of
+      ``failure_rate`` or more the breaker opens
+    - open: calls raise ``CircuitOpen`` straight away for ``open_seconds``
+    - half-open: up to ``half_open_calls`` probe calls go through; a success
+      closes the breaker, a failure opens it again
+
+    ``is_failure(exc)`` decides which exceptions count against the upstream
+    (a 400 for a bad request does not mean the upstream is sick).
+    """
+
+    def __init__(self, name, window=BREAKER_WINDOW, failure_rate=BREAKER_FAILURE_RATE,
+                 min_calls=BREAKER_MIN_CALLS, open_seconds=BREAKER_OPEN_SECONDS,
+                 half_open_calls=BREAKER_HALF_OPEN_CALLS, is_failure=None):
+        self.name = name
+        self.window = window
+        self.failure_rate = failure_rate
+        self.min_calls = min_calls
+        self.open_seconds = open_seconds
+        self.half_open_calls = half_open_calls
+        self.is_failure = is_failure or (lambda exc: True)
+        self._lock = threading.Lock()
+        self._state = CLOSED
+        self._outcomes = deque()  # (monotonic time, failed)
+        self._failures = 0
+        self._opened_at = None
+        self._probes = 0
+        self._counters = {'calls': 0, 'failures': 0, 'rejected': 0, 'opened': 0}
+
+    # --- state ---
+    def _trim(self, now):
+        while self._outcomes and now - self._outcomes[0][0] > self.window:
+            _, failed = self._outcomes.popleft()
+            self._failures -= failed
+
+    def _open(self, now):
+        self._state = OPEN
+        self._opened_at = now
+        self._probes = 0
+        self._counters['opened'] += 1
+        logger.error(f"🔌 {self.name} circuit opened for {self.open_seconds}s")
+
+    def _close(self):
+        self._state = CLOSED
+        self._outcomes.clear()
+        self._failures = 0
+        self._opened_at = None
+        self._probes = 0
+        logger.info(f"🔌 {self.name} circuit closed")
+
+    def _retry_in(self, now):
+        return max(self._opened_at + self.open_seconds - now, 0.0)
+
+    @property
+    def state(self):
+        with self._lock:
+            if self._state == OPEN and not self._retry_in(time.monotonic()):
+                return HALF_OPEN
+            return self._state
+
+    def retry_in(self):
+        """Seconds until calls are let through again (0 unless open)."""
+        with self._lock:
+            if self._state != OPEN:
+                return 0.0
+            return self._retry_in(time.monotonic())
+
+    # --- calls ---
+    def check(self):
+        """
+        Raise ``CircuitOpen`` if a call would be refused right now, without
+        admitting one (no half-open probe is taken). For callers that spend
+        something else, such as a rate-limit slot, before making the call.
+        """
+        with self._lock:
+            if self._state == OPEN:
+                retry_in = self._retry_in(time.monotonic())
+                if retry_in:
+                    self._counters['rejected'] += 1
+                    raise CircuitOpen(self.name, retry_in)
+            elif self._state == HALF_OPEN and self._probes >= self.half_open_calls:
+                self._counters['rejected'] += 1
+                raise CircuitOpen(self.name, 0.0)
+
+    def before_call(self):
+        """Admit one call or raise ``CircuitOpen``."""
+        now = time.monotonic()
+        with self._lock:
+            if self._state == OPEN:
+                retry_in = self._retry_in(now)
+                if retry_in:
+                    self._counters['rejected'] += 1
+                    raise CircuitOpen(self.name, retry_in)
+                self._state = HALF_OPEN
+                self._probes = 0
+                logger.warning(f"🔌 {self.name} circuit half-open, probing")
+            if self._state == HALF_OPEN:
+                if self._probes >= self.half_open_calls:
+                    self._counters['rejected'] += 1
+                    raise CircuitOpen(self.name, 0.0)
+                self._probes += 1
+            self._counters['calls'] += 1
+
+    def record(self, failed):
+        now = time.monotonic()
+        with self._lock:
+            if failed:
+                self._counters['failures'] += 1
+            if self._state == HALF_OPEN:
+                if failed:
+                    self._open(now)
+                else:
+                    self._close()
+                return
+            if self._state == OPEN:
+                return
+            self._outcomes.append((now, failed))
+            self._failures += failed
+            self._trim(now)
+            calls = len(self._outcomes)
+            if failed and calls >= self.min_calls and self._failures / calls >= self.failure_rate:
+                self._open(now)
+
+    def __enter__(self):
+        self.before_call()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.record(exc is not None and self.is_failure(exc))
+        return False
+
+    def stats(self):
+        now = time.monotonic()
+        with self._lock:
+            self._trim(now)
+            calls = len(self._outcomes)
+            state = self._state
+            retry_in = self._retry_in(now) if state == OPEN else 0.0
+            if state == OPEN and not retry_in:
+                state = HALF_OPEN
+            return {
+                'state': state,
+                'retry_in': round(retry_in, 1),
+                'window_calls': calls,
+                'window_failure_rate': round(self._failures / calls, 3) if calls else 0.0,
+                **self._counters,
+            }
+
+
+def unavailable_response(exc):
+    """503 for a call refused by an open breaker, with Retry-After."""
+    logger.warning(f"Fast-fail: {exc}")
+    response = Response(
+        {"error": "Service temporarily unavailable, please retry shortly", "detail": str(exc)},
+        status=status.HTTP_503_SERVICE_UNAVAILABLE
+    )
+    response['Retry-After'] = str(max(int(exc.retry_in + 0.999), 1))
+    return response
+
+
+_breakers = {}
+_breakers_lock = threading.Lock()
+
+
+def get_breaker(name, **options):
+    """The process-wide breaker for upstream ``name``, created on first use."""
+    breaker = _breakers.get(name)
+    if breaker is None:
+        with _breakers_lock:
+            breaker = _breakers.get(name)
+            if breaker is None:
+                breaker = _breakers[name] = CircuitBreaker(name, **options)
+    return breaker
+
+
+def breaker_stats():
+    with _breakers_lock:
+        breakers = list(_breakers.values())
+    return {breaker.name: breaker.stats() for breaker in breakers}
@@ -0,0 +1,183 @@
+import asyncio
+import contextvars
+import functools
+import logging
+import time
+from contextlib import contextmanager
+
+import httpx
+from requests.exceptions import Timeout as RequestsTimeout
+from rest_framework.response import Response
+from rest_framework import status
+from django.conf import settings
+
+from .breakers import CircuitOpen
+from .metrics import error_reason, record_upstream_call
+from .watchdog import upstream_finished, upstream_started
+
+logger = logging.getLogger(__name__)
+
+# === Deadline configuration (seconds) ===
+CREATE_PAYMENT_DEADLINE = getattr(settings, 'CREATE_PAYMENT_DEADLINE', 10)
+VERIFY_PAYMENT_DEADLINE = getattr(settings, 'VERIFY_PAYMENT_DEADLINE', 15)
+EMAIL_SEND_DEADLINE = getattr(settings, 'EMAIL_SEND_DEADLINE', 20)
+UPSTREAM_TIMEOUT = getattr(settings, 'UPSTREAM_TIMEOUT', 10)
+
+# Below this there is no point starting another upstream call
+MIN_CALL_BUDGET = 0.05
+
+TIMEOUT_ERRORS = (RequestsTimeout, httpx.TimeoutException, TimeoutError)
+
+_current = contextvars.ContextVar('request_deadline', default=None)
+
+
+class UpstreamTimeout(TimeoutError):
+    """An upstream (Razorpay, SendGrid, Fixer) did not answer within the time it was given."""
+
+    def __init__(self, upstream, timeout):
+        super().__init__(f"{upstream} did not answer within {timeout:.2f}s")
+        self.upstream = upstream
+        self.timeout = timeout
+
+
+class DeadlineExceeded(UpstreamTimeout):
+    """The request's time budget ran out before or during a call to ``upstream``."""
+
+    def __init__(self, upstream, deadline):
+        TimeoutError.__init__(
+            self, f"{deadline.name} deadline of {deadline.budget}s exceeded waiting on {upstream}"
+        )
+        self.upstream = upstream
+        self.timeout = deadline.budget
+        self.deadline = deadline
+
+
+class Deadline:
+    __slots__ = ('name', 'budget', 'expires_at')
+
+    def __init__(self, name, budget):
+        self.name = name
+        self.budget = budget
+        self.expires_at = time.monotonic() + budget
+
+    def remaining(self):
+        return self.expires_at - time.monotonic()
+
+
+@contextmanager
+def deadline(budget, name="request"):
+    """
+    Run the block under a ``budget``-second deadline, visible to every
+    ``upstream_call`` made from it (including through ``sync_to_async``).
+    A nested deadline can only shorten the one already in force.
+    """
+    current = _current.get()
+    new = Deadline(name, budget)
+    if current is not None and current.expires_at <= new.expires_at:
+        new = current
+    token = _current.set(new)
+    try:
+        yield new
+    finally:
+        _current.reset(token)
+
+
+def current_deadline():
+    return _current.get()
+
+
+def upstream_timeout(upstream, cap=None):
+    """
+    Timeout for the next call to ``upstream``: the remaining budget, no more
+    than ``cap``. Without a deadline in force, ``cap`` or UPSTREAM_TIMEOUT, so
+    no call is ever made without one. Raises ``DeadlineExceeded`` once the
+    budget is spent.
+    """
+    current = _current.get()
+    if current is None:
+        return cap if cap is not None else UPSTREAM_TIMEOUT
+    left = current.remaining()
+    if left < MIN_CALL_BUDGET:
+        raise DeadlineExceeded(upstream, current)
+    return left if cap is None else min(left, cap)
+
+
+@contextmanager
+def upstream_call(upstream, cap=None, operation='request'):
+    """
+    Yield the timeout to pass to one call to ``upstream`` and turn the HTTP
+    client's timeout errors into ``DeadlineExceeded`` (the budget ran out) or
+    ``UpstreamTimeout`` (the per-call cap did). The call's latency and any
+    failure are recorded in the upstream metrics under ``operation``, and the
+    request watchdog knows which call a stalled request is waiting on.
+    """
+    try:
+        timeout = upstream_timeout(upstream, cap)
+    except DeadlineExceeded:
+        record_upstream_call(upstream, operation, 0.0, 'deadline')
+        raise
+    watch = upstream_started(upstream, operation, timeout)
+    started = time.perf_counter()
+    try:
+        yield timeout
+    except DeadlineExceeded:
+        record_upstream_call(upstream, operation, time.perf_counter() - started, 'deadline')
+        raise
+    except UpstreamTimeout:
+        record_upstream_call(upstream, operation, time.perf_counter() - started, 'timeout')
+        raise
+    except CircuitOpen:
+        record_upstream_call(upstream, operation, 0.0, 'circuit_open')
+        raise
+    except TIMEOUT_ERRORS as e:
+        current = _current.get()
+        if current is not None and current.remaining() < MIN_CALL_BUDGET:
+            record_upstream_call(upstream, operation, time.perf_counter() - started, 'deadline')
+            raise DeadlineExceeded(upstream, current) from e
+        record_upstream_call(upstream, operation, time.perf_counter() - started, 'timeout')
+        raise UpstreamTimeout(upstream, timeout) from e
+    except Exception as e:
+        record_upstream_call(upstream, operation, time.perf_counter() - started, error_reason(e))
+        raise
+    else:
+        record_upstream_call(upstream, operation, time.perf_counter() - started)
+    finally:
+        upstream_finished(watch)
+
+
+def timeout_response(exc):
+    logger.error(f"Upstream timeout: {exc}")
+    return Response(
+        {"error": "Upstream service timed out, please retry", "detail": str(exc)},
+        status=status.HTTP_504_GATEWAY_TIMEOUT
+    )
+
+
+def with_deadline(budget, name=None):
+    """
+    View-method decorator: run the handler under a ``budget``-second deadline
+    and answer 504 if an upstream timeout escapes it. Works on sync and async
+    handlers.
+    """
+    def decorator(method):
+        label = name or method.__qualname__
+
+        if asyncio.iscoroutinefunction(method):
+            @functools.wraps(method)
+            async def async_wrapper(*args, **kwargs):
+                with deadline(budget, label):
+                    try:
+                        return await method(*args, **kwargs)
+                    except UpstreamTimeout as e:
+                        return timeout_response(e)
+            return async_wrapper
+
+        @functools.wraps(method)
+        def wrapper(*args, **kwargs):
+            with deadline(budget, label):
+                try:
+                    return method(*args, **kwargs)
+                except UpstreamTimeout as e:
+                    return timeout_response(e)
+        return wrapper
+    return decorator
@@ -0,0 +1,41 @@
+import json
+import logging
+import time
+from datetime import datetime, timezone
+
+# Structured events, one JSON object per line in events.log (see settings.LOGGING);
+# `python manage.py log_stats` reads them back
+event_logger = logging.getLogger('payments.events')
+
+
+def log_event(event, **fields):
+    """
+    Record one event, e.g. ``log_event('order.created', order_id=..., duration_ms=12.5)``.
+    Names are ``<subject>.<outcome>``; outcomes ending in "failed" count as errors.
+    """
+    event_logger.info(event, extra={'event_fields': fields})
+
+
+def ms_since(started):
+    """Milliseconds elapsed since a ``time.monotonic()`` reading, for ``duration_ms``."""
+    return round((time.monotonic() - started) * 1000, 1)
+
+
+class JsonFormatter(logging.Formatter):
+    """``{"ts": ..., "level": ..., "event": ..., **fields}``; plain records get ``logger`` instead."""
+
+    def format(self, record):
+        entry = {
+            'ts': datetime.fromtimestamp(record.created, timezone.utc).isoformat(timespec='milliseconds'),
+            'level': record.levelname,
+        }
+        fields = getattr(record, 'event_fields', None)
+        if fields is None:
+            entry['logger'] = record.name
+            entry['message'] = record.getMessage()
+        else:
+            entry['event'] = record.getMessage()
+            entry.update(fields)
+        if record.exc_info or record.exc_text:
+            entry['exc'] = record.exc_text or self.formatException(record.exc_info)
+        return json.dumps(entry, default=str, ensure_ascii=False)
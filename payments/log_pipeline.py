@@ -0,0 +1,256 @@
+import atexit
+import gzip
+import logging
+import logging.config
+import logging.handlers
+import os
+import queue
+import shutil
+import threading
+
+from django.conf import settings
+
+# === Log pipeline configuration ===
+LOG_QUEUE_ENABLED = getattr(settings, 'LOG_QUEUE_ENABLED', True)
+LOG_QUEUE_SIZE = getattr(settings, 'LOG_QUEUE_SIZE', 10000)
+LOG_BATCH_SIZE = getattr(settings, 'LOG_BATCH_SIZE', 500)
+
+_STOP = object()
+_formatter = logging.Formatter()
+
+
+def _gzip_file(source, dest):
+    with open(source, 'rb') as f_in, gzip.open(dest + '.tmp', 'wb') as f_out:
+        shutil.copyfileobj(f_in, f_out)
+    os.replace(dest + '.tmp', dest)
+    os.remove(source)
+
+
+class BatchedFileMixin:
+    """
+    File handler side of the pipeline: ``emit`` writes without flushing (the
+    listener flushes once per batch), and rotated files are gzipped on their
+    own thread so the listener goes straight back to draining the queue.
+    """
+
+    def __init__(self, filename, *args, compress=True, **kwargs):
+        super().__init__(filename, *args, **kwargs)
+        self.queued = False
+        self._compressing = None
+        if compress:
+            self.namer = lambda name: name + '.gz'
+            self.rotator = self._rotate
+
+    def _open(self):
+        # Not in __init__: with delay=True nothing is created until a record is written
+        os.makedirs(os.path.dirname(self.baseFilename), exist_ok=True)
+        return super()._open()
+
+    def _rotate(self, source, dest):
+        plain = dest[:-len('.gz')]
+        os.rename(source, plain)
+        self._compressing = threading.Thread(
+            target=_gzip_file, args=(plain, dest), name='log-compress', daemon=True
+        )
+        self._compressing.start()
+
+    def wait_for_compression(self):
+        if self._compressing is not None:
+            self._compressing.join()
+            self._compressing = None
+
+    def doRollover(self):
+        # The previous file must be in place before backups are shifted or pruned
+        self.wait_for_compression()
+        super().doRollover()
+
+    def _should_roll(self, record, message):
+        return self.shouldRollover(record)
+
+    def emit(self, record):
+        try:
+            message = self.format(record) + self.terminator
+            if self._should_roll(record, message):
+                self.doRollover()
+            if self.stream is None:
+                self.stream = self._open()
+            self.stream.write(message)
+            if not self.queued:
+                self.flush()
+        except RecursionError:
+            raise
+        except Exception:
+            self.handleError(record)
+
+
+class RotatingFileHandler(BatchedFileMixin, logging.handlers.RotatingFileHandler):
+    """Size-based rotation; the size is tracked in memory rather than by seeking the file."""
+
+    def __init__(self, filename, *args, **kwargs):
+        super().__init__(filename, *args, **kwargs)
+        self._size = os.path.getsize(self.baseFilename) if os.path.exists(self.baseFilename) else 0
+
+    def _should_roll(self, record, message):
+        size = len(message.encode(self.encoding or 'utf-8'))
+        if self.maxBytes > 0 and self._size and self._size + size > self.maxBytes:
+            self._size = size
+            return True
+        self._size += size
+        return False
+
+
+class TimedRotatingFileHandler(BatchedFileMixin, logging.handlers.TimedRotatingFileHandler):
+    """Time-based rotation (``when`` = "midnight", "h", ...)."""
+
+
+class LogPipeline:
+    """
+    One in-memory queue per process and one listener thread behind it.
+
+    Request threads only format the message and ``put_nowait`` it; if the
+    queue is full the record is dropped and counted rather than blocking the
+    request. The listener takes whatever has queued up (up to ``batch_size``
+    records), hands each to its file handler and flushes every touched file
+    once per batch. Started lazily, so forked workers get their own listener.
+    """
+
+    def __init__(self, maxsize=LOG_QUEUE_SIZE, batch_size=LOG_BATCH_SIZE):
+        self.maxsize = maxsize
+        self.batch_size = batch_size
+        self.handlers = set()
+        self._queue = None
+        self._thread = None
+        self._pid = None
+        self._closed = False
+        self._lock = threading.Lock()
+        self._dropped = 0
+        self._written = 0  # listener thread only
+        self._batches = 0
+
+    def _ensure_started(self):
+        if self._pid == os.getpid():
+            return
+        with self._lock:
+            if self._pid == os.getpid():
+                return
+            self._queue = queue.SimpleQueue()
+            self._thread = threading.Thread(target=self._run, name='log-listener', daemon=True)
+            self._thread.start()
+            self._pid = os.getpid()
+
+    def _after_fork(self):
+        # The parent's listener thread does not exist in the child
+        self._lock = threading.Lock()
+        self._pid = None
+
+    def put(self, handler, record):
+        if self._closed:
+            # Shutting down: nothing will drain the queue any more
+            handler.handle(record)
+            handler.flush()
+            return
+        self._ensure_started()
+        if self._queue.qsize() >= self.maxsize:
+            with self._lock:
+                self._dropped += 1
+            return
+        self._queue.put((handler, record))
+
+    def _run(self):
+        q = self._queue
+        while True:
+            batch = [q.get()]
+            while len(batch) < self.batch_size:
+                try:
+                    batch.append(q.get_nowait())
+                except queue.Empty:
+                    break
+            touched = set()
+            stop = False
+            for handler, record in batch:
+                if handler is _STOP:
+                    stop = True
+                    continue
+                handler.handle(record)
+                touched.add(handler)
+            for handler in touched:
+                handler.flush()
+            self._written += len(batch) - stop
+            self._batches += 1
+            if stop:
+                return
+
+    def stop(self, timeout=5):
+        """Write out everything queued so far and stop the listener (runs at exit)."""
+        if self._pid != os.getpid() or not self._thread.is_alive():
+            return
+        self._closed = True
+        self._queue.put((_STOP, None))
+        self._thread.join(timeout)
+        self._pid = None
+        for handler in self.handlers:
+            handler.wait_for_compression()
+
+    def stats(self):
+        return {
+            'queued': self._queue.qsize() if self._queue is not None else 0,
+            'capacity': self.maxsize,
+            'written': self._written,
+            'batches': self._batches,
+            'dropped': self._dropped,
+        }
+
+
+pipeline = LogPipeline()
+atexit.register(pipeline.stop)
+os.register_at_fork(after_in_child=pipeline._after_fork)
+
+
+class QueuedHandler(logging.handlers.QueueHandler):
+    """Stands in for a file handler on the logger: records go onto the pipeline's queue."""
+
+    def __init__(self, target, pipeline=pipeline):
+        logging.Handler.__init__(self, target.level)
+        self.target = target
+        self.pipeline = pipeline
+        self.name = target.name
+
+    def prepare(self, record):
+        # Freeze the message now (args may change once the call returns), but
+        # skip QueueHandler's copy: the record never leaves the process
+        record.message = record.getMessage()
+        record.msg = record.message
+        record.args = None
+        if record.exc_info and not record.exc_text:
+            record.exc_text = _formatter.formatException(record.exc_info)
+        return record
+
+    def enqueue(self, record):
+        self.pipeline.put(self.target, record)
+
+    def close(self):
+        super().close()
+        self.target.close()
+
+
+def configure(config):
+    """
+    ``LOGGING_CONFIG`` hook: apply ``settings.LOGGING`` with ``dictConfig``,
+    then move every batched file handler behind the queue.
+    """
+    logging.config.dictConfig(config)
+    if not LOG_QUEUE_ENABLED:
+        return
+    proxies = {}
+    loggers = [logging.root] + [
+        logger for logger in logging.root.manager.loggerDict.values()
+        if isinstance(logger, logging.Logger)
+    ]
+    for logger in loggers:
+        for index, handler in enumerate(logger.handlers):
+            if isinstance(handler, BatchedFileMixin):
+                if handler not in proxies:
+                    proxies[handler] = QueuedHandler(handler)
+                    pipeline.handlers.add(handler)
+                    handler.queued = True
+                logger.handlers[index] = proxies[handler]
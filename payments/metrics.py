@@ -0,0 +1,501 @@
+import atexit
+import bisect
+import fcntl
+import glob
+import json
+import logging
+import math
+import os
+import threading
+import time
+from asyncio import iscoroutinefunction
+from contextlib import contextmanager
+
+from django.conf import settings
+from django.utils.decorators import sync_and_async_middleware
+
+from .breakers import breaker_stats
+from .log_pipeline import pipeline
+
+logger = logging.getLogger(__name__)
+
+# === Metrics configuration ===
+# Directory the worker processes share their snapshots through (None: this process only)
+METRICS_DIR = getattr(settings, 'METRICS_DIR', None)
+METRICS_FLUSH_INTERVAL = getattr(settings, 'METRICS_FLUSH_INTERVAL', 5)
+METRICS_STALE_AFTER = getattr(settings, 'METRICS_STALE_AFTER', 60)
+
+# Seconds; covers a fast cache hit up to a Razorpay call running into its deadline
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 20.0)
+
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+# Folded-in counters of worker processes that have gone away
+ARCHIVE_FILE = 'archive.json'
+
+
+class _Metric:
+    kind = None
+
+    def __init__(self, registry, name, help, labelnames=()):
+        self.registry = registry
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+        self._values = {}
+
+    def _reset(self):
+        self._lock = threading.Lock()
+        self._values = {}
+
+    def samples(self):
+        """``{label values: value}`` as of now."""
+        with self._lock:
+            return {labels: self._copy(value) for labels, value in self._values.items()}
+
+    def _copy(self, value):
+        return value
+
+    def describe(self):
+        return {'kind': self.kind, 'help': self.help, 'labelnames': list(self.labelnames)}
+
+
+class Counter(_Metric):
+    """Monotonic count per label set; summed across processes."""
+
+    kind = 'counter'
+
+    def inc(self, *labels, amount=1):
+        if not self.registry.started:
+            self.registry.start()
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0) + amount
+
+
+class Histogram(_Metric):
+    """
+    Fixed-bucket histogram per label set. Each series is a list of per-bucket
+    counts (the last one is +Inf) followed by the sum, so an observation is
+    one bisect and two additions under the lock.
+    """
+
+    kind = 'histogram'
+
+    def __init__(self, registry, name, help, labelnames=(), buckets=LATENCY_BUCKETS):
+        super().__init__(registry, name, help, labelnames)
+        self.buckets = tuple(buckets)
+
+    def observe(self, value, *labels):
+        index = bisect.bisect_left(self.buckets, value)
+        if not self.registry.started:
+            self.registry.start()
+        with self._lock:
+            series = self._values.get(labels)
+            if series is None:
+                series = self._values[labels] = [0] * (len(self.buckets) + 1) + [0.0]
+            series[index] += 1
+            series[-1] += value
+
+    @contextmanager
+    def time(self, *labels):
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - started, *labels)
+
+    def _copy(self, value):
+        return list(value)
+
+    def describe(self):
+        return {**super().describe(), 'buckets': list(self.buckets)}
+
+
+class Gauge(_Metric):
+    """
+    Current value per label set. Either ``set`` directly or computed when
+    collected by ``collect()`` returning ``{label values: value}``. Across
+    processes the values are combined with ``aggregate`` ("sum" or "max").
+    """
+
+    kind = 'gauge'
+
+    def __init__(self, registry, name, help, labelnames=(), collect=None, aggregate='sum'):
+        super().__init__(registry, name, help, labelnames)
+        self.collect = collect
+        self.aggregate = aggregate
+
+    def set(self, value, *labels):
+        with self._lock:
+            self._values[labels] = value
+
+    def samples(self):
+        if self.collect is None:
+            return super().samples()
+        try:
+            return dict(self.collect())
+        except Exception as e:
+            logger.warning(f"Could not collect gauge {self.name}: {e}")
+            return {}
+
+    def describe(self):
+        return {**super().describe(), 'aggregate': self.aggregate}
+
+
+# === Snapshots: what a process shares and how they are combined ===
+def _merge_series(kind, aggregate, into, value):
+    if into is None:
+        return list(value) if kind == 'histogram' else value
+    if kind == 'histogram':
+        return [a + b for a, b in zip(into, value)]
+    if kind == 'gauge' and aggregate == 'max':
+        return max(into, value)
+    return into + value
+
+
+def merge_snapshots(snapshots):
+    """Combine per-process snapshots: counters and histograms add up, gauges sum or max."""
+    merged = {}
+    for snapshot in snapshots:
+        for name, metric in snapshot.items():
+            target = merged.get(name)
+            if target is None:
+                target = merged[name] = {**metric, 'series': {}}
+            elif metric.get('buckets') != target.get('buckets'):
+                # A worker still running with different buckets (mid-deploy): skip it
+                continue
+            series = target['series']
+            for labels, value in metric['series']:
+                key = tuple(labels)
+                series[key] = _merge_series(metric['kind'], metric.get('aggregate'), series.get(key), value)
+    return merged
+
+
+def _without_gauges(snapshot):
+    return {name: metric for name, metric in snapshot.items() if metric['kind'] != 'gauge'}
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _labels(names, values, extra=''):
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return '{' + ','.join(pairs) + '}' if pairs else ''
+
+
+def _number(value):
+    if isinstance(value, float):
+        if math.isinf(value):
+            return '+Inf' if value > 0 else '-Inf'
+        if math.isnan(value):
+            return 'NaN'
+        return repr(value)
+    return str(value)
+
+
+def exposition(merged):
+    """Prometheus text exposition format (0.0.4) for merged snapshots."""
+    lines = []
+    for name in sorted(merged):
+        metric = merged[name]
+        names = metric['labelnames']
+        lines.append(f"# HELP {name} {metric['help']}")
+        lines.append(f"# TYPE {name} {metric['kind']}")
+        for labels, value in sorted(metric['series'].items()):
+            if metric['kind'] != 'histogram':
+                lines.append(f"{name}{_labels(names, labels)} {_number(value)}")
+                continue
+            cumulative = 0
+            for bound, count in zip(metric['buckets'] + [math.inf], value[:-1]):
+                cumulative += count
+                le = 'le="%s"' % _number(float(bound))
+                lines.append(f"{name}_bucket{_labels(names, labels, le)} {cumulative}")
+            lines.append(f"{name}_sum{_labels(names, labels)} {_number(value[-1])}")
+            lines.append(f"{name}_count{_labels(names, labels)} {cumulative}")
+    return '\n'.join(lines) + '\n'
+
+
+class Registry:
+    """
+    The process's metrics, plus sharing with the other worker processes.
+
+    Updates only touch the metric's own lock. With a ``directory`` set, a
+    background thread writes this process's snapshot to ``<directory>/<pid>.json``
+    every ``flush_interval`` seconds, and a scrape of any worker adds up the
+    live snapshot of its own process and the files of the others. A worker
+    whose file has not been refreshed for ``stale_after`` seconds (or that
+    exited) is gone: its gauges are dropped and its counters and histograms
+    are folded into ``archive.json``, so the totals never go backwards.
+    """
+
+    def __init__(self, directory=METRICS_DIR, flush_interval=METRICS_FLUSH_INTERVAL,
+                 stale_after=METRICS_STALE_AFTER):
+        self.directory = directory
+        self.flush_interval = flush_interval
+        self.stale_after = stale_after
+        self.metrics = {}
+        self.started = False
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+
+    # --- definitions ---
+    def _register(self, metric):
+        with self._lock:
+            existing = self.metrics.get(metric.name)
+            if existing is not None:
+                if existing.kind != metric.kind or existing.labelnames != metric.labelnames:
+                    raise ValueError(f"Metric {metric.name} is already registered differently")
+                return existing
+            self.metrics[metric.name] = metric
+            return metric
+
+    def counter(self, name, help, labelnames=()):
+        return self._register(Counter(self, name, help, labelnames))
+
+    def histogram(self, name, help, labelnames=(), buckets=LATENCY_BUCKETS):
+        return self._register(Histogram(self, name, help, labelnames, buckets))
+
+    def gauge(self, name, help, labelnames=(), collect=None, aggregate='sum'):
+        return self._register(Gauge(self, name, help, labelnames, collect, aggregate))
+
+    # --- collection ---
+    def snapshot(self):
+        with self._lock:
+            metrics = list(self.metrics.values())
+        return {
+            metric.name: {
+                **metric.describe(),
+                'series': [[list(labels), value] for labels, value in metric.samples().items()],
+            }
+            for metric in metrics
+        }
+
+    def collect(self):
+        """This process's metrics merged with those of the other workers."""
+        own = self.snapshot()
+        if not self.directory:
+            return merge_snapshots([own])
+        return merge_snapshots([own, *self._read_others()])
+
+    def exposition(self):
+        return exposition(self.collect())
+
+    # --- sharing between processes ---
+    def _path(self, name):
+        return os.path.join(self.directory, name)
+
+    def _write(self, name, snapshot):
+        path = self._path(name)
+        with open(path + '.tmp', 'w') as f:
+            json.dump(snapshot, f, separators=(',', ':'))
+        os.replace(path + '.tmp', path)
+
+    def _read(self, path):
+        try:
+            with open(path) as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def flush(self, exiting=False):
+        """Write this process's snapshot for the other workers (without gauges once exiting)."""
+        if not self.directory:
+            return
+        snapshot = self.snapshot()
+        if exiting:
+            snapshot = {'exited': True, 'metrics': _without_gauges(snapshot)}
+        else:
+            snapshot = {'exited': False, 'metrics': snapshot}
+        try:
+            os.makedirs(self.directory, exist_ok=True)
+            self._write(f'{os.getpid()}.json', snapshot)
+        except OSError as e:
+            logger.warning(f"Could not write metrics snapshot to {self.directory}: {e}")
+
+    def _read_others(self):
+        own = f'{os.getpid()}.json'
+        now = time.time()
+        snapshots = []
+        gone = []
+        for path in glob.glob(self._path('*.json')):
+            name = os.path.basename(path)
+            if name == own:
+                continue
+            data = self._read(path)
+            if data is None:
+                continue
+            if name == ARCHIVE_FILE:
+                snapshots.append(data)
+                continue
+            try:
+                stale = now - os.path.getmtime(path) > self.stale_after
+            except OSError:
+                continue
+            if data.get('exited') or stale:
+                gone.append(path)
+                snapshots.append(_without_gauges(data['metrics']))
+            else:
+                snapshots.append(data['metrics'])
+        if gone:
+            self._archive(gone)
+        return snapshots
+
+    def _archive(self, paths):
+        # Several workers may be scraped at once: only one folds a given file in
+        try:
+            with open(self._path('.lock'), 'w') as lock:
+                fcntl.flock(lock, fcntl.LOCK_EX)
+                archive = self._read(self._path(ARCHIVE_FILE)) or {}
+                folded = [archive]
+                claimed = []
+                for path in paths:
+                    data = self._read(path)
+                    if data is None:
+                        continue
+                    folded.append(_without_gauges(data['metrics']))
+                    claimed.append(path)
+                if not claimed:
+                    return
+                merged = merge_snapshots(folded)
+                self._write(ARCHIVE_FILE, {
+                    name: {**metric, 'series': [[list(labels), value] for labels, value in metric['series'].items()]}
+                    for name, metric in merged.items()
+                })
+                for path in claimed:
+                    os.remove(path)
+        except OSError as e:
+            logger.warning(f"Could not archive metrics of finished workers: {e}")
+
+    def start(self):
+        """Start the flusher thread (lazily, on the first update in each process)."""
+        with self._lock:
+            if self.started:
+                return
+            self.started = True
+            if not self.directory:
+                return
+            self._stop = threading.Event()
+            self._thread = threading.Thread(target=self._run, name='metrics-flush', daemon=True)
+            self._thread.start()
+
+    def _run(self):
+        self.flush()
+        while not self._stop.wait(self.flush_interval):
+            self.flush()
+
+    def stop(self):
+        """Final snapshot at exit: the counters stay, the gauges go."""
+        if self._thread is None or not self._thread.is_alive():
+            return
+        self._stop.set()
+        self._thread.join(self.flush_interval)
+        self.flush(exiting=True)
+
+    def _after_fork(self):
+        # A forked worker starts from zero with its own flusher; the parent keeps its counts
+        self._lock = threading.Lock()
+        self.started = False
+        self._thread = None
+        for metric in self.metrics.values():
+            metric._reset()
+
+
+registry = Registry()
+atexit.register(registry.stop)
+os.register_at_fork(after_in_child=registry._after_fork)
+
+
+# === Shared metrics ===
+http_requests = registry.counter(
+    'http_requests_total', 'HTTP requests by endpoint, method and status',
+    ('endpoint', 'method', 'status'),
+)
+http_request_duration = registry.histogram(
+    'http_request_duration_seconds', 'Time spent handling requests, by endpoint',
+    ('endpoint', 'method'),
+)
+upstream_duration = registry.histogram(
+    'upstream_request_duration_seconds', 'Calls to Razorpay, SendGrid and Fixer, by operation',
+    ('upstream', 'operation'),
+)
+upstream_errors = registry.counter(
+    'upstream_errors_total', 'Failed or refused upstream calls, by reason',
+    ('upstream', 'operation', 'reason'),
+)
+task_duration = registry.histogram(
+    'background_task_duration_seconds', 'Work done off the request thread (email sends, verification follow-ups)',
+    ('task', 'outcome'),
+)
+
+_BREAKER_STATES = {'closed': 0, 'half_open': 1, 'open': 2}
+
+
+def _breaker_states():
+    return {(name, ): _BREAKER_STATES[stats['state']] for name, stats in breaker_stats().items()}
+
+
+registry.gauge(
+    'circuit_breaker_state', 'Circuit breaker state per upstream: 0 closed, 1 half-open, 2 open (worst worker)',
+    ('upstream', ), collect=_breaker_states, aggregate='max',
+)
+
+registry.gauge(
+    'log_queue_depth', 'Log records waiting to be written', collect=lambda: {(): pipeline.stats()['queued']},
+)
+registry.gauge(
+    'log_records_dropped', 'Log records dropped because the log queue was full (since the worker started)',
+    collect=lambda: {(): pipeline.stats()['dropped']},
+)
+
+
+def record_upstream_call(upstream, operation, seconds, reason=None):
+    """One call to ``upstream``: its latency (unless it was never made) and, if it failed, why."""
+    if reason != 'circuit_open':
+        upstream_duration.observe(seconds, upstream, operation)
+    if reason is not None:
+        upstream_errors.inc(upstream, operation, reason)
+
+
+def error_reason(exc):
+    """Short, bounded label for an upstream failure: "http_429", "ConnectionError", ..."""
+    status_code = getattr(exc, 'status_code', None)
+    if isinstance(status_code, int):
+        return f'http_{status_code}'
+    return type(exc).__name__
+
+
+# === Requests ===
+def _endpoint(request):
+    match = getattr(request, 'resolver_match', None)
+    # The route pattern, not the path: one series per endpoint whatever the ids
+    return match.route if match is not None else '<unmatched>'
+
+
+def _record_request(request, response, started):
+    elapsed = time.perf_counter() - started
+    endpoint = _endpoint(request)
+    http_request_duration.observe(elapsed, endpoint, request.method)
+    http_requests.inc(endpoint, request.method, str(response.status_code))
+
+
+@sync_and_async_middleware
+def metrics_middleware(get_response):
+    """Per-endpoint request counts and latency, for sync and async views alike."""
+    if iscoroutinefunction(get_response):
+        async def middleware(request):
+            started = time.perf_counter()
+            response = await get_response(request)
+            _record_request(request, response, started)
+            return response
+    else:
+        def middleware(request):
+            started = time.perf_counter()
+            response = get_response(request)
+            _record_request(request, response, started)
+            return response
+    return middleware
@@ -0,0 +1,39 @@
+import weakref
+
+from requests.adapters import HTTPAdapter
+from urllib3 import PoolManager
+
+
+class _TrackingPoolManager(PoolManager):
+    """PoolManager that remembers the pools it hands out."""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.handed_out = weakref.WeakSet()
+
+    def connection_from_host(self, *args, **kwargs):
+        pool = super().connection_from_host(*args, **kwargs)
+        self.handed_out.add(pool)
+        return pool
+
+
+class TrackingHTTPAdapter(HTTPAdapter):
+    """
+    requests adapter that can report connection reuse (``pool_stats``)
+    without reaching into urllib3's private pool container.
+    """
+
+    def init_poolmanager(self, connections, maxsize, block=False, **pool_kwargs):
+        super().init_poolmanager(connections, maxsize, block, **pool_kwargs)
+        self.poolmanager = _TrackingPoolManager(
+            num_pools=connections, maxsize=maxsize, block=block, **pool_kwargs
+        )
+
+    def pool_stats(self):
+        """``(connections_opened, requests_served)`` over the pools still alive."""
+        connections = 0
+        requests_served = 0
+        for pool in list(self.poolmanager.handed_out):
+            connections += pool.num_connections
+            requests_served += pool.num_requests
+        return connections, requests_served
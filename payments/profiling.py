@@ -0,0 +1,227 @@
+import logging
+import os
+import random
+import re
+import sys
+import threading
+import time
+from asyncio import iscoroutinefunction
+from collections import Counter
+from datetime import datetime, timezone
+
+from django.conf import settings
+from django.core import signing
+from django.core.exceptions import MiddlewareNotUsed
+from django.utils.decorators import sync_and_async_middleware
+
+logger = logging.getLogger(__name__)
+
+# === Profiler configuration ===
+PROFILE_SAMPLE_RATE = getattr(settings, 'PROFILE_SAMPLE_RATE', 0.0)
+PROFILE_SECRET = getattr(settings, 'PROFILE_SECRET', '')
+PROFILE_TOKEN_TTL = getattr(settings, 'PROFILE_TOKEN_TTL', 60 * 60)
+PROFILE_INTERVAL = getattr(settings, 'PROFILE_INTERVAL', 0.005)
+PROFILE_DIR = getattr(settings, 'PROFILE_DIR', os.path.join(settings.LOGGING_DIR, 'profiles'))
+PROFILE_KEEP = getattr(settings, 'PROFILE_KEEP', 50)
+
+PROFILE_HEADER = 'HTTP_X_PROFILE'
+PROFILE_TOKEN_SALT = 'payments.profile'
+
+_project_root = str(settings.BASE_DIR) + os.sep
+
+
+def sign_profile_token(secret=PROFILE_SECRET):
+    """Value for an ``X-Profile`` header that has the request profiled (see PROFILE_TOKEN_TTL)."""
+    return signing.TimestampSigner(key=secret, salt=PROFILE_TOKEN_SALT).sign('profile')
+
+
+def _valid_token(token):
+    try:
+        signing.TimestampSigner(key=PROFILE_SECRET, salt=PROFILE_TOKEN_SALT).unsign(token, max_age=PROFILE_TOKEN_TTL)
+    except signing.BadSignature:
+        return False
+    return True
+
+
+def _short_path(filename):
+    if filename.startswith(_project_root):
+        return filename[len(_project_root):]
+    marker = filename.rfind('site-packages' + os.sep)
+    if marker != -1:
+        return filename[marker + len('site-packages' + os.sep):]
+    return os.path.basename(filename)
+
+
+class StackSampler:
+    """
+    One thread per process that, every ``interval`` seconds, looks at the
+    current frame of each thread being profiled and counts its stack in
+    collapsed form (``outer;inner;innermost``). Nothing runs in the profiled
+    thread itself, so the request only pays for the GIL hand-offs. The thread
+    starts with the first profile and sleeps while nothing is being profiled.
+    """
+
+    def __init__(self, interval=PROFILE_INTERVAL):
+        self.interval = interval
+        self._targets = {}  # thread id -> [Counter of stacks per profile running on it]
+        self._labels = {}  # code object -> frame label
+        self._lock = threading.Lock()
+        self._active = threading.Event()
+        self._thread = None
+        self._pid = None
+
+    def _label(self, code):
+        label = self._labels.get(code)
+        if label is None:
+            label = self._labels[code] = f"{code.co_qualname} ({_short_path(code.co_filename)}:{code.co_firstlineno})"
+        return label
+
+    def _ensure_started(self):
+        if self._pid == os.getpid():
+            return
+        with self._lock:
+            if self._pid == os.getpid():
+                return
+            self._thread = threading.Thread(target=self._run, name='stack-sampler', daemon=True)
+            self._thread.start()
+            self._pid = os.getpid()
+
+    def _after_fork(self):
+        self._lock = threading.Lock()
+        self._active = threading.Event()
+        self._targets = {}
+        self._pid = None
+
+    def start(self, thread_id):
+        """Start sampling ``thread_id``; returns the Counter its stacks are counted in."""
+        self._ensure_started()
+        stacks = Counter()
+        with self._lock:
+            self._targets.setdefault(thread_id, []).append(stacks)
+            self._active.set()
+        return stacks
+
+    def stop(self, thread_id, stacks):
+        with self._lock:
+            profiles = [profile for profile in self._targets.get(thread_id, []) if profile is not stacks]
+            if profiles:
+                self._targets[thread_id] = profiles
+            else:
+                self._targets.pop(thread_id, None)
+            if not self._targets:
+                self._active.clear()
+        return stacks
+
+    def _run(self):
+        while True:
+            self._active.wait()
+            frames = sys._current_frames()
+            with self._lock:
+                for thread_id, profiles in self._targets.items():
+                    frame = frames.get(thread_id)
+                    if frame is None:
+                        continue
+                    labels = []
+                    while frame is not None:
+                        labels.append(self._label(frame.f_code))
+                        frame = frame.f_back
+                    labels.reverse()
+                    stack = ';'.join(labels)
+                    for stacks in profiles:
+                        stacks[stack] += 1
+            del frames
+            time.sleep(self.interval)
+
+
+sampler = StackSampler()
+os.register_at_fork(after_in_child=sampler._after_fork)
+
+
+def _slug(endpoint):
+    return re.sub(r'[^A-Za-z0-9]+', '_', endpoint).strip('_') or 'root'
+
+
+def write_profile(endpoint, method, stacks, elapsed, directory=PROFILE_DIR, keep=PROFILE_KEEP):
+    """
+    Write one request's stacks to ``<directory>/<endpoint>/`` as collapsed stacks
+    (one ``frame;frame;frame count`` line each, what flamegraph.pl and
+    speedscope read), keeping the newest ``keep`` profiles per endpoint.
+    """
+    folder = os.path.join(directory, _slug(endpoint))
+    os.makedirs(folder, exist_ok=True)
+    stamp = datetime.now(timezone.utc).strftime('%Y%m%dT%H%M%S.%f')
+    path = os.path.join(folder, f"{stamp}-{method}-{elapsed * 1000:.0f}ms.folded")
+    with open(path, 'w', encoding='utf-8') as f:
+        for stack, count in stacks.most_common():
+            f.write(f"{stack} {count}\n")
+
+    profiles = sorted(name for name in os.listdir(folder) if name.endswith('.folded'))
+    for name in profiles[:-keep]:
+        try:
+            os.remove(os.path.join(folder, name))
+        except OSError:
+            pass
+    return path
+
+
+def _should_profile(request):
+    if PROFILE_SAMPLE_RATE and random.random() < PROFILE_SAMPLE_RATE:
+        return True
+    token = request.META.get(PROFILE_HEADER)
+    return token is not None and bool(PROFILE_SECRET) and _valid_token(token)
+
+
+def _finish(request, thread_id, stacks, started):
+    elapsed = time.perf_counter() - started
+    sampler.stop(thread_id, stacks)
+    match = getattr(request, 'resolver_match', None)
+    endpoint = match.route if match is not None else 'unmatched'
+    if not stacks:
+        logger.info(f"Profiled {request.method} {endpoint} in {elapsed * 1000:.1f} ms: too short to sample")
+        return
+    try:
+        path = write_profile(endpoint, request.method, stacks, elapsed)
+    except OSError as e:
+        logger.warning(f"Could not write profile for {endpoint}: {e}")
+        return
+    logger.info(
+        f"Profiled {request.method} {endpoint} in {elapsed * 1000:.1f} ms "
+        f"({sum(stacks.values())} samples): {path}"
+    )
+
+
+@sync_and_async_middleware
+def profiling_middleware(get_response):
+    """
+    Profile a PROFILE_SAMPLE_RATE fraction of requests, and any request with a
+    valid ``X-Profile`` token (``manage.py profile_token``). Not installed at
+    all unless one of the two is configured. Async requests are sampled on
+    the event loop thread, so their stacks also show whatever else the loop
+    ran meanwhile.
+    """
+    if not PROFILE_SAMPLE_RATE and not PROFILE_SECRET:
+        raise MiddlewareNotUsed
+
+    if iscoroutinefunction(get_response):
+        async def middleware(request):
+            if not _should_profile(request):
+                return await get_response(request)
+            thread_id = threading.get_ident()
+            started = time.perf_counter()
+            stacks = sampler.start(thread_id)
+            try:
+                return await get_response(request)
+            finally:
+                _finish(request, thread_id, stacks, started)
+    else:
+        def middleware(request):
+            if not _should_profile(request):
+                return get_response(request)
+            thread_id = threading.get_ident()
+            started = time.perf_counter()
+            stacks = sampler.start(thread_id)
+            try:
+                return get_response(request)
+            finally:
+                _finish(request, thread_id, stacks, started)
+    return middleware
@@ -55,11 +55,16 @@ INSTALLED_APPS = [
     'rest_framework',
     'demo',
     'corsheaders',
-    'contact'
+    'contact',
+    'mailer',
+    'usd',
 
 ]
 
 MIDDLEWARE = [
+    'payments.metrics.metrics_middleware',  # first, so it times everything below
+    'payments.watchdog.watchdog_middleware',
+    'payments.profiling.profiling_middleware',  # removes itself unless PROFILE_* is set
     'corsheaders.middleware.CorsMiddleware',
     'django.middleware.common.CommonMiddleware',  # keep this after corsheaders
     'django.contrib.sessions.middleware.SessionMiddleware',
@@ -97,6 +102,197 @@ FIXER_API_KEY = os.getenv("FIXER_API_KEY")
 ADMIN_EMAIL = os.getenv("ADMIN_EMAIL")
 FROM_EMAIL = os.getenv("FROM_EMAIL")
 
+# Razorpay connection pool: one keep-alive connection per gunicorn worker thread
+RAZORPAY_POOL_SIZE = int(os.getenv("RAZORPAY_POOL_SIZE", os.getenv("GUNICORN_THREADS", "10")))
+
+# Async endpoints (api/async/..., served by payments.asgi under uvicorn): httpx pool
+# per event loop. RAZORPAY_BASE_URL can point both clients at a sandbox or stub.
+RAZORPAY_ASYNC_POOL_SIZE = int(os.getenv("RAZORPAY_ASYNC_POOL_SIZE", "200"))
+RAZORPAY_BASE_URL = os.getenv("RAZORPAY_BASE_URL", "https://api.razorpay.com")
+
+# Fast-acknowledge payment verification: respond once the signature checks out and
+# fetch order details / send emails in the background. The follow-up's status is
+# kept on the order, so any worker can answer payment/verify/status/.
+PAYMENT_VERIFY_FAST_ACK = os.getenv("PAYMENT_VERIFY_FAST_ACK", "False") == "True"
+VERIFY_FOLLOWUP_WORKERS = int(os.getenv("VERIFY_FOLLOWUP_WORKERS", "4"))
+
+# Order and payment are fetched concurrently during verification: per-call timeout
+# and the shared deadline for both (seconds)
+RAZORPAY_FETCH_TIMEOUT = float(os.getenv("RAZORPAY_FETCH_TIMEOUT", "5"))
+RAZORPAY_FETCH_DEADLINE = float(os.getenv("RAZORPAY_FETCH_DEADLINE", "8"))
+
+# Per-request time budgets (seconds). Every Razorpay/SendGrid/Fixer call gets the
+# remaining budget as its timeout and a view whose budget runs out answers 504.
+# UPSTREAM_TIMEOUT bounds calls made outside any budget (commands, background work).
+CREATE_PAYMENT_DEADLINE = float(os.getenv("CREATE_PAYMENT_DEADLINE", "10"))
+VERIFY_PAYMENT_DEADLINE = float(os.getenv("VERIFY_PAYMENT_DEADLINE", "15"))
+EMAIL_SEND_DEADLINE = float(os.getenv("EMAIL_SEND_DEADLINE", "20"))
+UPSTREAM_TIMEOUT = float(os.getenv("UPSTREAM_TIMEOUT", "10"))
+
+# Circuit breakers for Razorpay and SendGrid (state at api/upstreams/). A breaker
+# opens when at least BREAKER_MIN_CALLS calls in the last BREAKER_WINDOW seconds
+# failed at BREAKER_FAILURE_RATE or more, refuses calls for BREAKER_OPEN_SECONDS,
+# then lets BREAKER_HALF_OPEN_CALLS probe calls through.
+BREAKER_WINDOW = float(os.getenv("BREAKER_WINDOW", "30"))
+BREAKER_FAILURE_RATE = float(os.getenv("BREAKER_FAILURE_RATE", "0.5"))
+BREAKER_MIN_CALLS = int(os.getenv("BREAKER_MIN_CALLS", "10"))
+BREAKER_OPEN_SECONDS = float(os.getenv("BREAKER_OPEN_SECONDS", "30"))
+BREAKER_HALF_OPEN_CALLS = int(os.getenv("BREAKER_HALF_OPEN_CALLS", "1"))
+
+# Durable email outbox: request handlers insert a row and `manage.py send_outbox`
+# delivers it with retry/backoff
+EMAIL_OUTBOX_ENABLED = os.getenv("EMAIL_OUTBOX_ENABLED", "False") == "True"
+OUTBOX_MAX_ATTEMPTS = int(os.getenv("OUTBOX_MAX_ATTEMPTS", "5"))
+
+# Shared in-process mail dispatcher (used when the outbox is off). Overflow policy:
+# "reject", "drop_oldest" or "spill" (to the outbox table; drain with send_outbox)
+MAIL_QUEUE_SIZE = int(os.getenv("MAIL_QUEUE_SIZE", "1000"))
+MAIL_DISPATCH_WORKERS = int(os.getenv("MAIL_DISPATCH_WORKERS", "3"))
+MAIL_OVERFLOW_POLICY = os.getenv("MAIL_OVERFLOW_POLICY", "spill")
+# How long management commands wait for queued mail before exiting; anything
+# still queued then is moved to the outbox
+MAIL_DRAIN_TIMEOUT = float(os.getenv("MAIL_DRAIN_TIMEOUT", "30"))
+
+# Pooled keep-alive SendGrid transport shared by every sender (timeouts in seconds)
+SENDGRID_POOL_SIZE = int(os.getenv("SENDGRID_POOL_SIZE", "10"))
+SENDGRID_CONNECT_TIMEOUT = float(os.getenv("SENDGRID_CONNECT_TIMEOUT", "3.05"))
+SENDGRID_READ_TIMEOUT = float(os.getenv("SENDGRID_READ_TIMEOUT", "10"))
+
+# One token-bucket governor per SendGrid API key paces every sender (sends/second,
+# burst size, floor it may back off to after 429s). Rate-limited dispatcher mail
+# is requeued up to MAIL_THROTTLE_RETRIES times, then moved to the outbox.
+SENDGRID_RATE = float(os.getenv("SENDGRID_RATE", "10"))
+SENDGRID_BURST = int(os.getenv("SENDGRID_BURST", "20"))
+SENDGRID_MIN_RATE = float(os.getenv("SENDGRID_MIN_RATE", "0.5"))
+MAIL_THROTTLE_RETRIES = int(os.getenv("MAIL_THROTTLE_RETRIES", "5"))
+
+# Opt-in digest for "Payment Initiated" admin emails: one summary per window
+# (seconds) or per batch of orders, whichever comes first
+PAYMENT_INITIATED_DIGEST = os.getenv("PAYMENT_INITIATED_DIGEST", "False") == "True"
+PAYMENT_INITIATED_DIGEST_WINDOW = int(os.getenv("PAYMENT_INITIATED_DIGEST_WINDOW", "300"))
+PAYMENT_INITIATED_DIGEST_BATCH = int(os.getenv("PAYMENT_INITIATED_DIGEST_BATCH", "50"))
+
+# USD->INR rate service. FX_PROVIDER is "fixer" or "fake" (fixed FX_FAKE_RATE, for
+# offline work). Rates are cached in memory and in FX_CACHE_FILE, shared by workers.
+FX_PROVIDER = os.getenv("FX_PROVIDER", "fixer")
+FX_RATE_TTL = int(os.getenv("FX_RATE_TTL", "3600"))
+FX_MAX_STALE = int(os.getenv("FX_MAX_STALE", "86400"))
+FX_CACHE_FILE = os.getenv("FX_CACHE_FILE", os.path.join(BASE_DIR, 'cache', 'fx_rate.json'))
+FX_FAKE_RATE = os.getenv("FX_FAKE_RATE", "87.75")
+
+# Signed quote tokens (seconds until a quote expires). With QUOTE_TOKEN_REQUIRED,
+# create-payment rejects client-supplied amounts that do not come with a token.
+QUOTE_TOKEN_TTL = int(os.getenv("QUOTE_TOKEN_TTL", "900"))
+QUOTE_TOKEN_REQUIRED = os.getenv("QUOTE_TOKEN_REQUIRED", "False") == "True"
+
+# Verification reads orders from the local PaymentOrder table; set this to also
+# compare each one against Razorpay in the background
+PAYMENT_VERIFY_UPSTREAM_CHECK = os.getenv("PAYMENT_VERIFY_UPSTREAM_CHECK", "False") == "True"
+# Per-process LRU of verify responses, keyed by (order_id, payment_id)
+VERIFY_RESULT_CACHE_SIZE = int(os.getenv("VERIFY_RESULT_CACHE_SIZE", "10000"))
+
+# Razorpay webhooks (Dashboard > Webhooks secret). Events are stored by
+# payment/webhook/ and applied by `python manage.py process_webhooks`
+RAZORPAY_WEBHOOK_SECRET = os.getenv("RAZORPAY_WEBHOOK_SECRET")
+
+# `python manage.py reconcile_payments`: parallel slice fetches, slice length
+# (seconds) and resume file
+RECONCILE_CONCURRENCY = int(os.getenv("RECONCILE_CONCURRENCY", "4"))
+RECONCILE_SLICE_SECONDS = int(os.getenv("RECONCILE_SLICE_SECONDS", "900"))
+RECONCILE_CHECKPOINT_FILE = os.getenv("RECONCILE_CHECKPOINT_FILE", os.path.join(BASE_DIR, 'cache', 'reconcile_checkpoint.json'))
+
+# Idempotency-Key support for create-payment (seconds): how long outcomes are
+# replayed, how long a duplicate waits for the in-flight request (never past its
+# own CREATE_PAYMENT_DEADLINE), and when an in-flight claim is considered abandoned
+IDEMPOTENCY_TTL = int(os.getenv("IDEMPOTENCY_TTL", "86400"))
+IDEMPOTENCY_WAIT_TIMEOUT = int(os.getenv("IDEMPOTENCY_WAIT_TIMEOUT", "15"))
+IDEMPOTENCY_LOCK_TIMEOUT = int(os.getenv("IDEMPOTENCY_LOCK_TIMEOUT", "60"))
+
+# Logging: one file per app under LOGGING_DIR (everything else goes to app.log).
+# Request threads only put records on an in-memory queue of LOG_QUEUE_SIZE (full
+# means dropped, never blocked); a background thread writes them in batches.
+# Files rotate at LOG_MAX_BYTES, or on LOG_ROTATE_WHEN ("midnight", "h", ...) when
+# set, keeping LOG_BACKUP_COUNT gzipped copies. Rotation assumes one process per file.
+LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO")
+LOG_QUEUE_ENABLED = os.getenv("LOG_QUEUE_ENABLED", "True") == "True"
+LOG_QUEUE_SIZE = int(os.getenv("LOG_QUEUE_SIZE", "10000"))
+LOG_BATCH_SIZE = int(os.getenv("LOG_BATCH_SIZE", "500"))
+LOG_MAX_BYTES = int(os.getenv("LOG_MAX_BYTES", str(20 * 1024 * 1024)))
+LOG_ROTATE_WHEN = os.getenv("LOG_ROTATE_WHEN", "")
+LOG_BACKUP_COUNT = int(os.getenv("LOG_BACKUP_COUNT", "10"))
+LOG_APPS = ['payments', 'payments_razorpay', 'mailer', 'contact', 'demo', 'usd']
+
+
+def _log_file(filename):
+    handler = {
+        'formatter': 'standard',
+        'filename': os.path.join(LOGGING_DIR, filename),
+        'backupCount': LOG_BACKUP_COUNT,
+        'encoding': 'utf-8',
+        'delay': True,
+    }
+    if LOG_ROTATE_WHEN:
+        return {'class': 'payments.log_pipeline.TimedRotatingFileHandler', 'when': LOG_ROTATE_WHEN, **handler}
+    return {'class': 'payments.log_pipeline.RotatingFileHandler', 'maxBytes': LOG_MAX_BYTES, **handler}
+
+
+LOGGING_CONFIG = 'payments.log_pipeline.configure'
+LOGGING = {
+    'version': 1,
+    'disable_existing_loggers': False,
+    'formatters': {
+        'standard': {'format': '%(asctime)s %(levelname)s %(name)s %(message)s'},
+        'json': {'()': 'payments.events.JsonFormatter'},
+    },
+    'handlers': {
+        'app_file': _log_file('app.log'),
+        **{f'{app}_file': _log_file(f'{app}.log') for app in LOG_APPS},
+        # Order, verification and email events as JSON lines, for `manage.py log_stats`
+        'events_file': {**_log_file('events.log'), 'formatter': 'json'},
+        # Stalled requests and their stacks (payments.watchdog)
+        'slow_file': _log_file('slow.log'),
+    },
+    'root': {'handlers': ['app_file'], 'level': LOG_LEVEL},
+    'loggers': {
+        **{
+            app: {'handlers': [f'{app}_file'], 'level': LOG_LEVEL, 'propagate': False}
+            for app in LOG_APPS
+        },
+        'payments.events': {'handlers': ['events_file'], 'level': 'INFO', 'propagate': False},
+        'payments.slow': {'handlers': ['slow_file'], 'level': 'WARNING', 'propagate': False},
+    },
+}
+
+# Prometheus metrics at /metrics. Each worker writes a snapshot to METRICS_DIR
+# every METRICS_FLUSH_INTERVAL seconds so a scrape of any worker covers all of
+# them; a worker silent for METRICS_STALE_AFTER seconds is treated as gone.
+# Set METRICS_DIR to "" to report the scraped process only.
+METRICS_DIR = os.getenv("METRICS_DIR", os.path.join(BASE_DIR, 'cache', 'metrics'))
+METRICS_FLUSH_INTERVAL = float(os.getenv("METRICS_FLUSH_INTERVAL", "5"))
+METRICS_STALE_AFTER = float(os.getenv("METRICS_STALE_AFTER", "60"))
+
+# `manage.py test` writes log files and metrics snapshots to a scratch directory instead
+TEST_RUNNER = 'payments.test_runner.TestRunner'
+
+# Sampled request profiler: profiles PROFILE_SAMPLE_RATE of requests, plus any
+# request with an X-Profile header signed with PROFILE_SECRET (`manage.py
+# profile_token`). Stacks are sampled every PROFILE_INTERVAL seconds and written
+# as collapsed stacks (flamegraph.pl, speedscope) under PROFILE_DIR/<endpoint>/,
+# keeping the newest PROFILE_KEEP per endpoint. Off unless one of the two is set.
+PROFILE_SAMPLE_RATE = float(os.getenv("PROFILE_SAMPLE_RATE", "0"))
+PROFILE_SECRET = os.getenv("PROFILE_SECRET", "")
+PROFILE_TOKEN_TTL = int(os.getenv("PROFILE_TOKEN_TTL", "3600"))
+PROFILE_INTERVAL = float(os.getenv("PROFILE_INTERVAL", "0.005"))
+PROFILE_DIR = os.getenv("PROFILE_DIR", os.path.join(LOGGING_DIR, 'profiles'))
+PROFILE_KEEP = int(os.getenv("PROFILE_KEEP", "50"))
+
+# Request watchdog: a request still running after WATCHDOG_THRESHOLD seconds is
+# written to slow.log with its stack and the upstream call it is waiting on
+# (checked every WATCHDOG_INTERVAL seconds) and counted in slow_requests_total
+WATCHDOG_ENABLED = os.getenv("WATCHDOG_ENABLED", "True") == "True"
+WATCHDOG_THRESHOLD = float(os.getenv("WATCHDOG_THRESHOLD", "5"))
+WATCHDOG_INTERVAL = float(os.getenv("WATCHDOG_INTERVAL", "1"))
+
 
 # Database
 # https://docs.djangoproject.com/en/5.2/ref/settings/#databases
@@ -145,6 +341,11 @@ CORS_ALLOWED_ORIGINS = [
     "https://advolcano.vercel.app",
 ]
 
+# Browsers send Idempotency-Key cross-origin only if it is allowed here
+from corsheaders.defaults import default_headers
+CORS_ALLOW_HEADERS = (*default_headers, "idempotency-key")
+CORS_EXPOSE_HEADERS = ["Idempotent-Replayed"]
+
 # Static files (CSS, JavaScript, Images)
 # https://docs.djangoproject.com/en/5.2/howto/static-files/
 
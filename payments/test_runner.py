@@ -0,0 +1,40 @@
+import copy
+import os
+import shutil
+import tempfile
+
+from django.conf import settings
+from django.test.runner import DiscoverRunner
+
+from .log_pipeline import configure, pipeline
+from .metrics import registry
+
+
+def log_files_in(config, directory):
+    """``config`` (a ``LOGGING`` dict) with every handler's file moved into ``directory``."""
+    config = copy.deepcopy(config)
+    for handler in config.get('handlers', {}).values():
+        if 'filename' in handler:
+            handler['filename'] = os.path.join(directory, os.path.basename(handler['filename']))
+    return config
+
+
+class TestRunner(DiscoverRunner):
+    """
+    ``manage.py test`` runner: what the app writes next to the code while it
+    runs (log files, the worker's metrics snapshots) goes to a scratch
+    directory instead, removed at the end of the run.
+    """
+
+    def setup_test_environment(self, **kwargs):
+        super().setup_test_environment(**kwargs)
+        self.scratch_dir = tempfile.mkdtemp(prefix='advolcano-tests-')
+        configure(log_files_in(settings.LOGGING, os.path.join(self.scratch_dir, 'logs')))
+        registry.directory = os.path.join(self.scratch_dir, 'metrics')
+
+    def teardown_test_environment(self, **kwargs):
+        # Not back to METRICS_DIR: the flusher and the exit snapshot stay off disk
+        registry.directory = None
+        pipeline.stop()
+        shutil.rmtree(self.scratch_dir, ignore_errors=True)
+        super().teardown_test_environment(**kwargs)
@@ -0,0 +1,585 @@
+import asyncio
+import functools
+import gzip
+import json
+import logging
+import os
+import tempfile
+import threading
+import time
+from collections import Counter
+from decimal import Decimal
+from unittest import mock
+
+from django.test import RequestFactory, SimpleTestCase
+from django.urls import reverse
+from requests.exceptions import ReadTimeout
+
+from . import breakers, deadlines, profiling, watchdog
+from .breakers import CLOSED, HALF_OPEN, OPEN, CircuitBreaker, CircuitOpen
+from .deadlines import (
+    UPSTREAM_TIMEOUT,
+    DeadlineExceeded,
+    UpstreamTimeout,
+    current_deadline,
+    deadline,
+    upstream_call,
+    upstream_timeout,
+    with_deadline,
+)
+from .events import JsonFormatter, event_logger, log_event
+from .log_pipeline import LogPipeline, QueuedHandler, RotatingFileHandler
+from .metrics import ARCHIVE_FILE, CONTENT_TYPE, Registry, exposition, merge_snapshots
+
+
+class Upstream500(Exception):
+    pass
+
+
+class BadRequest(Exception):
+    pass
+
+
+class CircuitBreakerTests(SimpleTestCase):
+    def setUp(self):
+        self.now = 1000.0
+        # Only this module's clock: other threads keep the real one
+        patcher = mock.patch.object(breakers, 'time', mock.Mock(monotonic=lambda: self.now))
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.breaker = CircuitBreaker(
+            'test', window=30, failure_rate=0.5, min_calls=4, open_seconds=10, half_open_calls=1,
+            is_failure=lambda exc: not isinstance(exc, BadRequest),
+        )
+
+    def call(self, exc=None):
+        try:
+            with self.breaker:
+                if exc is not None:
+                    raise exc
+        except (Upstream500, BadRequest):
+            pass
+
+    def trip(self):
+        for _ in range(4):
+            self.call(Upstream500())
+
+    def test_opens_once_the_failure_rate_is_reached_over_min_calls(self):
+        for _ in range(3):
+            self.call(Upstream500())
+        self.assertEqual(self.breaker.state, CLOSED)  # below min_calls
+
+        self.call(Upstream500())
+
+        self.assertEqual(self.breaker.state, OPEN)
+        with self.assertRaises(CircuitOpen) as refused:
+            self.call()
+        self.assertEqual(refused.exception.retry_in, 10)
+        self.assertEqual(self.breaker.stats()['rejected'], 1)
+
+    def test_stays_closed_below_the_failure_rate(self):
+        for _ in range(3):
+            self.call()
+        self.call(Upstream500())
+        self.call(Upstream500())
+        self.assertEqual(self.breaker.state, CLOSED)  # 2 of 5
+
+    def test_failures_outside_the_window_are_forgotten(self):
+        for _ in range(3):
+            self.call(Upstream500())
+        self.now += 31
+        self.call(Upstream500())
+        self.assertEqual(self.breaker.state, CLOSED)
+
+    def test_errors_that_are_not_failures_do_not_count(self):
+        for _ in range(6):
+            self.call(BadRequest())
+        self.assertEqual(self.breaker.state, CLOSED)
+
+    def test_half_open_probe_success_closes(self):
+        self.trip()
+        self.now += 10
+        self.assertEqual(self.breaker.state, HALF_OPEN)
+
+        with self.breaker:
+            # Only one probe at a time
+            with self.assertRaises(CircuitOpen):
+                self.breaker.before_call()
+
+        self.assertEqual(self.breaker.state, CLOSED)
+        self.assertEqual(self.breaker.stats()['window_calls'], 0)
+
+    def test_check_refuses_while_open_without_taking_the_probe(self):
+        self.trip()
+        with self.assertRaises(CircuitOpen):
+            self.breaker.check()
+        self.assertEqual(self.breaker.stats()['rejected'], 1)
+
+        self.now += 10
+        self.breaker.check()
+        self.breaker.check()
+        # The probe is still there for the call itself
+        self.call()
+        self.assertEqual(self.breaker.state, CLOSED)
+
+    def test_half_open_probe_failure_opens_again(self):
+        self.trip()
+        self.now += 10
+
+        self.call(Upstream500())
+
+        self.assertEqual(self.breaker.state, OPEN)
+        self.assertEqual(self.breaker.retry_in(), 10)
+        self.assertEqual(self.breaker.stats()['opened'], 2)
+
+
+class DeadlineTests(SimpleTestCase):
+    def setUp(self):
+        self.now = 1000.0
+        clock = mock.Mock(monotonic=lambda: self.now, perf_counter=lambda: self.now)
+        patcher = mock.patch.object(deadlines, 'time', clock)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_without_a_deadline_the_cap_or_default_applies(self):
+        self.assertEqual(upstream_timeout('razorpay', 3), 3)
+        self.assertEqual(upstream_timeout('razorpay'), UPSTREAM_TIMEOUT)
+
+    def test_timeout_is_clamped_to_the_remaining_budget(self):
+        with deadline(2.0):
+            self.assertEqual(upstream_timeout('razorpay', 5), 2.0)
+            self.assertEqual(upstream_timeout('razorpay', 0.5), 0.5)
+            self.now += 1.5
+            self.assertEqual(upstream_timeout('razorpay', 5), 0.5)
+
+    def test_nested_deadline_cannot_extend_the_outer_one(self):
+        with deadline(1.0, 'outer') as outer:
+            with deadline(10.0, 'inner') as inner:
+                self.assertIs(inner, outer)
+            with deadline(0.5, 'inner') as inner:
+                self.assertEqual(inner.name, 'inner')
+            self.assertIs(current_deadline(), outer)
+
+    def test_expired_deadline_raises_before_the_call(self):
+        call = mock.Mock()
+        with deadline(1.0, 'verify'):
+            self.now += 0.99
+            with self.assertRaises(DeadlineExceeded) as raised:
+                with upstream_call('razorpay', 5) as timeout:
+                    call(timeout)
+
+        call.assert_not_called()
+        self.assertEqual(raised.exception.deadline.name, 'verify')
+
+    def test_client_timeout_becomes_upstream_timeout(self):
+        with deadline(5.0):
+            with self.assertRaises(UpstreamTimeout) as raised:
+                with upstream_call('razorpay', 1) as timeout:
+                    self.now += timeout
+                    raise ReadTimeout()
+
+        self.assertNotIsInstance(raised.exception, DeadlineExceeded)
+        self.assertEqual(raised.exception.timeout, 1)
+
+    def test_client_timeout_with_the_budget_spent_is_a_deadline_error(self):
+        with deadline(1.0):
+            with self.assertRaises(DeadlineExceeded):
+                with upstream_call('razorpay', 5) as timeout:
+                    self.now += timeout
+                    raise ReadTimeout()
+
+    def test_deadline_is_reset_after_the_block(self):
+        with self.assertRaises(ValueError):
+            with deadline(1.0):
+                raise ValueError()
+        self.assertIsNone(current_deadline())
+
+    def test_with_deadline_answers_504_and_resets_the_deadline(self):
+        seen = []
+
+        class View:
+            @with_deadline(2.0, 'verify-payment')
+            def post(self):
+                seen.append(current_deadline().name)
+                raise UpstreamTimeout('razorpay', 1.0)
+
+        response = View().post()
+
+        self.assertEqual(response.status_code, 504)
+        self.assertEqual(seen, ['verify-payment'])
+        self.assertIsNone(current_deadline())
+
+    def test_with_deadline_on_async_handlers(self):
+        class View:
+            @with_deadline(2.0)
+            async def post(self):
+                return upstream_timeout('razorpay', 5)
+
+        self.assertEqual(asyncio.run(View().post()), 2.0)
+        self.assertIsNone(current_deadline())
+
+
+def define_metrics(registry):
+    return (
+        registry.counter('jobs_total', 'Jobs run', ('kind', )),
+        registry.histogram('job_seconds', 'Job time', buckets=(0.1, 1.0)),
+        registry.gauge('queue_depth', 'Jobs waiting'),
+        registry.gauge('breaker_state', 'Worst breaker state', aggregate='max'),
+    )
+
+
+class MetricsTests(SimpleTestCase):
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.directory = directory.name
+        self.registry = Registry(directory=self.directory, flush_interval=60, stale_after=30)
+        self.addCleanup(self.registry.stop)
+        self.jobs, self.seconds, self.depth, self.state = define_metrics(self.registry)
+
+    def other_worker(self, pid, jobs=3, depth=4, state=2, exited=False, age=0):
+        """Snapshot file of another worker process, as its own flusher would write it."""
+        other = Registry(directory=None)
+        jobs_total, job_seconds, queue_depth, breaker_state = define_metrics(other)
+        jobs_total.inc('email', amount=jobs)
+        job_seconds.observe(0.5)
+        queue_depth.set(depth)
+        breaker_state.set(state)
+        path = os.path.join(self.directory, f'{pid}.json')
+        with open(path, 'w') as f:
+            json.dump({'exited': exited, 'metrics': other.snapshot()}, f)
+        if age:
+            os.utime(path, (time.time() - age, time.time() - age))
+        return path
+
+    def record_own(self):
+        self.jobs.inc('email', amount=2)
+        self.seconds.observe(0.05)
+        self.depth.set(1)
+        self.state.set(1)
+
+    def test_live_workers_are_merged(self):
+        self.record_own()
+        self.other_worker(90001)
+
+        merged = self.registry.collect()
+
+        self.assertEqual(merged['jobs_total']['series'], {('email', ): 5})
+        self.assertEqual(merged['job_seconds']['series'], {(): [1, 1, 0, 0.55]})
+        self.assertEqual(merged['queue_depth']['series'], {(): 5})     # summed
+        self.assertEqual(merged['breaker_state']['series'], {(): 2})   # worst worker
+
+    def test_exited_worker_is_archived_without_its_gauges(self):
+        self.record_own()
+        path = self.other_worker(90001, exited=True)
+
+        merged = self.registry.collect()
+
+        self.assertFalse(os.path.exists(path))
+        self.assertTrue(os.path.exists(os.path.join(self.directory, ARCHIVE_FILE)))
+        self.assertEqual(merged['jobs_total']['series'], {('email', ): 5})
+        self.assertEqual(merged['queue_depth']['series'], {(): 1})
+        # Counted once, from the archive, on every later scrape
+        self.assertEqual(self.registry.collect()['jobs_total']['series'], {('email', ): 5})
+
+    def test_silent_worker_is_archived(self):
+        self.record_own()
+        path = self.other_worker(90001, age=31)
+        self.other_worker(90002, jobs=1)
+
+        merged = self.registry.collect()
+
+        self.assertFalse(os.path.exists(path))
+        self.assertEqual(merged['jobs_total']['series'], {('email', ): 6})
+        self.assertEqual(merged['queue_depth']['series'], {(): 5})
+
+    def test_worker_with_other_buckets_is_skipped(self):
+        other = Registry(directory=None)
+        other.histogram('job_seconds', 'Job time', buckets=(0.5, ))
+        self.seconds.observe(0.05)
+
+        merged = merge_snapshots([self.registry.snapshot(), other.snapshot()])
+
+        self.assertEqual(merged['job_seconds']['series'], {(): [1, 0, 0, 0.05]})
+
+    def test_exposition_format(self):
+        self.jobs.inc('say "hi"\n')
+        self.seconds.observe(0.05)
+        self.seconds.observe(2.0)
+
+        text = exposition(merge_snapshots([self.registry.snapshot()]))
+
+        self.assertEqual(text, '\n'.join([
+            '# HELP breaker_state Worst breaker state',
+            '# TYPE breaker_state gauge',
+            '# HELP job_seconds Job time',
+            '# TYPE job_seconds histogram',
+            'job_seconds_bucket{le="0.1"} 1',
+            'job_seconds_bucket{le="1.0"} 1',
+            'job_seconds_bucket{le="+Inf"} 2',
+            'job_seconds_sum 2.05',
+            'job_seconds_count 2',
+            '# HELP jobs_total Jobs run',
+            '# TYPE jobs_total counter',
+            'jobs_total{kind="say \\"hi\\"\\n"} 1',
+            '# HELP queue_depth Jobs waiting',
+            '# TYPE queue_depth gauge',
+        ]) + '\n')
+
+    def test_metrics_endpoint(self):
+        response = self.client.get(reverse('metrics'))
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['Content-Type'], CONTENT_TYPE)
+        self.assertIn('# TYPE http_requests_total counter', response.content.decode())
+
+
+class BlockingHandler(logging.Handler):
+    """Holds the listener on its first record until ``unblock`` is set."""
+
+    def __init__(self):
+        super().__init__()
+        self.unblock = threading.Event()
+
+    def emit(self, record):
+        self.unblock.wait(5)
+
+
+class LogPipelineTests(SimpleTestCase):
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.directory = directory.name
+        self.logger = logging.getLogger('payments.tests.pipeline')
+        self.logger.propagate = False
+        self.addCleanup(setattr, self.logger, 'handlers', [])
+
+    def file_handler(self, name='app.log', **kwargs):
+        handler = RotatingFileHandler(os.path.join(self.directory, name), delay=True, **kwargs)
+        handler.setFormatter(logging.Formatter('%(message)s'))
+        handler.queued = True
+        self.addCleanup(handler.close)
+        return handler
+
+    def queue(self, pipeline, *targets):
+        self.addCleanup(pipeline.stop)
+        self.logger.handlers = [QueuedHandler(target, pipeline) for target in targets]
+
+    def read(self, name='app.log'):
+        with open(os.path.join(self.directory, name)) as f:
+            return f.read().splitlines()
+
+    def wait_for_written(self, pipeline, count):
+        deadline = time.monotonic() + 5
+        while pipeline.stats()['written'] < count:
+            self.assertLess(time.monotonic(), deadline, 'listener did not write the records')
+            time.sleep(0.01)
+
+    def wait_for_queue_empty(self, pipeline):
+        deadline = time.monotonic() + 5
+        while pipeline.stats()['queued']:
+            self.assertLess(time.monotonic(), deadline, 'listener did not take the record')
+            time.sleep(0.01)
+
+    def test_records_are_written_by_the_listener(self):
+        pipeline = LogPipeline()
+        handler = self.file_handler()
+        self.queue(pipeline, handler)
+        items = ['a']
+
+        self.logger.warning('paid %s', items)
+        items.append('b')  # after the call: not in the message
+        pipeline.stop()
+
+        self.assertEqual(self.read(), ["paid ['a']"])
+        self.assertEqual(pipeline.stats()['written'], 1)
+        self.assertFalse(pipeline._thread.is_alive())
+
+    def test_listener_flushes_once_per_batch(self):
+        pipeline = LogPipeline(batch_size=50)
+        blocker, handler = BlockingHandler(), self.file_handler()
+        self.queue(pipeline, blocker)
+        self.logger.warning('hold the listener')
+        self.logger.handlers = [QueuedHandler(handler, pipeline)]
+        for n in range(10):
+            self.logger.warning('record %d', n)
+
+        with mock.patch.object(handler, 'flush', wraps=handler.flush) as flush:
+            blocker.unblock.set()
+            self.wait_for_written(pipeline, 11)
+
+        flush.assert_called_once()
+        self.assertEqual(len(self.read()), 10)
+
+    def test_full_queue_drops_instead_of_blocking(self):
+        pipeline = LogPipeline(maxsize=2)
+        blocker = BlockingHandler()
+        self.queue(pipeline, blocker)
+        self.logger.warning('taken by the listener')
+        self.wait_for_queue_empty(pipeline)
+
+        for n in range(3):
+            self.logger.warning('record %d', n)
+
+        self.assertEqual(pipeline.stats()['dropped'], 1)
+        blocker.unblock.set()
+        pipeline.stop()
+        self.assertEqual(pipeline.stats()['written'], 3)
+
+    def test_records_after_shutdown_are_written_directly(self):
+        pipeline = LogPipeline()
+        handler = self.file_handler()
+        self.queue(pipeline, handler)
+        self.logger.warning('queued')
+        pipeline.stop()
+
+        self.logger.warning('at exit')
+
+        self.assertEqual(self.read(), ['queued', 'at exit'])
+
+    def test_rotated_file_is_compressed(self):
+        pipeline = LogPipeline()
+        handler = self.file_handler(maxBytes=20, backupCount=2)
+        self.queue(pipeline, handler)
+        pipeline.handlers.add(handler)
+
+        self.logger.warning('first line of text')
+        self.logger.warning('second line of text')
+        pipeline.stop()
+
+        self.assertEqual(self.read(), ['second line of text'])
+        with gzip.open(os.path.join(self.directory, 'app.log.1.gz'), 'rt') as f:
+            self.assertEqual(f.read(), 'first line of text\n')
+
+
+class JsonEventFormatTests(SimpleTestCase):
+    def setUp(self):
+        self.lines = []
+        handler = logging.Handler()
+        handler.setFormatter(JsonFormatter())
+        handler.emit = lambda record: self.lines.append(json.loads(handler.format(record)))
+        event_logger.addHandler(handler)
+        self.addCleanup(event_logger.removeHandler, handler)
+
+    def test_event_fields_are_top_level(self):
+        log_event('order.created', order_id='order_1', amount=Decimal('90.85'), duration_ms=12.5)
+
+        entry, = self.lines
+        self.assertRegex(entry.pop('ts'), r'^\d{4}-\d\d-\d\dT\d\d:\d\d:\d\d\.\d{3}\+00:00$')
+        self.assertEqual(entry, {
+            'level': 'INFO', 'event': 'order.created', 'order_id': 'order_1', 'amount': '90.85', 'duration_ms': 12.5,
+        })
+
+    def test_plain_records_and_exceptions(self):
+        try:
+            raise ValueError('bad payload')
+        except ValueError:
+            event_logger.exception('could not parse %s', 'webhook')
+
+        entry, = self.lines
+        self.assertEqual(
+            (entry['logger'], entry['message'], entry['level']), ('payments.events', 'could not parse webhook', 'ERROR')
+        )
+        self.assertIn('ValueError: bad payload', entry['exc'])
+
+
+def busy_view(request, seconds=0.2):
+    """A view that keeps its thread on the CPU, for the sampler to find."""
+    until = time.perf_counter() + seconds
+    while time.perf_counter() < until:
+        pass
+    return 'ok'
+
+
+class ProfilerTests(SimpleTestCase):
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.directory = directory.name
+
+    def profiled_request(self, **extra):
+        request = RequestFactory().get('/api/usd/quote/', **extra)
+        request.resolver_match = mock.Mock(route='api/usd/quote/')
+        with mock.patch.object(profiling, 'write_profile',
+                               functools.partial(profiling.write_profile, directory=self.directory)):
+            return profiling.profiling_middleware(busy_view)(request)
+
+    def test_sampled_request_writes_a_collapsed_stack_report(self):
+        with mock.patch.object(profiling, 'PROFILE_SAMPLE_RATE', 1.0):
+            self.assertEqual(self.profiled_request(), 'ok')
+
+        folder = os.path.join(self.directory, 'api_usd_quote')
+        reports = os.listdir(folder)
+        self.assertEqual(len(reports), 1)
+        self.assertRegex(reports[0], r'-GET-\d+ms\.folded$')
+        with open(os.path.join(folder, reports[0])) as f:
+            lines = f.read().splitlines()
+        self.assertTrue(lines)
+        for line in lines:
+            self.assertRegex(line, r' [1-9]\d*$')
+        self.assertTrue(any('busy_view (payments/tests.py:' in line for line in lines))
+
+    def test_signed_header_opts_a_request_in(self):
+        with mock.patch.object(profiling, 'PROFILE_SECRET', 'profile-secret'):
+            self.profiled_request(HTTP_X_PROFILE='profile:forged')
+            self.assertEqual(os.listdir(self.directory), [])
+
+            self.profiled_request(HTTP_X_PROFILE=profiling.sign_profile_token('profile-secret'))
+        self.assertEqual(len(os.listdir(os.path.join(self.directory, 'api_usd_quote'))), 1)
+
+    def test_only_the_newest_profiles_are_kept(self):
+        paths = [
+            profiling.write_profile('api/usd/quote/', 'GET', Counter({'a;b': n}), 0.01,
+                                    directory=self.directory, keep=2)
+            for n in range(1, 4)
+        ]
+        folder = os.path.join(self.directory, 'api_usd_quote')
+        self.assertEqual(sorted(os.listdir(folder)), sorted(os.path.basename(path) for path in paths[1:]))
+
+
+class WatchdogTests(SimpleTestCase):
+    def setUp(self):
+        self.watchdog = watchdog.Watchdog(threshold=0.05, interval=3600)
+        patcher = mock.patch.object(watchdog, 'watchdog', self.watchdog)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def stalled_view(self, request):
+        watchdog.upstream_started('razorpay', 'fetch_order', 8.0)
+        self.unblock.wait(5)
+        return 'ok'
+
+    def test_slow_request_is_reported_once_with_its_stack(self):
+        self.unblock = threading.Event()
+        request = RequestFactory().post('/api/payment/verify/')
+        request.resolver_match = mock.Mock(route='api/payment/verify/')
+        handler = watchdog.watchdog_middleware(self.stalled_view)
+        worker = threading.Thread(target=handler, args=(request,))
+        before = watchdog.slow_requests.samples().get(('api/payment/verify/', 'razorpay'), 0)
+
+        with self.assertLogs('payments.slow', 'WARNING') as logs:
+            worker.start()
+            time.sleep(0.1)
+            self.assertEqual(self.watchdog.in_flight(), 1)
+            self.watchdog.check()
+            self.watchdog.check()
+            self.unblock.set()
+            worker.join(5)
+
+        self.assertEqual(len(logs.records), 2)
+        report, finished = logs.records
+        self.assertIn('Slow request: POST api/payment/verify/ running for', report.getMessage())
+        self.assertIn('waiting on razorpay fetch_order', report.getMessage())
+        self.assertIn('in stalled_view', report.getMessage())
+        self.assertIn('Slow request finished: POST api/payment/verify/', finished.getMessage())
+        self.assertEqual(
+            watchdog.slow_requests.samples()[('api/payment/verify/', 'razorpay')], before + 1
+        )
+        self.assertEqual(self.watchdog.in_flight(), 0)
+
+    def test_fast_request_is_not_reported(self):
+        request = RequestFactory().get('/api/usd/quote/')
+        with mock.patch.object(watchdog.slow_logger, 'warning') as warning:
+            self.assertEqual(watchdog.watchdog_middleware(lambda request: 'ok')(request), 'ok')
+            self.watchdog.check()
+        warning.assert_not_called()
@@ -1,6 +1,8 @@
 from django.contrib import admin
 from django.urls import path, include
 
+from .views import UpstreamStatusAPIView, metrics_view
+
 urlpatterns = [
     path('admin/', admin.site.urls),
 
@@ -11,4 +13,16 @@ urlpatterns = [
     path('api/', include('demo.urls')),
 
     path('api/', include('contact.urls')),
+
+    # USD->INR exchange rate
+    path('api/', include('usd.urls')),
+
+    # Shared mail dispatcher stats
+    path('api/', include('mailer.urls')),
+
+    # Circuit breaker state per upstream
+    path('api/upstreams/', UpstreamStatusAPIView.as_view(), name='upstream-status'),
+
+    # Prometheus metrics (all workers)
+    path('metrics', metrics_view, name='metrics'),
 ]
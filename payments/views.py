@@ -0,0 +1,24 @@
+from django.http import HttpResponse
+from rest_framework.views import APIView
+from rest_framework.response import Response
+from rest_framework import status
+
+from .breakers import breaker_stats
+from .metrics import CONTENT_TYPE, registry
+
+
+class UpstreamStatusAPIView(APIView):
+    """
+    State of this worker's circuit breakers (Razorpay, SendGrid): closed, open
+    or half-open, failure rate over the sliding window and call counters
+    """
+    def get(self, request):
+        return Response({"breakers": breaker_stats()}, status=status.HTTP_200_OK)
+
+
+def metrics_view(request):
+    """
+    Prometheus scrape endpoint: request, upstream and email metrics of all
+    worker processes (see ``payments.metrics``) in text exposition format
+    """
+    return HttpResponse(registry.exposition(), content_type=CONTENT_TYPE)
@@ -0,0 +1,198 @@
+import asyncio
+import contextvars
+import logging
+import os
+import sys
+import threading
+import time
+import traceback
+from asyncio import iscoroutinefunction
+
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.utils.decorators import sync_and_async_middleware
+
+from .metrics import registry
+
+logger = logging.getLogger(__name__)
+
+# Stalled requests, with their stacks; a file of their own (see settings.LOGGING)
+slow_logger = logging.getLogger('payments.slow')
+
+# === Watchdog configuration (seconds) ===
+WATCHDOG_ENABLED = getattr(settings, 'WATCHDOG_ENABLED', True)
+WATCHDOG_THRESHOLD = getattr(settings, 'WATCHDOG_THRESHOLD', 5)
+WATCHDOG_INTERVAL = getattr(settings, 'WATCHDOG_INTERVAL', 1)
+
+_current = contextvars.ContextVar('watched_request', default=None)
+
+slow_requests = registry.counter(
+    'slow_requests_total', 'Requests still running after WATCHDOG_THRESHOLD, by endpoint and upstream in progress',
+    ('endpoint', 'upstream'),
+)
+
+
+class _Watch:
+    __slots__ = ('request', 'thread_id', 'task', 'started', 'upstream', 'reported')
+
+    def __init__(self, request, thread_id, task=None):
+        self.request = request
+        self.thread_id = thread_id
+        self.task = task
+        self.started = time.monotonic()
+        self.upstream = None  # (upstream, operation, timeout, started) of the call in progress
+        self.reported = False
+
+    def endpoint(self):
+        match = getattr(self.request, 'resolver_match', None)
+        return match.route if match is not None else self.request.path
+
+
+# === Upstream calls in progress (from payments.deadlines.upstream_call) ===
+def upstream_started(upstream, operation, timeout):
+    """Note the call the current request is about to make; returns a handle for ``upstream_finished``."""
+    watch = _current.get()
+    if watch is not None:
+        watch.upstream = (upstream, operation, timeout, time.monotonic())
+    return watch
+
+
+def upstream_finished(watch):
+    if watch is not None:
+        watch.upstream = None
+
+
+def _await_chain(coro):
+    while coro is not None:
+        frame = getattr(coro, 'cr_frame', None) or getattr(coro, 'gi_frame', None)
+        if frame is None:
+            return
+        yield frame, frame.f_lineno
+        coro = getattr(coro, 'cr_await', None) or getattr(coro, 'gi_yieldfrom', None)
+
+
+class Watchdog:
+    """
+    Keeps the requests in flight in this process and, every ``interval``
+    seconds, reports each one that has been running for more than
+    ``threshold`` seconds: once, to the slow log, with its stack, endpoint,
+    elapsed time and the upstream call it is waiting on. The check runs on
+    its own thread, so a request that never returns is still reported.
+    """
+
+    def __init__(self, threshold=WATCHDOG_THRESHOLD, interval=WATCHDOG_INTERVAL):
+        self.threshold = threshold
+        self.interval = interval
+        self.started = False
+        self._watches = {}
+        self._lock = threading.Lock()
+
+    def start(self):
+        with self._lock:
+            if self.started:
+                return
+            self.started = True
+            threading.Thread(target=self._run, name='request-watchdog', daemon=True).start()
+
+    def _after_fork(self):
+        self._lock = threading.Lock()
+        self._watches = {}
+        self.started = False
+
+    def watch(self, request, task=None):
+        if not self.started:
+            self.start()
+        watch = _Watch(request, threading.get_ident(), task)
+        with self._lock:
+            self._watches[id(watch)] = watch
+        return watch, _current.set(watch)
+
+    def done(self, watch, token):
+        _current.reset(token)
+        with self._lock:
+            self._watches.pop(id(watch), None)
+        if watch.reported:
+            slow_logger.warning(
+                f"Slow request finished: {watch.request.method} {watch.endpoint()} "
+                f"after {time.monotonic() - watch.started:.1f}s"
+            )
+
+    def in_flight(self):
+        with self._lock:
+            return len(self._watches)
+
+    def _run(self):
+        while True:
+            time.sleep(self.interval)
+            try:
+                self.check()
+            except Exception as e:
+                logger.error(f"Watchdog check failed: {e}")
+
+    def check(self):
+        now = time.monotonic()
+        with self._lock:
+            stalled = [
+                watch for watch in self._watches.values()
+                if not watch.reported and now - watch.started > self.threshold
+            ]
+        if not stalled:
+            return
+        frames = sys._current_frames()
+        for watch in stalled:
+            watch.reported = True
+            self._report(watch, now, frames)
+
+    def _stack(self, watch, frames):
+        if watch.task is not None:
+            # The event loop thread runs other requests too: follow the request's own await chain
+            return ''.join(traceback.StackSummary.extract(_await_chain(watch.task.get_coro())).format())
+        frame = frames.get(watch.thread_id)
+        if frame is None:
+            return '(thread has exited)\n'
+        return ''.join(traceback.format_stack(frame))
+
+    def _report(self, watch, now, frames):
+        endpoint = watch.endpoint()
+        call = watch.upstream
+        if call is not None:
+            upstream, operation, timeout, call_started = call
+            waiting = f"waiting on {upstream} {operation} for {now - call_started:.1f}s (timeout {timeout:.1f}s)"
+        else:
+            upstream, waiting = 'none', 'no upstream call in progress'
+        slow_requests.inc(endpoint, upstream)
+        slow_logger.warning(
+            f"Slow request: {watch.request.method} {endpoint} running for {now - watch.started:.1f}s, "
+            f"{waiting}, pid={os.getpid()} thread={watch.thread_id}\n{self._stack(watch, frames)}"
+        )
+
+
+watchdog = Watchdog()
+os.register_at_fork(after_in_child=watchdog._after_fork)
+
+registry.gauge(
+    'requests_in_flight', 'Requests being handled right now', collect=lambda: {(): watchdog.in_flight()},
+)
+
+
+@sync_and_async_middleware
+def watchdog_middleware(get_response):
+    """Register every request with the watchdog for as long as it runs (off with WATCHDOG_ENABLED)."""
+    if not WATCHDOG_ENABLED:
+        raise MiddlewareNotUsed
+
+    if iscoroutinefunction(get_response):
+        async def middleware(request):
+            watch, token = watchdog.watch(request, asyncio.current_task())
+            try:
+                return await get_response(request)
+            finally:
+                watchdog.done(watch, token)
+    else:
+        def middleware(request):
+            watch, token = watchdog.watch(request)
+            try:
+                return get_response(request)
+            finally:
+                watchdog.done(watch, token)
+    return middleware
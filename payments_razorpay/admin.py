@@ -1,3 +1,19 @@
 from django.contrib import admin
 
-# Register your models here.
+from .models import PaymentOrder, WebhookEvent
+
+
+@admin.register(PaymentOrder)
+class PaymentOrderAdmin(admin.ModelAdmin):
+    list_display = ('order_id', 'name', 'email', 'amount_usd', 'total_amount', 'status', 'payment_id', 'created_at', 'paid_at')
+    list_filter = ('status',)
+    search_fields = ('order_id', 'payment_id', 'email', 'name')
+    readonly_fields = ('created_at', 'paid_at')
+
+
+@admin.register(WebhookEvent)
+class WebhookEventAdmin(admin.ModelAdmin):
+    list_display = ('event_id', 'event', 'status', 'attempts', 'received_at', 'processed_at')
+    list_filter = ('status', 'event')
+    search_fields = ('event_id',)
+    readonly_fields = ('payload', 'received_at', 'claimed_at', 'processed_at', 'last_error')
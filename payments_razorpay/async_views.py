@@ -0,0 +1,246 @@
+import asyncio
+import logging
+import time
+from datetime import datetime
+
+import httpx
+import razorpay
+from asgiref.sync import async_to_sync, sync_to_async
+from rest_framework.response import Response
+from rest_framework import status
+from django.urls import reverse
+
+from payments.async_api import AsyncAPIView
+from payments.breakers import CircuitOpen, unavailable_response
+from payments.deadlines import (
+    CREATE_PAYMENT_DEADLINE,
+    VERIFY_PAYMENT_DEADLINE,
+    UpstreamTimeout,
+    timeout_response,
+    upstream_timeout,
+    with_deadline,
+)
+from payments.events import log_event, ms_since
+
+from .clients import RAZORPAY_ERRORS, get_async_razorpay_client, get_razorpay_client
+from .idempotency import request_fingerprint, run_idempotent
+from .models import PaymentOrder
+from .views import (
+    PAYMENT_VERIFY_FAST_ACK,
+    RAZORPAY_FETCH_DEADLINE,
+    RAZORPAY_FETCH_TIMEOUT,
+    RAZORPAY_KEY_ID,
+    RAZORPAY_KEY_SECRET,
+    PaymentDetailsUnavailable,
+    PaymentSerializer,
+    build_order_data,
+    complete_verified_payment,
+    details_unavailable_response,
+    log_payment_failure,
+    on_order_created,
+    order_details_from_notes,
+    start_verification_followup,
+    verification_results,
+)
+
+logger = logging.getLogger(__name__)
+
+ASYNC_RAZORPAY_ERRORS = (*RAZORPAY_ERRORS, httpx.HTTPError)
+
+
+# === Async create-payment ===
+class AsyncCreatePaymentAPIView(AsyncAPIView):
+    """
+    ASGI variant of CreatePaymentAPIView: the Razorpay call is awaited on
+    httpx, so a worker is not tied up while the order is created.
+    """
+
+    @with_deadline(CREATE_PAYMENT_DEADLINE, "create-payment")
+    async def post(self, request):
+        serializer = PaymentSerializer(data=request.data)
+        if not serializer.is_valid():
+            return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+
+        data = serializer.validated_data
+
+        idempotency_key = request.headers.get('Idempotency-Key')
+        if idempotency_key:
+            # The idempotency store is ORM-backed and sync; the order itself is
+            # still created on this loop
+            return await sync_to_async(run_idempotent)(
+                "create-payment", idempotency_key,
+                request_fingerprint(request.data),
+                lambda: async_to_sync(self.create_order)(data)
+            )
+        return await self.create_order(data)
+
+    async def create_order(self, data):
+        started = time.monotonic()
+        try:
+            client = get_async_razorpay_client(RAZORPAY_KEY_ID, RAZORPAY_KEY_SECRET)
+            order = await client.create_order(build_order_data(data))
+        except CircuitOpen as e:
+            log_event('order.failed', reason='circuit_open', duration_ms=ms_since(started))
+            return unavailable_response(e)
+        except UpstreamTimeout as e:
+            log_event('order.failed', reason='timeout', duration_ms=ms_since(started))
+            return timeout_response(e)
+        except ASYNC_RAZORPAY_ERRORS as e:
+            logger.error(f"Razorpay order creation failed: {e}")
+            log_event('order.failed', reason='upstream_error', error=str(e), duration_ms=ms_since(started))
+            return Response({"error": "Could not create order"}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+        except Exception as e:
+            logger.error(f"Unexpected error creating order: {e}")
+            log_event('order.failed', reason='error', error=str(e), duration_ms=ms_since(started))
+            return Response({"error": "Could not create order"}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+
+        await sync_to_async(on_order_created)(order.get('id'), data, duration_ms=ms_since(started))
+
+        return Response({
+            "order_id": order.get("id"),
+            "razorpay_key": RAZORPAY_KEY_ID,
+            "amount_inr": round(float(data['total_amount']), 2),
+        }, status=status.HTTP_200_OK)
+
+
+# === Async verification ===
+async def fetch_verified_payment_details_async(razorpay_order_id, razorpay_payment_id):
+    """Async twin of ``fetch_verified_payment_details``: both fetches awaited together."""
+    client = get_async_razorpay_client(RAZORPAY_KEY_ID, RAZORPAY_KEY_SECRET)
+    fetch_timeout = upstream_timeout('razorpay', RAZORPAY_FETCH_TIMEOUT)
+    fetch_deadline = upstream_timeout('razorpay', RAZORPAY_FETCH_DEADLINE)
+    admin_order_details = None
+    payment_info = {
+        'razorpay_order_id': razorpay_order_id,
+        'razorpay_payment_id': razorpay_payment_id,
+        'timestamp': datetime.now().timestamp()
+    }
+
+    try:
+        order, payment = await asyncio.wait_for(
+            asyncio.gather(
+                client.fetch_order(razorpay_order_id, timeout=fetch_timeout),
+                client.fetch_payment(razorpay_payment_id, timeout=fetch_timeout),
+                return_exceptions=True
+            ),
+            timeout=fetch_deadline
+        )
+    except asyncio.TimeoutError:
+        logger.error(f"❌ Order/payment fetch exceeded {fetch_deadline:.2f}s deadline: OrderID={razorpay_order_id}")
+        order = payment = None
+
+    if isinstance(order, dict):
+        admin_order_details = order_details_from_notes(order)
+        logger.info(f"📋 Order details retrieved: {admin_order_details}")
+    elif order is not None:
+        logger.error(f"❌ Failed to fetch order details: {str(order)}")
+
+    if isinstance(payment, dict):
+        payment_info['timestamp'] = payment.get('created_at', payment_info['timestamp'])
+    else:
+        admin_order_details = None
+        if payment is not None:
+            logger.error(f"❌ Failed to fetch payment details: {str(payment)}")
+    return admin_order_details, payment_info
+
+
+async def complete_verified_payment_async(razorpay_order_id, razorpay_payment_id):
+    """
+    Orders in the local store need no upstream call at all; for the others the
+    Razorpay fetches are awaited here before the sync claim-and-notify step.
+    """
+    prefetched = None
+    if not await PaymentOrder.objects.filter(pk=razorpay_order_id).aexists():
+        prefetched = await fetch_verified_payment_details_async(razorpay_order_id, razorpay_payment_id)
+    return await sync_to_async(complete_verified_payment)(razorpay_order_id, razorpay_payment_id, prefetched)
+
+
+class AsyncVerifyPaymentAPIView(AsyncAPIView):
+    """ASGI variant of VerifyPaymentAPIView"""
+
+    @with_deadline(VERIFY_PAYMENT_DEADLINE, "verify-payment")
+    async def post(self, request):
+        started = time.monotonic()
+        data = request.data
+
+        razorpay_order_id = data.get('razorpay_order_id')
+        razorpay_payment_id = data.get('razorpay_payment_id')
+        razorpay_signature = data.get('razorpay_signature')
+
+        if not all([razorpay_order_id, razorpay_payment_id, razorpay_signature]):
+            logger.warning("⚠️ Missing payment verification parameters")
+            return Response(
+                {"error": "Missing payment details"},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        try:
+            # Signature check is a local HMAC, no I/O
+            get_razorpay_client(RAZORPAY_KEY_ID, RAZORPAY_KEY_SECRET).utility.verify_payment_signature({
+                'razorpay_order_id': razorpay_order_id,
+                'razorpay_payment_id': razorpay_payment_id,
+                'razorpay_signature': razorpay_signature
+            })
+        except razorpay.errors.SignatureVerificationError as e:
+            logger.error(f"❌ Signature verification failed: {str(e)}")
+            log_payment_failure(razorpay_order_id, razorpay_payment_id, 'signature', started)
+            return Response(
+                {"error": "Invalid payment signature"},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        result_key = (razorpay_order_id, razorpay_payment_id)
+        cached = verification_results.get(result_key)
+        if cached is not None:
+            return Response(cached, status=status.HTTP_200_OK)
+
+        logger.info(f"✅ Payment verified: OrderID={razorpay_order_id}, PaymentID={razorpay_payment_id}")
+
+        try:
+            handle = None
+            if PAYMENT_VERIFY_FAST_ACK:
+                handle = await sync_to_async(start_verification_followup)(razorpay_order_id, razorpay_payment_id)
+            if handle is not None:
+                response_data = {
+                    "status": "Payment verified successfully",
+                    "verification_handle": handle,
+                    "status_url": reverse('verify-payment-status', args=[handle]),
+                    "order_id": razorpay_order_id,
+                    "payment_id": razorpay_payment_id
+                }
+                verification_results.set(result_key, response_data)
+                log_event(
+                    'payment.verified', order_id=razorpay_order_id, payment_id=razorpay_payment_id,
+                    fast_ack=True, duration_ms=ms_since(started)
+                )
+                return Response(response_data, status=status.HTTP_200_OK)
+
+            outcome = await complete_verified_payment_async(razorpay_order_id, razorpay_payment_id)
+        except UpstreamTimeout as e:
+            log_payment_failure(razorpay_order_id, razorpay_payment_id, 'timeout', started)
+            return timeout_response(e)
+        except PaymentDetailsUnavailable as e:
+            logger.error(f"❌ {str(e)}, payment left for the next verification")
+            log_payment_failure(razorpay_order_id, razorpay_payment_id, 'upstream_error', started)
+            return details_unavailable_response()
+        except Exception as e:
+            logger.error(f"❌ Unexpected error during verification: {str(e)}")
+            log_payment_failure(razorpay_order_id, razorpay_payment_id, 'error', started)
+            return Response(
+                {"error": "Internal server error"},
+                status=status.HTTP_500_INTERNAL_SERVER_ERROR
+            )
+
+        log_event(
+            'payment.verified', order_id=razorpay_order_id, payment_id=razorpay_payment_id,
+            fast_ack=False, duration_ms=ms_since(started), **outcome
+        )
+        response_data = {
+            "status": "Payment verified successfully",
+            **outcome,
+            "order_id": razorpay_order_id,
+            "payment_id": razorpay_payment_id
+        }
+        if outcome["admin_notified"] is not None:
+            verification_results.set(result_key, response_data)
+        return Response(response_data, status=status.HTTP_200_OK)
@@ -0,0 +1,237 @@
+import asyncio
+import logging
+import threading
+import weakref
+
+import httpx
+import razorpay
+from razorpay.constants import ERROR_CODE
+from requests import Session
+from django.conf import settings
+
+from payments.breakers import get_breaker
+from payments.deadlines import upstream_call
+from payments.pools import TrackingHTTPAdapter
+
+logger = logging.getLogger(__name__)
+
+# === Pool configuration ===
+RAZORPAY_POOL_SIZE = getattr(settings, 'RAZORPAY_POOL_SIZE', 10)
+RAZORPAY_POOL_BLOCK = getattr(settings, 'RAZORPAY_POOL_BLOCK', False)
+RAZORPAY_BASE_URL = getattr(settings, 'RAZORPAY_BASE_URL', razorpay.Client.DEFAULTS['base_url'])
+RAZORPAY_ASYNC_POOL_SIZE = getattr(settings, 'RAZORPAY_ASYNC_POOL_SIZE', 200)
+RAZORPAY_FETCH_TIMEOUT = getattr(settings, 'RAZORPAY_FETCH_TIMEOUT', 5)
+
+# What the Razorpay clients raise for error responses
+RAZORPAY_ERRORS = (
+    razorpay.errors.BadRequestError,
+    razorpay.errors.GatewayError,
+    razorpay.errors.ServerError,
+)
+
+
+def _is_razorpay_failure(exc):
+    # A rejected request (bad amount, unknown id) says nothing about Razorpay's health
+    return not isinstance(exc, razorpay.errors.BadRequestError)
+
+
+razorpay_breaker = get_breaker('razorpay', is_failure=_is_razorpay_failure)
+
+
+def razorpay_operation(method, path):
+    """
+    Metrics label for a Razorpay API call: ``POST /v1/orders`` is "order.create",
+    ``GET /v1/orders/order_X`` "order.fetch", ``GET /v1/orders/order_X/payments``
+    "order.payments". Ids never end up in the label.
+    """
+    segments = [segment for segment in path.split('?', 1)[0].split('/') if segment and segment != 'v1']
+    if not segments:
+        return method.lower()
+    resource = segments[0][:-1] if segments[0].endswith('s') else segments[0]
+    if len(segments) > 2:
+        return f"{resource}.{'.'.join(segments[2:])}"
+    if len(segments) == 2:
+        return f"{resource}.{'fetch' if method == 'GET' else method.lower()}"
+    return f"{resource}.{'create' if method == 'POST' else 'all' if method == 'GET' else method.lower()}"
+
+
+class PooledRazorpayClient(razorpay.Client):
+    """
+    Razorpay client bound to a keep-alive session.
+
+    The stock client looks its own version up through pkg_resources on every
+    request to build the User-Agent header; the value never changes for the
+    life of the process, so it is resolved once here. Requests never go out
+    without a timeout (see ``payments.deadlines``) and go through the shared
+    Razorpay circuit breaker (``payments.breakers``).
+    """
+
+    def __init__(self, session=None, auth=None, **options):
+        super().__init__(session=session, auth=auth, **options)
+        self._version = super()._get_version()
+
+    def _get_version(self):
+        return self._version
+
+    def request(self, method, path, **options):
+        # Every call is bounded by the caller's ``timeout`` and the request deadline,
+        # and refused outright while the Razorpay breaker is open
+        operation = razorpay_operation(method.upper(), path)
+        with upstream_call('razorpay', options.pop('timeout', None), operation) as timeout, razorpay_breaker:
+            return super().request(method, path, timeout=timeout, **options)
+
+
+class RazorpayClientRegistry:
+    """
+    Process-wide registry handing out one long-lived client per credential pair.
+
+    Each client owns a requests Session whose connection pool is sized to the
+    number of threads a worker runs, so concurrent requests in the same worker
+    reuse warm TLS connections instead of paying a handshake per order.
+    """
+
+    def __init__(self, pool_size=RAZORPAY_POOL_SIZE, pool_block=RAZORPAY_POOL_BLOCK):
+        self.pool_size = pool_size
+        self.pool_block = pool_block
+        self._clients = {}
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def _build_session(self):
+        session = Session()
+        adapter = TrackingHTTPAdapter(
+            pool_connections=1,
+            pool_maxsize=self.pool_size,
+            pool_block=self.pool_block,
+        )
+        session.mount('https://', adapter)
+        session.mount('http://', adapter)
+        return session
+
+    def get(self, key_id, key_secret):
+        """Return the shared client for ``(key_id, key_secret)``, creating it on first use."""
+        credentials = (key_id, key_secret)
+        with self._lock:
+            client = self._clients.get(credentials)
+            if client is None:
+                client = PooledRazorpayClient(
+                    session=self._build_session(), auth=credentials, base_url=RAZORPAY_BASE_URL
+                )
+                self._clients[credentials] = client
+                self.misses += 1
+                logger.info(f"Razorpay client created for key {key_id} (pool size {self.pool_size})")
+            else:
+                self.hits += 1
+            return client
+
+    def stats(self):
+        """Registry hit/miss counters plus connection reuse figures for the Razorpay host."""
+        connections = 0
+        requests_served = 0
+        with self._lock:
+            clients = list(self._clients.values())
+            hits, misses = self.hits, self.misses
+        for client in clients:
+            opened, served = client.session.get_adapter(client.base_url).pool_stats()
+            connections += opened
+            requests_served += served
+        return {
+            "clients": len(clients),
+            "registry_hits": hits,
+            "registry_misses": misses,
+            "connections_opened": connections,
+            "requests_served": requests_served,
+            "connections_reused": max(requests_served - connections, 0),
+            "pool_size": self.pool_size,
+        }
+
+    def clear(self):
+        """Close every pooled session (used on credential rotation and in shutdown hooks)."""
+        with self._lock:
+            clients = list(self._clients.values())
+            self._clients.clear()
+        for client in clients:
+            client.session.close()
+
+
+registry = RazorpayClientRegistry()
+
+
+def get_razorpay_client(key_id=None, key_secret=None):
+    """Shared, thread-safe Razorpay client for the configured (or given) credentials."""
+    if key_id is None:
+        key_id = settings.RAZORPAY_KEY_ID
+    if key_secret is None:
+        key_secret = settings.RAZORPAY_KEY_SECRET
+    return registry.get(key_id, key_secret)
+
+
+# === Async client (ASGI views) ===
+class AsyncRazorpayClient:
+    """
+    The handful of Razorpay calls the async views make, over httpx.
+
+    Errors are raised as the same ``razorpay.errors`` classes the official
+    client uses, so callers handle both the same way.
+    """
+
+    def __init__(self, key_id, key_secret, base_url=RAZORPAY_BASE_URL,
+                 pool_size=RAZORPAY_ASYNC_POOL_SIZE, timeout=RAZORPAY_FETCH_TIMEOUT):
+        self.http = httpx.AsyncClient(
+            base_url=base_url,
+            auth=(key_id or '', key_secret or ''),
+            timeout=timeout,
+            limits=httpx.Limits(max_connections=pool_size, max_keepalive_connections=pool_size),
+            headers={'User-Agent': 'advolcano-async'},
+        )
+
+    async def _request(self, method, path, timeout=None, **kwargs):
+        operation = razorpay_operation(method, path)
+        with upstream_call('razorpay', timeout, operation) as call_timeout, razorpay_breaker:
+            response = await self.http.request(method, path, timeout=call_timeout, **kwargs)
+            if 200 <= response.status_code < 300:
+                return response.json()
+
+            try:
+                error = response.json().get('error', {})
+            except ValueError:
+                error = {}
+            message = error.get('description', response.text[:200])
+            code = str(error.get('code', '')).upper()
+            if code == ERROR_CODE.BAD_REQUEST_ERROR:
+                raise razorpay.errors.BadRequestError(message)
+            if code == ERROR_CODE.GATEWAY_ERROR:
+                raise razorpay.errors.GatewayError(message)
+            raise razorpay.errors.ServerError(message)
+
+    async def create_order(self, data, timeout=None):
+        return await self._request('POST', '/v1/orders', json=data, timeout=timeout)
+
+    async def fetch_order(self, order_id, timeout=None):
+        return await self._request('GET', f'/v1/orders/{order_id}', timeout=timeout)
+
+    async def fetch_payment(self, payment_id, timeout=None):
+        return await self._request('GET', f'/v1/payments/{payment_id}', timeout=timeout)
+
+    async def aclose(self):
+        await self.http.aclose()
+
+
+# httpx clients belong to the event loop that created them: one per loop
+_async_clients = weakref.WeakKeyDictionary()
+
+
+def get_async_razorpay_client(key_id=None, key_secret=None):
+    """Shared async client for the running event loop and the configured (or given) credentials."""
+    if key_id is None:
+        key_id = settings.RAZORPAY_KEY_ID
+    if key_secret is None:
+        key_secret = settings.RAZORPAY_KEY_SECRET
+    clients = _async_clients.setdefault(asyncio.get_running_loop(), {})
+    client = clients.get((key_id, key_secret))
+    if client is None:
+        client = clients[(key_id, key_secret)] = AsyncRazorpayClient(
+            key_id, key_secret, base_url=RAZORPAY_BASE_URL
+        )
+    return client
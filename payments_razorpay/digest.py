@@ -0,0 +1,130 @@
+import atexit
+import logging
+import threading
+from datetime import datetime, timezone
+
+from sendgrid.helpers.mail import Mail
+from django.conf import settings
+
+from mailer.dispatcher import deliver
+from mailer.outbox import send_mail_now
+
+logger = logging.getLogger(__name__)
+
+# === Digest configuration ===
+PAYMENT_INITIATED_DIGEST = getattr(settings, 'PAYMENT_INITIATED_DIGEST', False)
+PAYMENT_INITIATED_DIGEST_WINDOW = getattr(settings, 'PAYMENT_INITIATED_DIGEST_WINDOW', 300)
+PAYMENT_INITIATED_DIGEST_BATCH = getattr(settings, 'PAYMENT_INITIATED_DIGEST_BATCH', 50)
+PAYMENT_INITIATED_RECIPIENTS = getattr(settings, 'PAYMENT_INITIATED_RECIPIENTS', ["finance@zimzel.net"])
+
+
+def build_digest_email(orders):
+    """Build one plain-text summary email for a list of initiated orders."""
+    first = orders[0]['created_at']
+    last = orders[-1]['created_at']
+    total_inr = sum(order['total_amount'] for order in orders)
+
+    subject = (
+        f"Payment in advolcano.io: {len(orders)} order(s) initiated "
+        f"({first:%d %b %H:%M} - {last:%H:%M} UTC)"
+    )
+
+    rows = "\n".join(
+        f"{order['order_id']:<22} {order['created_at']:%H:%M:%S}  "
+        f"${order['amount_usd']:>10.2f}  ₹{order['total_amount']:>12.2f}  "
+        f"{order['name']} <{order['email']}>"
+        for order in orders
+    )
+
+    email_body = f"""
+Hello Admin,
+
+{len(orders)} new payment order(s) were created in advolcano.io between
+{first:%d %b, %Y %H:%M:%S} and {last:%d %b, %Y %H:%M:%S} UTC.
+
+--------------------------------------------------------
+Initiated Orders
+--------------------------------------------------------
+{rows}
+
+--------------------------------------------------------
+Summary
+--------------------------------------------------------
+Orders          : {len(orders)}
+Total Amount    : ₹{total_inr:.2f}
+
+Best regards,
+Advolcano.io Payments Team
+"""
+
+    return Mail(
+        from_email=settings.FROM_EMAIL,
+        to_emails=PAYMENT_INITIATED_RECIPIENTS,
+        subject=subject,
+        plain_text_content=email_body
+    )
+
+
+class InitiatedOrderDigest:
+    """
+    Buffers "Payment Initiated" notifications and sends them as one summary.
+
+    The buffer is flushed when it reaches ``batch_size`` orders or when
+    ``window`` seconds have passed since the first buffered order, whichever
+    comes first. Whatever is still buffered is flushed at interpreter exit.
+    """
+
+    def __init__(self, window=PAYMENT_INITIATED_DIGEST_WINDOW, batch_size=PAYMENT_INITIATED_DIGEST_BATCH):
+        self.window = window
+        self.batch_size = batch_size
+        self._orders = []
+        self._timer = None
+        self._lock = threading.Lock()
+
+    def add(self, order_id, name, email, amount_usd, total_amount):
+        order = {
+            'order_id': order_id,
+            'name': name,
+            'email': email,
+            'amount_usd': float(amount_usd),
+            'total_amount': float(total_amount),
+            'created_at': datetime.now(timezone.utc),
+        }
+        with self._lock:
+            self._orders.append(order)
+            full = len(self._orders) >= self.batch_size
+            if not full and self._timer is None:
+                self._timer = threading.Timer(self.window, self.flush)
+                self._timer.daemon = True
+                self._timer.start()
+        if full:
+            self.flush()
+
+    def flush(self, send_now=False):
+        """
+        Send whatever is buffered as one digest. ``send_now`` bypasses the
+        dispatcher queue, whose daemon workers do not survive interpreter exit.
+        """
+        with self._lock:
+            orders, self._orders = self._orders, []
+            if self._timer is not None:
+                self._timer.cancel()
+                self._timer = None
+        if not orders:
+            return False
+
+        try:
+            message = build_digest_email(orders)
+            if send_now:
+                send_mail_now(message)
+            else:
+                deliver(message, category="payment_initiated")
+            logger.info(f"Payment initiated digest queued for {len(orders)} order(s)")
+            return True
+        except Exception as e:
+            logger.error(f"Failed to send payment initiated digest ({len(orders)} orders): {e}")
+            return False
+
+
+initiated_digest = InitiatedOrderDigest()
+atexit.register(initiated_digest.flush, send_now=True)
@@ -0,0 +1,164 @@
+import hashlib
+import json
+import logging
+import time
+from datetime import timedelta
+
+from rest_framework.response import Response
+from rest_framework import status
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.utils import timezone
+
+from payments.deadlines import current_deadline
+
+from .models import IdempotencyRecord
+
+logger = logging.getLogger(__name__)
+
+# === Idempotency configuration ===
+IDEMPOTENCY_TTL = getattr(settings, 'IDEMPOTENCY_TTL', 24 * 60 * 60)
+IDEMPOTENCY_WAIT_TIMEOUT = getattr(settings, 'IDEMPOTENCY_WAIT_TIMEOUT', 15)
+IDEMPOTENCY_LOCK_TIMEOUT = getattr(settings, 'IDEMPOTENCY_LOCK_TIMEOUT', 60)
+IDEMPOTENCY_POLL_INTERVAL = 0.1
+IDEMPOTENCY_KEY_MAX_LENGTH = 255
+PURGE_EVERY = 500
+
+_claims = 0
+
+
+def request_fingerprint(data):
+    """Stable hash of a request body, to spot one key reused for a different request."""
+    return hashlib.sha256(json.dumps(data, sort_keys=True, default=str).encode()).hexdigest()
+
+
+def purge_expired():
+    deleted, _ = IdempotencyRecord.objects.filter(expires_at__lt=timezone.now()).delete()
+    return deleted
+
+
+def _claim(key, request_hash):
+    """Insert the in-progress row. Returns True if this request owns the key."""
+    global _claims
+    _claims += 1
+    if _claims % PURGE_EVERY == 0:
+        purge_expired()
+
+    now = timezone.now()
+    try:
+        with transaction.atomic():
+            IdempotencyRecord.objects.create(
+                key=key,
+                request_hash=request_hash,
+                locked_at=now,
+                expires_at=now + timedelta(seconds=IDEMPOTENCY_TTL),
+            )
+        return True
+    except IntegrityError:
+        pass
+
+    # Expired outcomes and abandoned locks (worker died mid-request) can be taken
+    # over; the conditional update lets only one contender win
+    taken = IdempotencyRecord.objects.filter(key=key, expires_at__lt=now).update(
+        request_hash=request_hash,
+        status=IdempotencyRecord.STATUS_IN_PROGRESS,
+        response_status=None,
+        response_body=None,
+        locked_at=now,
+        expires_at=now + timedelta(seconds=IDEMPOTENCY_TTL),
+    )
+    if not taken:
+        taken = IdempotencyRecord.objects.filter(
+            key=key,
+            status=IdempotencyRecord.STATUS_IN_PROGRESS,
+            locked_at__lt=now - timedelta(seconds=IDEMPOTENCY_LOCK_TIMEOUT),
+        ).update(request_hash=request_hash, locked_at=now)
+    return bool(taken)
+
+
+def _wait_for_outcome(key):
+    """
+    Poll until the in-flight request holding ``key`` finishes, for at most
+    IDEMPOTENCY_WAIT_TIMEOUT and never past the request's own deadline.
+    """
+    wait = IDEMPOTENCY_WAIT_TIMEOUT
+    request_deadline = current_deadline()
+    if request_deadline is not None:
+        wait = min(wait, request_deadline.remaining())
+    deadline = time.monotonic() + wait
+    while True:
+        record = IdempotencyRecord.objects.filter(key=key).first()
+        if record is None or record.status == IdempotencyRecord.STATUS_COMPLETED:
+            return record
+        left = deadline - time.monotonic()
+        if left <= 0:
+            return record
+        time.sleep(min(IDEMPOTENCY_POLL_INTERVAL, left))
+
+
+def _replay(record):
+    return Response(
+        record.response_body,
+        status=record.response_status,
+        headers={"Idempotent-Replayed": "true"}
+    )
+
+
+def run_idempotent(scope, idempotency_key, request_hash, handler):
+    """
+    Run ``handler()`` (which returns a DRF Response) at most once per
+    ``idempotency_key`` within ``scope``.
+
+    - repeats get the stored response without running the handler again
+    - concurrent duplicates wait for the in-flight request and share its result
+    - only 2xx responses are stored; after an error the key can be retried
+    - reusing a key with a different request body is a 422
+    """
+    if len(idempotency_key) > IDEMPOTENCY_KEY_MAX_LENGTH:
+        return Response(
+            {"error": f"Idempotency-Key must be at most {IDEMPOTENCY_KEY_MAX_LENGTH} characters"},
+            status=status.HTTP_400_BAD_REQUEST
+        )
+    key = f"{scope}:{idempotency_key}"
+
+    for _ in range(2):
+        if _claim(key, request_hash):
+            break
+
+        record = _wait_for_outcome(key)
+        if record is None:
+            # The other request failed and released the key: try to take it
+            continue
+        if record.request_hash != request_hash:
+            return Response(
+                {"error": "Idempotency-Key was already used with a different request"},
+                status=status.HTTP_422_UNPROCESSABLE_ENTITY
+            )
+        if record.status == IdempotencyRecord.STATUS_COMPLETED:
+            logger.info(f"🔁 Idempotent replay: {key}")
+            return _replay(record)
+        return Response(
+            {"error": "A request with this Idempotency-Key is still in progress"},
+            status=status.HTTP_409_CONFLICT
+        )
+    else:
+        return Response(
+            {"error": "A request with this Idempotency-Key is still in progress"},
+            status=status.HTTP_409_CONFLICT
+        )
+
+    try:
+        response = handler()
+    except Exception:
+        IdempotencyRecord.objects.filter(key=key).delete()
+        raise
+
+    if status.is_success(response.status_code):
+        IdempotencyRecord.objects.filter(key=key).update(
+            status=IdempotencyRecord.STATUS_COMPLETED,
+            response_status=response.status_code,
+            response_body=response.data,
+        )
+    else:
+        IdempotencyRecord.objects.filter(key=key).delete()
+    return response
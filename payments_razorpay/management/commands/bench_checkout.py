@@ -0,0 +1,138 @@
+import asyncio
+import json
+import statistics
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from itertools import count
+from unittest import mock
+
+from django.core.management.base import BaseCommand
+from django.test import AsyncClient, Client
+
+from payments_razorpay import clients
+
+PAYLOAD = json.dumps({
+    'name': 'Bench User',
+    'email': 'bench@example.com',
+    'amount_usd': '10.00',
+    'amount_inr': '877.50',
+    'commission': '26.33',
+    'gst': '4.74',
+    'total_amount': '908.57',
+})
+
+
+class FakeRazorpayHandler(BaseHTTPRequestHandler):
+    """Answers POST /v1/orders after ``server.latency`` seconds, like a slow gateway."""
+
+    protocol_version = 'HTTP/1.1'
+
+    def do_POST(self):
+        self.rfile.read(int(self.headers.get('Content-Length') or 0))
+        time.sleep(self.server.latency)
+        body = json.dumps({'id': f'order_bench{next(self.server.ids)}', 'status': 'created'}).encode()
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+class FakeRazorpayServer(ThreadingHTTPServer):
+    daemon_threads = True
+    request_queue_size = 1024  # the default of 5 drops connections under a burst
+
+
+class Command(BaseCommand):
+    help = (
+        'Benchmark create-payment under concurrency: the sync view on a thread pool '
+        'against the async view on one event loop, both talking to a local fake '
+        'Razorpay with fixed latency. Order rows and emails are stubbed out, so only '
+        'request handling and upstream I/O are measured. The fake gateway runs in '
+        'this process too: on a single core the async numbers become CPU-bound, so '
+        'compare at realistic latencies (hundreds of ms).'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--requests', type=int, default=400, help='Requests per measurement')
+        parser.add_argument('--concurrency', type=int, default=100, help='Requests in flight at once')
+        parser.add_argument('--workers', type=int, default=10,
+                            help='Threads serving the sync view (a gunicorn worker\'s --threads)')
+        parser.add_argument('--latency', type=float, default=0.2, help='Fake Razorpay latency (seconds)')
+
+    def handle(self, *args, **options):
+        server = FakeRazorpayServer(('127.0.0.1', 0), FakeRazorpayHandler)
+        server.latency = options['latency']
+        server.ids = count(1)
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        base_url = f'http://127.0.0.1:{server.server_address[1]}'
+
+        self.stdout.write(
+            f"{options['requests']} requests, {options['concurrency']} in flight, "
+            f"upstream latency {options['latency'] * 1000:.0f} ms"
+        )
+        try:
+            with mock.patch.object(clients, 'RAZORPAY_BASE_URL', base_url), \
+                    mock.patch('payments_razorpay.views.record_payment_order'), \
+                    mock.patch('payments_razorpay.views.send_payment_initiated_email'):
+                clients.registry.clear()
+                latencies, elapsed = self._run_sync(options)
+                self._report(f"sync view, {options['workers']} threads", latencies, elapsed)
+                latencies, elapsed = asyncio.run(self._run_async(options))
+                self._report('async view, 1 event loop', latencies, elapsed)
+        finally:
+            clients.registry.clear()
+            server.shutdown()
+
+    def _run_sync(self, options):
+        local = threading.local()
+        # A worker only has --workers threads however many clients are waiting;
+        # time spent queueing for one counts towards the client's latency
+        worker_threads = threading.BoundedSemaphore(options['workers'])
+
+        def post(_):
+            if not hasattr(local, 'client'):
+                local.client = Client()
+            started = time.perf_counter()
+            with worker_threads:
+                response = local.client.post('/api/create-payment/', PAYLOAD, content_type='application/json')
+            assert response.status_code == 200, response.content[:200]
+            return time.perf_counter() - started
+
+        with ThreadPoolExecutor(max_workers=options['concurrency']) as clients_pool:
+            list(clients_pool.map(post, range(options['workers'])))  # warm-up
+            started = time.perf_counter()
+            latencies = list(clients_pool.map(post, range(options['requests'])))
+        return latencies, time.perf_counter() - started
+
+    async def _run_async(self, options):
+        client = AsyncClient()
+        slots = asyncio.Semaphore(options['concurrency'])
+
+        async def post():
+            async with slots:
+                started = time.perf_counter()
+                response = await client.post('/api/async/create-payment/', PAYLOAD, content_type='application/json')
+                assert response.status_code == 200, response.content[:200]
+                return time.perf_counter() - started
+
+        await post()  # warm-up
+        started = time.perf_counter()
+        latencies = await asyncio.gather(*(post() for _ in range(options['requests'])))
+        elapsed = time.perf_counter() - started
+        await clients.get_async_razorpay_client().aclose()
+        return latencies, elapsed
+
+    def _report(self, label, latencies, elapsed):
+        latencies = sorted(latencies)
+        p50 = statistics.median(latencies) * 1000
+        p95 = latencies[int(len(latencies) * 0.95) - 1] * 1000
+        self.stdout.write(
+            f'  {label:<28} {len(latencies) / elapsed:8.1f} req/s  '
+            f'p50 {p50:8.1f} ms  p95 {p95:8.1f} ms'
+        )
@@ -0,0 +1,186 @@
+import glob
+import gzip
+import json
+import math
+import mmap
+import os
+import time
+from collections import Counter, defaultdict
+from datetime import datetime
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+
+class LatencyHistogram:
+    """Log-scale buckets about 1% wide: percentiles over any number of samples in constant memory."""
+
+    SCALE = 100
+
+    def __init__(self):
+        self.buckets = Counter()
+        self.count = 0
+
+    def add(self, ms):
+        self.buckets[int(math.log1p(max(ms, 0.0)) * self.SCALE)] += 1
+        self.count += 1
+
+    def percentile(self, q):
+        target = q * self.count
+        seen = 0
+        for bucket in sorted(self.buckets):
+            seen += self.buckets[bucket]
+            if seen >= target:
+                return math.expm1((bucket + 0.5) / self.SCALE)
+        return 0.0
+
+
+def read_lines(path):
+    """Lines of a log file: gzipped backups are streamed, live files memory-mapped."""
+    if path.endswith('.gz'):
+        with gzip.open(path, 'rb') as f:
+            yield from f
+        return
+    with open(path, 'rb') as f:
+        if not os.fstat(f.fileno()).st_size:
+            return
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+            yield from iter(mapped.readline, b'')
+
+
+def is_failure(event):
+    return event.endswith('failed')
+
+
+# json.loads() minus its per-call encoding detection and whitespace handling:
+# every line is a single object written by JsonFormatter
+_decode = json.JSONDecoder().raw_decode
+
+
+class Command(BaseCommand):
+    help = (
+        'Summarise the JSON event log (orders, verifications, emails) in one pass: '
+        'event rates, error rates by subject, failure reasons, email outcomes per '
+        'category and latency percentiles. Reads events.log and its rotated, '
+        'gzipped backups under LOGGING_DIR unless files are given.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('paths', nargs='*', help='Log files (default: LOGGING_DIR/events.log*)')
+        parser.add_argument('--event', default='', help='Only events starting with this, e.g. "email."')
+        parser.add_argument('--hourly', type=int, default=0, metavar='N',
+                            help='Also show event counts for the last N hours seen')
+
+    def handle(self, *args, **options):
+        paths = options['paths'] or self._default_paths()
+        if not paths:
+            raise CommandError(f"No event logs found in {settings.LOGGING_DIR}")
+        prefix = options['event']
+
+        counts = Counter()
+        hourly = defaultdict(Counter)
+        latencies = defaultdict(LatencyHistogram)
+        reasons = Counter()
+        emails = defaultdict(Counter)
+        first_ts = last_ts = None
+        lines = unparsed = bytes_read = 0
+
+        started = time.perf_counter()
+        for path in paths:
+            for line in read_lines(path):
+                lines += 1
+                bytes_read += len(line)
+                if b'"event"' not in line:
+                    continue
+                try:
+                    entry = _decode(line.decode())[0]
+                    event = entry['event']
+                    ts = entry['ts']
+                except (ValueError, KeyError, TypeError):
+                    unparsed += 1
+                    continue
+                if not event.startswith(prefix):
+                    continue
+
+                counts[event] += 1
+                if first_ts is None or ts < first_ts:
+                    first_ts = ts
+                if last_ts is None or ts > last_ts:
+                    last_ts = ts
+                if options['hourly']:
+                    hourly[ts[:13]][event] += 1
+                duration = entry.get('duration_ms')
+                if duration is not None:
+                    latencies[event].add(duration)
+                if is_failure(event):
+                    reasons[(event, entry.get('reason') or entry.get('status') or 'unknown')] += 1
+                if event.startswith('email.'):
+                    emails[entry.get('category', 'general')][event.split('.', 1)[1]] += 1
+        elapsed = time.perf_counter() - started
+
+        self.stdout.write(
+            f"{len(paths)} file(s), {lines:,} lines, {bytes_read / 1e6:,.1f} MB in {elapsed:.2f}s "
+            f"({bytes_read / 1e6 / max(elapsed, 1e-9):,.1f} MB/s, {lines / max(elapsed, 1e-9):,.0f} lines/s)"
+        )
+        if unparsed:
+            self.stdout.write(self.style.WARNING(f"{unparsed:,} lines could not be parsed"))
+        if not counts:
+            self.stdout.write('No events.')
+            return
+        self._report_events(counts, latencies, first_ts, last_ts)
+        self._report_errors(counts, reasons)
+        self._report_emails(emails)
+        if options['hourly']:
+            self._report_hourly(hourly, options['hourly'])
+
+    def _default_paths(self):
+        paths = [
+            path for path in glob.glob(os.path.join(settings.LOGGING_DIR, 'events.log*'))
+            if not path.endswith('.tmp')
+        ]
+        return sorted(paths, key=os.path.getmtime)
+
+    def _report_events(self, counts, latencies, first_ts, last_ts):
+        span = (datetime.fromisoformat(last_ts) - datetime.fromisoformat(first_ts)).total_seconds()
+        self.stdout.write(f"\nEvents from {first_ts} to {last_ts} ({span / 3600:.1f} h)")
+        self.stdout.write(f"  {'event':<24} {'count':>10} {'per hour':>10} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9}")
+        for event, count in sorted(counts.items()):
+            histogram = latencies.get(event)
+            if histogram is not None and histogram.count:
+                percentiles = ''.join(f' {histogram.percentile(q):9.1f}' for q in (0.5, 0.95, 0.99))
+            else:
+                percentiles = f" {'-':>9}" * 3
+            per_hour = f'{count / span * 3600:10.1f}' if span else f"{'-':>10}"
+            self.stdout.write(f"  {event:<24} {count:>10,} {per_hour}{percentiles}")
+
+    def _report_errors(self, counts, reasons):
+        subjects = defaultdict(lambda: [0, 0])
+        for event, count in counts.items():
+            subject = event.split('.', 1)[0]
+            subjects[subject][0] += count
+            if is_failure(event):
+                subjects[subject][1] += count
+        self.stdout.write('\nError rates')
+        for subject, (total, failed) in sorted(subjects.items()):
+            self.stdout.write(f"  {subject:<24} {failed:>10,} / {total:<10,} {failed / total:8.2%}")
+        for (event, reason), count in reasons.most_common(10):
+            self.stdout.write(f"    {event} {reason}: {count:,}")
+
+    def _report_emails(self, emails):
+        if not emails:
+            return
+        self.stdout.write('\nEmails by category')
+        for category, outcomes in sorted(emails.items()):
+            total = sum(outcomes.values())
+            self.stdout.write(
+                f"  {category:<24} sent {outcomes['sent']:>8,}  failed {outcomes['failed']:>8,}  "
+                f"failure rate {outcomes['failed'] / total:7.2%}"
+            )
+
+    def _report_hourly(self, hourly, hours):
+        events = sorted({event for counts in hourly.values() for event in counts})
+        width = max(len(event) for event in events)
+        self.stdout.write(f"\nLast {hours} hour(s) (UTC)")
+        self.stdout.write('  ' + f"{'hour':<14}" + ''.join(f' {event:>{width}}' for event in events))
+        for hour in sorted(hourly)[-hours:]:
+            self.stdout.write('  ' + f"{hour:<14}" + ''.join(f' {hourly[hour][event]:>{width},}' for event in events))
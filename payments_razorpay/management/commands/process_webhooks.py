@@ -0,0 +1,44 @@
+import signal
+import time
+
+from django.core.management.base import BaseCommand
+
+from mailer.dispatcher import dispatcher
+from payments_razorpay.webhooks import WEBHOOK_MAX_ATTEMPTS, process_batch, release_stale_claims
+
+
+class Command(BaseCommand):
+    help = 'Apply queued Razorpay webhook events to local orders and send the resulting emails'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=100, help='Events claimed per batch')
+        parser.add_argument('--max-attempts', type=int, default=WEBHOOK_MAX_ATTEMPTS, help='Attempts before an event is marked failed')
+        parser.add_argument('--poll-interval', type=float, default=2.0, help='Seconds to sleep when no events are pending')
+        parser.add_argument('--once', action='store_true', help='Process a single batch and exit')
+
+    def handle(self, *args, **options):
+        self.running = True
+        signal.signal(signal.SIGTERM, self.stop)
+        signal.signal(signal.SIGINT, self.stop)
+
+        self.stdout.write('Webhook worker started')
+        try:
+            while self.running:
+                release_stale_claims()
+                processed, failed = process_batch(options['batch_size'], options['max_attempts'])
+                if processed or failed:
+                    self.stdout.write(f'Batch done: {processed} processed, {failed} failed')
+                if options['once']:
+                    break
+                if not (processed or failed):
+                    time.sleep(options['poll_interval'])
+        finally:
+            # The emails of the last batches may still be queued on the dispatcher's daemon threads
+            moved = dispatcher.drain()
+            if moved:
+                self.stdout.write(self.style.WARNING(f'{moved} email(s) moved to the outbox, run send_outbox'))
+
+        self.stdout.write(self.style.SUCCESS('Webhook worker stopped'))
+
+    def stop(self, signum, frame):
+        self.running = False
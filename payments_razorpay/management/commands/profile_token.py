@@ -0,0 +1,16 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from payments.profiling import PROFILE_SECRET, PROFILE_TOKEN_TTL, sign_profile_token
+
+
+class Command(BaseCommand):
+    help = (
+        'Print an X-Profile header value: requests that send it are profiled and '
+        'their stacks written under PROFILE_DIR. Valid for PROFILE_TOKEN_TTL seconds.'
+    )
+
+    def handle(self, *args, **options):
+        if not PROFILE_SECRET:
+            raise CommandError("PROFILE_SECRET is not configured")
+        self.stdout.write(f"X-Profile: {sign_profile_token()}")
+        self.stdout.write(f"(valid for {PROFILE_TOKEN_TTL // 60} minutes)")
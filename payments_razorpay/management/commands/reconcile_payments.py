@@ -0,0 +1,120 @@
+import json
+from collections import Counter
+from datetime import datetime, time as dt_time, timezone as dt_timezone
+
+from django.core.management.base import BaseCommand, CommandError
+
+from mailer.dispatcher import dispatcher
+from payments_razorpay.clients import get_razorpay_client
+from payments_razorpay.reconcile import (
+    RECONCILE_CHECKPOINT_FILE,
+    RECONCILE_CONCURRENCY,
+    RECONCILE_SLICE_SECONDS,
+    REPAIRABLE,
+    RESOURCES,
+    Checkpoint,
+    iter_mismatches,
+    iter_order_mismatches,
+    iter_slices,
+)
+from payments_razorpay.views import (
+    RAZORPAY_KEY_ID,
+    RAZORPAY_KEY_SECRET,
+    PaymentDetailsUnavailable,
+    complete_verified_payment,
+)
+
+
+def _parse_date(value, end_of_day=False):
+    try:
+        date = datetime.strptime(value, '%Y-%m-%d')
+    except ValueError:
+        raise CommandError(f"Invalid date '{value}', expected YYYY-MM-DD")
+    if end_of_day:
+        date = datetime.combine(date.date(), dt_time.max)
+    return int(date.replace(tzinfo=dt_timezone.utc).timestamp())
+
+
+class Command(BaseCommand):
+    help = ('Compare captured Razorpay payments and Razorpay orders in a date range with local orders, '
+            'optionally repairing them')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--from', dest='date_from', required=True, help='First day (YYYY-MM-DD, UTC)')
+        parser.add_argument('--to', dest='date_to', required=True, help='Last day, inclusive (YYYY-MM-DD, UTC)')
+        parser.add_argument('--concurrency', type=int, default=RECONCILE_CONCURRENCY, help='Slices fetched in parallel')
+        parser.add_argument('--slice-seconds', type=int, default=RECONCILE_SLICE_SECONDS,
+                            help='Length of the time slices the window is fetched in')
+        parser.add_argument('--repair', action='store_true',
+                            help='Mark captured-but-unverified orders paid and send their success emails')
+        parser.add_argument('--checkpoint', default=RECONCILE_CHECKPOINT_FILE, help='Checkpoint file')
+        parser.add_argument('--restart', action='store_true', help='Ignore any saved checkpoint')
+        parser.add_argument('--json', action='store_true', help='Print mismatches as JSON lines')
+
+    def handle(self, *args, **options):
+        from_ts = _parse_date(options['date_from'])
+        to_ts = _parse_date(options['date_to'], end_of_day=True)
+        if from_ts > to_ts:
+            raise CommandError("--from must not be after --to")
+
+        checkpoint = Checkpoint(options['checkpoint'], from_ts, to_ts)
+        saved = None if options['restart'] else checkpoint.load()
+        next_from = saved['next_from'] if saved else {}
+        counts = Counter(saved['counts'] if saved else {})
+
+        client = get_razorpay_client(RAZORPAY_KEY_ID, RAZORPAY_KEY_SECRET)
+
+        try:
+            # Payments first, then orders, each with its own resume point
+            for resource in RESOURCES:
+                start_ts = next_from.get(resource, from_ts)
+                if start_ts > to_ts:
+                    continue
+                if saved:
+                    saved = None  # only where the resumed run picks up
+                    self.stdout.write(
+                        f"Resuming {resource}s from "
+                        f"{datetime.fromtimestamp(start_ts, dt_timezone.utc):%Y-%m-%d %H:%M:%S} UTC"
+                    )
+                slices = iter_slices(client, start_ts, to_ts, resource, slice_seconds=options['slice_seconds'],
+                                     concurrency=options['concurrency'])
+                join = iter_mismatches if resource == 'payment' else iter_order_mismatches
+
+                for slice_end, listed, mismatches in join(slices):
+                    counts[f'{resource}s'] += listed
+                    for mismatch in mismatches:
+                        self._handle(mismatch, counts, options)
+                    next_from[resource] = slice_end + 1
+                    checkpoint.save(next_from, counts)
+        finally:
+            # Repairs queue success emails on the dispatcher's daemon threads
+            moved = dispatcher.drain()
+            if moved:
+                self.stdout.write(self.style.WARNING(f"{moved} email(s) moved to the outbox, run send_outbox"))
+
+        checkpoint.clear()
+        summary = ', '.join(f"{kind}={count}" for kind, count in sorted(counts.items()))
+        self.stdout.write(self.style.SUCCESS(f"Reconciliation done: {summary or 'no payments'}"))
+
+    def _handle(self, mismatch, counts, options):
+        counts[mismatch['kind']] += 1
+        self._report(mismatch, options['json'])
+        if not (options['repair'] and mismatch['kind'] in REPAIRABLE):
+            return
+        try:
+            complete_verified_payment(mismatch['order_id'], mismatch['payment_id'])
+        except PaymentDetailsUnavailable as e:
+            self.stderr.write(f"Not repaired, retry later: {e}")
+            counts['repair_failed'] += 1
+            return
+        counts['repaired'] += 1
+
+    def _report(self, mismatch, as_json):
+        if as_json:
+            self.stdout.write(json.dumps(mismatch))
+        else:
+            self.stdout.write(
+                f"{mismatch['kind']:<22} order={mismatch['order_id']} payment={mismatch['payment_id']} "
+                f"amount={mismatch['amount']} local_status={mismatch['local_status']} "
+                f"local_amount={mismatch['local_amount']}"
+            )
@@ -0,0 +1,36 @@
+# Generated by Django 5.2.5 on 2026-10-17 01:43
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PaymentOrder',
+            fields=[
+                ('order_id', models.CharField(max_length=64, primary_key=True, serialize=False)),
+                ('name', models.CharField(max_length=255)),
+                ('email', models.EmailField(max_length=254)),
+                ('amount_usd', models.DecimalField(decimal_places=2, max_digits=12)),
+                ('amount_inr', models.DecimalField(decimal_places=2, max_digits=14)),
+                ('commission', models.DecimalField(decimal_places=2, max_digits=14)),
+                ('gst', models.DecimalField(decimal_places=2, max_digits=14)),
+                ('total_amount', models.DecimalField(decimal_places=2, max_digits=14)),
+                ('quote_rate', models.DecimalField(blank=True, decimal_places=6, max_digits=12, null=True)),
+                ('status', models.CharField(choices=[('created', 'Created'), ('paid', 'Paid'), ('failed', 'Failed')], default='created', max_length=10)),
+                ('payment_id', models.CharField(blank=True, max_length=64)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('paid_at', models.DateTimeField(blank=True, null=True)),
+            ],
+            options={
+                'ordering': ['-created_at'],
+                'indexes': [models.Index(fields=['status', 'created_at'], name='payments_ra_status_8d0b5d_idx')],
+            },
+        ),
+    ]
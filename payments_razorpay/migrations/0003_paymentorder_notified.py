@@ -0,0 +1,23 @@
+# Generated by Django 5.2.5 on 2026-10-17 01:45
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('payments_razorpay', '0002_idempotencyrecord'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='paymentorder',
+            name='admin_notified',
+            field=models.BooleanField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='paymentorder',
+            name='user_notified',
+            field=models.BooleanField(blank=True, null=True),
+        ),
+    ]
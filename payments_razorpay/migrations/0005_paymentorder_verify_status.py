@@ -0,0 +1,23 @@
+# Generated by Django 5.2.5 on 2026-10-17 02:30
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('payments_razorpay', '0004_webhookevent'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='paymentorder',
+            name='verify_handle',
+            field=models.CharField(blank=True, max_length=32, null=True, unique=True),
+        ),
+        migrations.AddField(
+            model_name='paymentorder',
+            name='verify_status',
+            field=models.JSONField(blank=True, null=True),
+        ),
+    ]
@@ -0,0 +1,133 @@
+from django.db import models
+
+
+class PaymentOrder(models.Model):
+    """
+    Local copy of a Razorpay order and the customer/amount breakdown behind it.
+
+    Written by create-payment so verification can read everything with one
+    primary-key lookup instead of fetching the order's notes from Razorpay.
+    """
+
+    STATUS_CREATED = 'created'
+    STATUS_PAID = 'paid'
+    STATUS_FAILED = 'failed'
+    STATUS_CHOICES = [
+        (STATUS_CREATED, 'Created'),
+        (STATUS_PAID, 'Paid'),
+        (STATUS_FAILED, 'Failed'),
+    ]
+
+    order_id = models.CharField(max_length=64, primary_key=True)
+    name = models.CharField(max_length=255)
+    email = models.EmailField()
+    amount_usd = models.DecimalField(max_digits=12, decimal_places=2)
+    amount_inr = models.DecimalField(max_digits=14, decimal_places=2)
+    commission = models.DecimalField(max_digits=14, decimal_places=2)
+    gst = models.DecimalField(max_digits=14, decimal_places=2)
+    total_amount = models.DecimalField(max_digits=14, decimal_places=2)
+    quote_rate = models.DecimalField(max_digits=12, decimal_places=6, null=True, blank=True)
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default=STATUS_CREATED)
+    payment_id = models.CharField(max_length=64, blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    paid_at = models.DateTimeField(null=True, blank=True)
+    # Set once the verification that marked the order paid has queued its emails
+    admin_notified = models.BooleanField(null=True, blank=True)
+    user_notified = models.BooleanField(null=True, blank=True)
+    # Fast-acknowledged verification: status handle and the background follow-up's
+    # state, readable from every worker
+    verify_handle = models.CharField(max_length=32, unique=True, null=True, blank=True)
+    verify_status = models.JSONField(null=True, blank=True)
+
+    class Meta:
+        ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['status', 'created_at']),
+        ]
+
+    def __str__(self):
+        return f"{self.order_id} {self.email} INR {self.total_amount} ({self.status})"
+
+    @property
+    def total_amount_paise(self):
+        return int(self.total_amount * 100)
+
+    def notification_details(self):
+        """Order details in the shape the notification emails expect."""
+        return {
+            'name': self.name,
+            'email': self.email,
+            'amount_usd': float(self.amount_usd),
+            'amount_inr': float(self.amount_inr),
+            'commission': float(self.commission),
+            'gst': float(self.gst),
+            'total_amount': float(self.total_amount),
+        }
+
+
+class IdempotencyRecord(models.Model):
+    """
+    Outcome of a request made with an ``Idempotency-Key`` header, shared by all
+    workers through the database.
+
+    The row is inserted (``in_progress``) before the work starts, so the primary
+    key doubles as the lock that makes concurrent duplicates wait.
+    """
+
+    STATUS_IN_PROGRESS = 'in_progress'
+    STATUS_COMPLETED = 'completed'
+    STATUS_CHOICES = [
+        (STATUS_IN_PROGRESS, 'In progress'),
+        (STATUS_COMPLETED, 'Completed'),
+    ]
+
+    key = models.CharField(max_length=300, primary_key=True)
+    request_hash = models.CharField(max_length=64)
+    status = models.CharField(max_length=12, choices=STATUS_CHOICES, default=STATUS_IN_PROGRESS)
+    response_status = models.PositiveSmallIntegerField(null=True, blank=True)
+    response_body = models.JSONField(null=True, blank=True)
+    locked_at = models.DateTimeField()
+    expires_at = models.DateTimeField(db_index=True)
+
+    def __str__(self):
+        return f"{self.key} ({self.status})"
+
+
+class WebhookEvent(models.Model):
+    """
+    Raw Razorpay webhook event, stored as received and applied later in batches
+    by ``process_webhooks``. The event id is the primary key, so redeliveries
+    of the same event are dropped on insert.
+    """
+
+    STATUS_PENDING = 'pending'
+    STATUS_PROCESSING = 'processing'
+    STATUS_PROCESSED = 'processed'
+    STATUS_IGNORED = 'ignored'
+    STATUS_FAILED = 'failed'
+    STATUS_CHOICES = [
+        (STATUS_PENDING, 'Pending'),
+        (STATUS_PROCESSING, 'Processing'),
+        (STATUS_PROCESSED, 'Processed'),
+        (STATUS_IGNORED, 'Ignored'),
+        (STATUS_FAILED, 'Failed'),
+    ]
+
+    event_id = models.CharField(max_length=64, primary_key=True)
+    event = models.CharField(max_length=50)
+    payload = models.JSONField()
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default=STATUS_PENDING)
+    attempts = models.PositiveIntegerField(default=0)
+    last_error = models.TextField(blank=True)
+    received_at = models.DateTimeField(auto_now_add=True)
+    claimed_at = models.DateTimeField(null=True, blank=True)
+    processed_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        ordering = ['received_at']
+        indexes = [
+            models.Index(fields=['status', 'received_at']),
+        ]
+
+    def __str__(self):
+        return f"{self.event_id} {self.event} ({self.status})"
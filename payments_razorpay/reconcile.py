@@ -0,0 +1,198 @@
+import json
+import logging
+import os
+import tempfile
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+
+from .models import PaymentOrder
+
+logger = logging.getLogger(__name__)
+
+# === Reconciliation configuration ===
+RECONCILE_PAGE_SIZE = 100  # Razorpay's maximum for payment.all and order.all
+RECONCILE_CONCURRENCY = getattr(settings, 'RECONCILE_CONCURRENCY', 4)
+# Slices of the window fetched in parallel (seconds); a slice is held in memory whole
+RECONCILE_SLICE_SECONDS = getattr(settings, 'RECONCILE_SLICE_SECONDS', 15 * 60)
+RECONCILE_CHECKPOINT_FILE = getattr(
+    settings, 'RECONCILE_CHECKPOINT_FILE',
+    os.path.join(tempfile.gettempdir(), 'advolcano_reconcile.json')
+)
+RAZORPAY_FETCH_TIMEOUT = getattr(settings, 'RAZORPAY_FETCH_TIMEOUT', 5)
+
+# Mismatch kinds
+CAPTURED_NOT_RECORDED = 'captured_not_recorded'      # no local order at all
+CAPTURED_NOT_VERIFIED = 'captured_not_verified'      # local order never marked paid
+PAYMENT_ID_MISMATCH = 'payment_id_mismatch'          # paid locally with another payment
+AMOUNT_MISMATCH = 'amount_mismatch'                  # captured amount != local total
+PAID_NOT_CAPTURED = 'paid_not_captured'              # paid locally, Razorpay order not paid
+REPAIRABLE = (CAPTURED_NOT_RECORDED, CAPTURED_NOT_VERIFIED)
+
+
+# What is listed, in this order: payments, then orders
+RESOURCES = ('payment', 'order')
+
+
+# === Stage 1: payments or orders in time slices, fetched concurrently, yielded in order ===
+def fetch_slice(client, start_ts, end_ts, resource='payment', page_size=RECONCILE_PAGE_SIZE):
+    """
+    Every payment (or order, with ``resource='order'``) created in [start_ts, end_ts].
+
+    Razorpay lists newest first, so skip offsets shift whenever payments are
+    created while we page (the window can reach up to now). Each page is
+    asked for with ``to`` set to the oldest ``created_at`` seen so far
+    instead, skipping only the payments already seen in that very second.
+    New payments land above the cursor and never move it.
+    """
+    listing = getattr(client, resource)
+    listed = []
+    to_ts = end_ts
+    seen_at_cursor = set()
+    while True:
+        response = listing.all(
+            {'from': start_ts, 'to': to_ts, 'count': page_size, 'skip': len(seen_at_cursor)},
+            timeout=RAZORPAY_FETCH_TIMEOUT
+        )
+        items = response.get('items', [])
+        listed.extend(item for item in items if item['id'] not in seen_at_cursor)
+        if len(items) < page_size:
+            return listed
+        oldest = items[-1]['created_at']
+        if oldest != to_ts:
+            to_ts = oldest
+            seen_at_cursor = set()
+        seen_at_cursor.update(item['id'] for item in items if item['created_at'] == oldest)
+
+
+def iter_slices(client, from_ts, to_ts, resource='payment', slice_seconds=RECONCILE_SLICE_SECONDS,
+                concurrency=RECONCILE_CONCURRENCY):
+    """
+    Yield ``(slice_end, items)`` for consecutive slices of [from_ts, to_ts],
+    oldest first.
+
+    Up to ``concurrency`` slices are fetched at once; they are still yielded
+    in time order, so once a slice has been handled every payment (or order)
+    created up to ``slice_end`` has been, which is what the checkpoint
+    records. Memory stays bounded by ``concurrency`` slices.
+    """
+    def fetch(start, end):
+        return fetch_slice(client, start, end, resource)
+
+    bounds = (
+        (start, min(start + slice_seconds - 1, to_ts))
+        for start in range(from_ts, to_ts + 1, slice_seconds)
+    )
+    in_flight = deque()
+
+    with ThreadPoolExecutor(max_workers=concurrency, thread_name_prefix="reconcile") as executor:
+        for start, end in bounds:
+            in_flight.append((end, executor.submit(fetch, start, end)))
+            if len(in_flight) >= concurrency:
+                end_ts, future = in_flight.popleft()
+                yield end_ts, future.result()
+        while in_flight:
+            end_ts, future = in_flight.popleft()
+            yield end_ts, future.result()
+
+
+# === Stage 2: join each page against local orders ===
+def iter_mismatches(slices):
+    """
+    Yield ``(slice_end, payments, mismatches)`` per slice. Each slice's orders are
+    loaded with a single ``in_bulk`` query, so only one slice of local rows is
+    held at a time.
+    """
+    for slice_end, items in slices:
+        captured = [item for item in items if item.get('status') == 'captured' and item.get('order_id')]
+        orders = PaymentOrder.objects.in_bulk([item['order_id'] for item in captured])
+
+        mismatches = []
+        for payment in captured:
+            order = orders.get(payment['order_id'])
+            kind = None
+            if order is None:
+                kind = CAPTURED_NOT_RECORDED
+            elif order.status != PaymentOrder.STATUS_PAID:
+                kind = CAPTURED_NOT_VERIFIED
+            elif order.payment_id and order.payment_id != payment['id']:
+                kind = PAYMENT_ID_MISMATCH
+            elif payment.get('amount') != order.total_amount_paise:
+                kind = AMOUNT_MISMATCH
+            if kind:
+                mismatches.append({
+                    'kind': kind,
+                    'order_id': payment['order_id'],
+                    'payment_id': payment['id'],
+                    'amount': payment.get('amount'),
+                    'local_status': order.status if order else None,
+                    'local_amount': order.total_amount_paise if order else None,
+                    'created_at': payment.get('created_at'),
+                })
+        yield slice_end, len(items), mismatches
+
+
+def iter_order_mismatches(slices):
+    """
+    ``iter_mismatches`` for order slices. Every other mismatch starts from a
+    captured payment; what only the order listing shows is a local order
+    marked paid whose Razorpay order was never paid.
+    """
+    for slice_end, items in slices:
+        orders = PaymentOrder.objects.filter(status=PaymentOrder.STATUS_PAID).in_bulk(
+            [item['id'] for item in items]
+        )
+
+        mismatches = []
+        for item in items:
+            order = orders.get(item['id'])
+            if order is not None and item.get('status') != 'paid':
+                mismatches.append({
+                    'kind': PAID_NOT_CAPTURED,
+                    'order_id': item['id'],
+                    'payment_id': order.payment_id,
+                    'amount': item.get('amount'),
+                    'local_status': order.status,
+                    'local_amount': order.total_amount_paise,
+                    'created_at': item.get('created_at'),
+                })
+        yield slice_end, len(items), mismatches
+
+
+# === Checkpoint ===
+class Checkpoint:
+    """
+    For one (from, to) window, in a JSON file: per listing (payments, orders),
+    the ``created_at`` from which it is still to be checked, and the counts so
+    far.
+    """
+
+    def __init__(self, path, from_ts, to_ts):
+        self.path = path
+        self.window = [from_ts, to_ts]
+
+    def load(self):
+        try:
+            with open(self.path, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            return None
+        if data.get('window') != self.window or not isinstance(data.get('next_from'), dict):
+            return None
+        return data
+
+    def save(self, next_from, counts):
+        """``next_from``: ``{resource: created_at}`` to resume each listing from."""
+        directory = os.path.dirname(self.path) or '.'
+        os.makedirs(directory, exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=directory, prefix='.reconcile_')
+        with os.fdopen(fd, 'w', encoding='utf-8') as f:
+            json.dump({'window': self.window, 'next_from': next_from, 'counts': counts}, f)
+        os.replace(tmp_path, self.path)
+
+    def clear(self):
+        try:
+            os.remove(self.path)
+        except OSError:
+            pass
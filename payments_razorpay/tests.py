@@ -1,3 +1,710 @@
-from django.test import TestCase
+import gzip
+import json
+import os
+import tempfile
+import threading
+import time
+from datetime import timedelta
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from io import StringIO
+from unittest import mock
 
-# Create your tests here.
+from django.core.management import CommandError, call_command
+from django.db import connection
+from django.test import SimpleTestCase, TestCase, TransactionTestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+import razorpay
+from rest_framework.response import Response
+
+from payments.deadlines import deadline
+from payments_razorpay import async_views, clients, digest, idempotency, lru, views, webhooks
+from payments_razorpay.lru import LRUCache
+from payments_razorpay.models import IdempotencyRecord, PaymentOrder, WebhookEvent
+
+
+def create_order(order_id='order_1'):
+    return PaymentOrder.objects.create(
+        order_id=order_id, name='A', email='a@example.com', amount_usd='1.00',
+        amount_inr='87.75', commission='2.63', gst='0.47', total_amount='90.85',
+    )
+
+
+def failed_event(event_id, order_id, payment_id):
+    return WebhookEvent.objects.create(
+        event_id=event_id,
+        event='payment.failed',
+        payload={'payload': {'payment': {'entity': {
+            'id': payment_id, 'order_id': order_id, 'amount': 9085,
+            'email': 'a@example.com', 'error_description': 'Card declined',
+        }}}},
+    )
+
+
+@mock.patch.object(webhooks, 'send_admin_notification')
+@mock.patch.object(webhooks, 'send_user_failure_email')
+class WebhookFailureDedupeTests(TestCase):
+    def setUp(self):
+        self.order = create_order()
+
+    def test_repeated_failures_in_one_batch_notify_once(self, user_email, admin_email):
+        failed_event('evt_1', 'order_1', 'pay_1')
+        failed_event('evt_2', 'order_1', 'pay_1')
+
+        self.assertEqual(webhooks.process_batch(), (2, 0))
+
+        user_email.assert_called_once()
+        admin_email.assert_called_once()
+        statuses = dict(WebhookEvent.objects.values_list('event_id', 'status'))
+        self.assertEqual(statuses, {'evt_1': WebhookEvent.STATUS_PROCESSED, 'evt_2': WebhookEvent.STATUS_IGNORED})
+
+    def test_later_failed_attempt_on_same_order_does_not_notify_again(self, user_email, admin_email):
+        failed_event('evt_1', 'order_1', 'pay_1')
+        webhooks.process_batch()
+        failed_event('evt_2', 'order_1', 'pay_2')
+        webhooks.process_batch()
+
+        user_email.assert_called_once()
+        self.order.refresh_from_db()
+        self.assertEqual(self.order.status, PaymentOrder.STATUS_FAILED)
+        self.assertEqual(self.order.payment_id, 'pay_1')
+
+    def test_failure_after_payment_is_ignored(self, user_email, admin_email):
+        PaymentOrder.objects.filter(pk='order_1').update(status=PaymentOrder.STATUS_PAID, payment_id='pay_ok')
+        failed_event('evt_1', 'order_1', 'pay_1')
+
+        webhooks.process_batch()
+
+        user_email.assert_not_called()
+        self.assertEqual(PaymentOrder.objects.get(pk='order_1').status, PaymentOrder.STATUS_PAID)
+
+    def test_unknown_order_notifies_once_across_batches(self, user_email, admin_email):
+        failed_event('evt_1', 'order_unknown', 'pay_1')
+        webhooks.process_batch()
+        failed_event('evt_2', 'order_unknown', 'pay_2')
+        webhooks.process_batch()
+
+        user_email.assert_called_once()
+        admin_email.assert_called_once()
+
+
+@mock.patch.object(views.verification_executor, 'submit')
+class FastAckStatusTests(TestCase):
+    def setUp(self):
+        create_order()
+
+    def test_status_is_kept_on_the_order(self, submit):
+        handle = views.start_verification_followup('order_1', 'pay_1')
+
+        submit.assert_called_once_with(views.run_verification_followup, handle, 'order_1', 'pay_1')
+        self.assertEqual(PaymentOrder.objects.get(pk='order_1').verify_handle, handle)
+        self.assertEqual(
+            views.get_verification_status(handle),
+            {'state': 'pending', 'order_id': 'order_1', 'payment_id': 'pay_1'},
+        )
+
+        views.set_verification_status(handle, 'completed', order_id='order_1', admin_notified=True)
+        self.assertEqual(views.get_verification_status(handle)['state'], 'completed')
+
+    def test_repeat_verification_shares_the_handle(self, submit):
+        handle = views.start_verification_followup('order_1', 'pay_1')
+        self.assertEqual(views.start_verification_followup('order_1', 'pay_1'), handle)
+        submit.assert_called_once()
+
+    def test_failed_followup_can_be_retried(self, submit):
+        handle = views.start_verification_followup('order_1', 'pay_1')
+        views.set_verification_status(handle, 'failed', error='boom')
+
+        retry = views.start_verification_followup('order_1', 'pay_1')
+
+        self.assertNotEqual(retry, handle)
+        self.assertIsNone(views.get_verification_status(handle))
+        self.assertEqual(views.get_verification_status(retry)['state'], 'pending')
+
+    def test_order_without_local_record_is_not_fast_acknowledged(self, submit):
+        self.assertIsNone(views.start_verification_followup('order_unknown', 'pay_1'))
+        submit.assert_not_called()
+
+
+class IdempotencyTests(TransactionTestCase):
+    def run_concurrently(self, count, target):
+        results = [None] * count
+        start = threading.Barrier(count)
+
+        def run(index):
+            try:
+                start.wait()
+                results[index] = target()
+            finally:
+                connection.close()
+
+        threads = [threading.Thread(target=run, args=(index,)) for index in range(count)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        return results
+
+    def test_concurrent_duplicates_run_the_handler_once(self):
+        if connection.vendor == 'sqlite' and connection.is_in_memory_db():
+            # Shared-cache mode: a second thread's write fails at once with "table is locked"
+            self.skipTest('in-memory SQLite does not allow concurrent writers')
+        calls = []
+
+        def handler():
+            calls.append(1)
+            time.sleep(0.3)
+            return Response({'order_id': 'order_1'}, status=201)
+
+        responses = self.run_concurrently(
+            4, lambda: idempotency.run_idempotent('create-payment', 'key-1', 'hash-1', handler)
+        )
+
+        self.assertEqual(len(calls), 1)
+        self.assertEqual([response.status_code for response in responses], [201] * 4)
+        self.assertEqual([response.data for response in responses], [{'order_id': 'order_1'}] * 4)
+        replayed = [response for response in responses if response.get('Idempotent-Replayed') == 'true']
+        self.assertEqual(len(replayed), 3)
+
+    def test_key_reused_with_another_body_is_rejected(self):
+        handler = lambda: Response({'order_id': 'order_1'}, status=201)
+        idempotency.run_idempotent('create-payment', 'key-1', 'hash-1', handler)
+
+        response = idempotency.run_idempotent('create-payment', 'key-1', 'hash-2', handler)
+
+        self.assertEqual(response.status_code, 422)
+
+    def test_wait_for_in_flight_request_stops_at_the_deadline(self):
+        now = timezone.now()
+        IdempotencyRecord.objects.create(
+            key='create-payment:key-1', request_hash='hash-1', locked_at=now,
+            expires_at=now + timedelta(hours=1),
+        )
+
+        started = time.monotonic()
+        with deadline(0.3):
+            response = idempotency.run_idempotent('create-payment', 'key-1', 'hash-1', mock.Mock())
+
+        self.assertEqual(response.status_code, 409)
+        self.assertLess(time.monotonic() - started, 1.0)
+
+
+class CreateOrderErrorTests(TestCase):
+    DATA = {
+        'name': 'A', 'email': 'a@example.com', 'amount_usd': 1, 'amount_inr': 87.75,
+        'commission': 2.63, 'gst': 0.47, 'total_amount': 90.85,
+    }
+
+    def test_unexpected_error_gets_the_order_error_response(self):
+        client = mock.Mock()
+        client.order.create.side_effect = KeyError('id')
+        with mock.patch.object(views, 'get_razorpay_client', return_value=client):
+            response = self.client.post(reverse('create-payment'), self.DATA, content_type='application/json')
+
+        self.assertEqual(response.status_code, 500)
+        self.assertEqual(response.json(), {'error': 'Could not create order'})
+
+
+@mock.patch.object(views, 'PAYMENT_INITIATED_DIGEST', False)
+@mock.patch.object(views, 'send_payment_initiated_email')
+class AsyncCreatePaymentTests(TestCase):
+    DATA = CreateOrderErrorTests.DATA
+
+    async def test_order_round_trip(self, send_initiated):
+        client = mock.Mock()
+        client.create_order = mock.AsyncMock(return_value={'id': 'order_async'})
+        with mock.patch.object(async_views, 'get_async_razorpay_client', return_value=client):
+            response = await self.async_client.post(
+                reverse('async-create-payment'), self.DATA, content_type='application/json'
+            )
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['Content-Type'], 'application/json')
+        self.assertEqual(response.json()['order_id'], 'order_async')
+        self.assertEqual(response.json()['amount_inr'], 90.85)
+        self.assertEqual(client.create_order.await_args.args[0]['amount'], 9085)
+        self.assertTrue(await PaymentOrder.objects.filter(order_id='order_async').aexists())
+        send_initiated.assert_called_once()
+
+    async def test_invalid_data_is_a_400(self, send_initiated):
+        response = await self.async_client.post(
+            reverse('async-create-payment'), b'{not json', content_type='application/json'
+        )
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('JSON parse error', response.json()['detail'])
+
+        response = await self.async_client.post(
+            reverse('async-create-payment'), {'name': 'A'}, content_type='application/json'
+        )
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('email', response.json())
+        send_initiated.assert_not_called()
+
+
+@mock.patch.object(views, 'send_user_success_email', return_value=True)
+@mock.patch.object(views, 'send_admin_notification', return_value=True)
+class VerifyWithoutLocalOrderTests(TestCase):
+    DATA = {'razorpay_order_id': 'order_1', 'razorpay_payment_id': 'pay_1', 'razorpay_signature': 'sig'}
+
+    def setUp(self):
+        self.razorpay = mock.Mock()
+        self.razorpay.order.fetch.return_value = {'id': 'order_1', 'notes': {
+            'name': 'A', 'email': 'a@example.com', 'amount_usd': '1.00', 'amount_inr': '87.75',
+            'commission': '2.63', 'gst': '0.47', 'total_amount': '90.85',
+        }}
+        self.razorpay.payment.fetch.return_value = {'id': 'pay_1', 'created_at': 1700000000}
+        patcher = mock.patch.object(views, 'get_razorpay_client', return_value=self.razorpay)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.addCleanup(views.verification_results.clear)
+
+    def verify(self):
+        return self.client.post(reverse('verify-payment'), self.DATA, content_type='application/json')
+
+    def test_failed_fetch_records_and_notifies_nothing(self, admin_email, user_email):
+        self.razorpay.order.fetch.side_effect = ConnectionError('razorpay down')
+
+        response = self.verify()
+
+        self.assertEqual(response.status_code, 502)
+        self.assertFalse(PaymentOrder.objects.exists())
+        admin_email.assert_not_called()
+        user_email.assert_not_called()
+
+    def test_verification_after_a_failed_fetch_records_the_payment(self, admin_email, user_email):
+        self.razorpay.payment.fetch.side_effect = ConnectionError('razorpay down')
+        self.assertEqual(self.verify().status_code, 502)
+        self.razorpay.payment.fetch.side_effect = None
+
+        response = self.verify()
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['admin_notified'], True)
+        order = PaymentOrder.objects.get(pk='order_1')
+        self.assertEqual((order.status, order.email), (PaymentOrder.STATUS_PAID, 'a@example.com'))
+        admin_email.assert_called_once()
+
+
+@mock.patch.object(views, 'send_user_success_email', return_value=True)
+@mock.patch.object(views, 'send_admin_notification', return_value=True)
+class VerifyMemoTests(TestCase):
+    DATA = {'razorpay_order_id': 'order_1', 'razorpay_payment_id': 'pay_1', 'razorpay_signature': 'sig'}
+
+    def setUp(self):
+        create_order()
+        self.razorpay = mock.Mock()
+        for patcher in (
+            mock.patch.object(views, 'get_razorpay_client', return_value=self.razorpay),
+            mock.patch.object(views, 'PAYMENT_VERIFY_FAST_ACK', False),
+        ):
+            patcher.start()
+            self.addCleanup(patcher.stop)
+        self.addCleanup(views.verification_results.clear)
+
+    def verify(self, **data):
+        return self.client.post(reverse('verify-payment'), {**self.DATA, **data}, content_type='application/json')
+
+    def test_repeat_verify_is_served_from_the_memo(self, admin_email, user_email):
+        first = self.verify()
+        with mock.patch.object(views, 'complete_verified_payment') as complete:
+            repeat = self.verify()
+
+        complete.assert_not_called()
+        self.assertEqual(repeat.json(), first.json())
+        self.assertEqual(self.razorpay.utility.verify_payment_signature.call_count, 2)
+        admin_email.assert_called_once()
+
+    def test_memo_is_not_served_without_a_valid_signature(self, admin_email, user_email):
+        self.verify()
+        self.razorpay.utility.verify_payment_signature.side_effect = (
+            razorpay.errors.SignatureVerificationError('bad signature')
+        )
+
+        response = self.verify(razorpay_signature='forged')
+
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.json(), {'error': 'Invalid payment signature'})
+
+
+class SlowRazorpay:
+    """Razorpay client stand-in: each fetch takes ``delay`` seconds and records its thread."""
+
+    def __init__(self, delay=0.2, payment_delay=None):
+        self.threads = []
+        self.timeouts = []
+        self.order = mock.Mock(fetch=self.fetcher(
+            delay, {'id': 'order_1', 'notes': {'name': 'A', 'email': 'a@example.com'}}
+        ))
+        self.payment = mock.Mock(fetch=self.fetcher(
+            delay if payment_delay is None else payment_delay, {'id': 'pay_1', 'created_at': 1700000000}
+        ))
+
+    def fetcher(self, delay, result):
+        def fetch(entity_id, timeout):
+            self.threads.append(threading.current_thread().name)
+            self.timeouts.append(timeout)
+            time.sleep(delay)
+            return result
+        return fetch
+
+
+class FetchVerifiedPaymentDetailsTests(SimpleTestCase):
+    def test_order_and_payment_are_fetched_concurrently(self):
+        client = SlowRazorpay(delay=0.2)
+
+        started = time.monotonic()
+        details, payment_info = views.fetch_verified_payment_details(client, 'order_1', 'pay_1')
+
+        self.assertLess(time.monotonic() - started, 0.35)
+        self.assertEqual((details['name'], details['email']), ('A', 'a@example.com'))
+        self.assertEqual(payment_info['timestamp'], 1700000000)
+        self.assertEqual(len(client.threads), 2)
+        self.assertTrue(all(name.startswith('razorpay_fetch') for name in client.threads))
+        self.assertEqual(client.timeouts, [views.RAZORPAY_FETCH_TIMEOUT] * 2)
+
+    def test_fetch_timeouts_are_capped_by_the_request_deadline(self):
+        client = SlowRazorpay(delay=0)
+
+        with deadline(0.5):
+            views.fetch_verified_payment_details(client, 'order_1', 'pay_1')
+
+        self.assertTrue(all(timeout <= 0.5 for timeout in client.timeouts))
+
+    def test_one_slow_fetch_gives_up_at_the_shared_deadline(self):
+        client = SlowRazorpay(delay=0, payment_delay=1.0)
+
+        started = time.monotonic()
+        with mock.patch.object(views, 'RAZORPAY_FETCH_DEADLINE', 0.2):
+            details, payment_info = views.fetch_verified_payment_details(client, 'order_1', 'pay_1')
+
+        self.assertLess(time.monotonic() - started, 0.6)
+        # Incomplete: nothing may be recorded from it
+        self.assertIsNone(details)
+        self.assertEqual(payment_info['razorpay_payment_id'], 'pay_1')
+
+
+@override_settings(FROM_EMAIL='payments@example.com')
+class InitiatedOrderDigestTests(SimpleTestCase):
+    def setUp(self):
+        self.sent = []
+        self.delivered = threading.Event()
+        patcher = mock.patch.object(digest, 'deliver', side_effect=self.deliver)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def deliver(self, message, category):
+        self.sent.append((message.get(), category))
+        self.delivered.set()
+
+    def add(self, buffer, *order_ids):
+        for order_id in order_ids:
+            buffer.add(order_id, 'A', 'a@example.com', '1.00', '90.85')
+
+    def body(self, payload):
+        return payload['content'][0]['value']
+
+    def test_full_batch_is_sent_at_once(self):
+        buffer = digest.InitiatedOrderDigest(window=60, batch_size=3)
+        self.add(buffer, 'order_1', 'order_2', 'order_3')
+
+        self.assertEqual(len(self.sent), 1)
+        payload, category = self.sent[0]
+        self.assertEqual(category, 'payment_initiated')
+        self.assertIn('3 order(s) initiated', payload['subject'])
+        self.assertIn('Total Amount    : ₹272.55', self.body(payload))
+        self.assertIsNone(buffer._timer)
+
+    def test_partial_batch_is_sent_when_the_window_closes(self):
+        buffer = digest.InitiatedOrderDigest(window=0.1, batch_size=3)
+        self.add(buffer, 'order_1', 'order_2')
+        self.assertEqual(self.sent, [])
+
+        self.assertTrue(self.delivered.wait(5))
+
+        self.assertEqual(len(self.sent), 1)
+        body = self.body(self.sent[0][0])
+        self.assertIn('order_1', body)
+        self.assertIn('order_2', body)
+
+    def test_window_starts_again_after_a_batch(self):
+        buffer = digest.InitiatedOrderDigest(window=60, batch_size=2)
+        self.add(buffer, 'order_1', 'order_2', 'order_3')
+
+        self.assertEqual(len(self.sent), 1)
+        self.assertIsNotNone(buffer._timer)
+        buffer.flush()
+        self.assertNotIn('order_1', self.body(self.sent[1][0]))
+
+    def test_exit_flush_sends_directly(self):
+        buffer = digest.InitiatedOrderDigest(window=60, batch_size=3)
+        self.add(buffer, 'order_1')
+
+        with mock.patch.object(digest, 'send_mail_now') as send_mail_now:
+            self.assertTrue(buffer.flush(send_now=True))
+            self.assertFalse(buffer.flush(send_now=True))
+
+        send_mail_now.assert_called_once()
+        self.assertEqual(self.sent, [])
+
+
+class LRUCacheTests(SimpleTestCase):
+    def test_least_recently_used_entry_is_evicted_at_capacity(self):
+        cache = LRUCache(maxsize=2)
+        cache.set('a', 1)
+        cache.set('b', 2)
+        cache.get('a')  # now b is the least recently used
+
+        cache.set('c', 3)
+
+        self.assertEqual((cache.get('a'), cache.get('b'), cache.get('c')), (1, None, 3))
+        self.assertEqual(cache.stats()['size'], 2)
+        self.assertEqual(cache.stats()['evictions'], 1)
+
+    def test_overwriting_a_key_does_not_evict(self):
+        cache = LRUCache(maxsize=2)
+        cache.set('a', 1)
+        cache.set('b', 2)
+        cache.set('a', 10)
+        cache.set('c', 3)  # evicts b: a was just written
+
+        self.assertEqual((cache.get('a'), cache.get('b')), (10, None))
+        self.assertEqual(cache.stats()['evictions'], 1)
+
+    def test_expired_entries_are_misses(self):
+        now = [100.0]
+        with mock.patch.object(lru, 'time', mock.Mock(monotonic=lambda: now[0])):
+            cache = LRUCache(maxsize=2, ttl=10)
+            cache.set('a', 1)
+            now[0] += 9.9
+            self.assertEqual(cache.get('a'), 1)
+            now[0] += 0.1
+            self.assertIsNone(cache.get('a'))
+
+        self.assertEqual(cache.stats(), {'size': 0, 'maxsize': 2, 'hits': 1, 'misses': 1, 'evictions': 0})
+
+
+class FakeRazorpay(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+
+    def do_GET(self):
+        body = json.dumps({'id': self.path.rsplit('/', 1)[-1], 'amount': 9085}).encode()
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+class ClientRegistryTests(TestCase):
+    def setUp(self):
+        self.server = ThreadingHTTPServer(('127.0.0.1', 0), FakeRazorpay)
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        base_url = f"http://127.0.0.1:{self.server.server_port}/v1"
+        patcher = mock.patch.object(clients, 'RAZORPAY_BASE_URL', base_url)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.registry = clients.RazorpayClientRegistry(pool_size=4)
+        self.addCleanup(self.registry.clear)
+        self.addCleanup(self.server.server_close)
+        self.addCleanup(self.server.shutdown)
+
+    def test_concurrent_gets_share_one_client_and_count_every_call(self):
+        results = []
+        threads = [
+            threading.Thread(target=lambda: results.extend(self.registry.get('key', 'secret') for _ in range(200)))
+            for _ in range(4)
+        ]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(len({id(client) for client in results}), 1)
+        stats = self.registry.stats()
+        self.assertEqual((stats['registry_misses'], stats['registry_hits']), (1, 799))
+
+    def test_stats_report_connection_reuse(self):
+        client = self.registry.get('key', 'secret')
+        for n in range(3):
+            client.order.fetch(f'order_{n}', timeout=5)
+
+        stats = self.registry.stats()
+        self.assertEqual(stats['requests_served'], 3)
+        self.assertEqual(stats['connections_opened'], 1)
+        self.assertEqual(stats['connections_reused'], 2)
+
+
+EVENTS = [
+    {'ts': '2026-10-01T10:00:00.000+00:00', 'level': 'INFO', 'event': 'order.created', 'duration_ms': 100},
+    {'ts': '2026-10-01T10:30:00.000+00:00', 'level': 'INFO', 'event': 'order.failed', 'reason': 'timeout',
+     'duration_ms': 300},
+    {'ts': '2026-10-01T11:00:00.000+00:00', 'level': 'INFO', 'logger': 'payments', 'message': 'not an event'},
+    {'ts': '2026-10-01T11:00:00.000+00:00', 'level': 'INFO', 'event': 'email.sent', 'category': 'contact'},
+    {'ts': '2026-10-01T12:00:00.000+00:00', 'level': 'INFO', 'event': 'email.failed', 'category': 'contact',
+     'status': 500},
+]
+
+
+class LogStatsTests(SimpleTestCase):
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.directory = directory.name
+
+    def write_log(self, name, entries, tail=''):
+        path = os.path.join(self.directory, name)
+        opener = gzip.open if name.endswith('.gz') else open
+        with opener(path, 'wt') as f:
+            f.writelines(json.dumps(entry) + '\n' for entry in entries)
+            f.write(tail)
+        return path
+
+    def log_stats(self, *args):
+        out = StringIO()
+        call_command('log_stats', *args, stdout=out)
+        return out.getvalue()
+
+    def test_summary(self):
+        output = self.log_stats(self.write_log('events.log', EVENTS), '--hourly', '2')
+
+        self.assertIn('1 file(s), 5 lines', output)
+        self.assertIn('Events from 2026-10-01T10:00:00.000+00:00 to 2026-10-01T12:00:00.000+00:00 (2.0 h)', output)
+        self.assertRegex(output, r'order\.created +1 +0\.5 +100\.\d')
+        self.assertRegex(output, r'email +1 / 2 +50\.00%')
+        self.assertIn('order.failed timeout: 1', output)
+        self.assertIn('email.failed 500: 1', output)
+        self.assertRegex(output, r'contact +sent +1  failed +1')
+        self.assertIn('2026-10-01T12', output)
+        self.assertNotIn('2026-10-01T10  ', output)  # only the last 2 hours
+
+    def test_empty_file(self):
+        output = self.log_stats(self.write_log('events.log', []))
+
+        self.assertIn('1 file(s), 0 lines', output)
+        self.assertIn('No events.', output)
+
+    def test_truncated_last_line_is_skipped(self):
+        path = self.write_log('events.log', EVENTS[:2], tail='{"ts": "2026-10-01T11:00:00.000+00:00", "event": "ord')
+
+        output = self.log_stats(path)
+
+        self.assertIn('3 lines', output)
+        self.assertIn('1 lines could not be parsed', output)
+        self.assertRegex(output, r'order +1 / 2 ')
+
+    def test_event_filter(self):
+        output = self.log_stats(self.write_log('events.log', EVENTS), '--event', 'email.')
+
+        self.assertIn('email.sent', output)
+        self.assertNotIn('order.created', output)
+
+    def test_default_paths_include_gzipped_backups(self):
+        self.write_log('events.log.1.gz', EVENTS[:2])
+        self.write_log('events.log', EVENTS[3:])
+
+        with override_settings(LOGGING_DIR=self.directory):
+            output = self.log_stats()
+
+        self.assertIn('2 file(s), 4 lines', output)
+        self.assertRegex(output, r'order +1 / 2 ')
+        self.assertRegex(output, r'email +1 / 2 ')
+
+    def test_no_logs(self):
+        with override_settings(LOGGING_DIR=self.directory):
+            with self.assertRaises(CommandError):
+                self.log_stats()
+
+
+class FakeListing:
+    """``client.payment`` / ``client.order``: ``all()`` over fixed items, newest first."""
+
+    def __init__(self, items, fail=False):
+        self.items = items
+        self.fail = fail
+        self.calls = 0
+
+    def all(self, params, timeout=None):
+        self.calls += 1
+        if self.fail:
+            raise razorpay.errors.ServerError('listing unavailable')
+        items = sorted(
+            (item for item in self.items if params['from'] <= item['created_at'] <= params['to']),
+            key=lambda item: item['created_at'], reverse=True,
+        )
+        return {'items': items[params['skip']:params['skip'] + params['count']]}
+
+
+DAY = 1767225600  # 2026-01-01 00:00 UTC
+
+
+@mock.patch.object(views, 'send_user_success_email', return_value=True)
+@mock.patch.object(views, 'send_admin_notification', return_value=True)
+class ReconcilePaymentsTests(TestCase):
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.checkpoint = os.path.join(directory.name, 'reconcile.json')
+
+        create_order('order_unverified')
+        for order_id, payment_id in (('order_paid', 'pay_paid'), ('order_never_paid', 'pay_ghost')):
+            order = create_order(order_id)
+            order.status, order.payment_id = PaymentOrder.STATUS_PAID, payment_id
+            order.save()
+        self.payments = FakeListing([
+            {'id': 'pay_unverified', 'order_id': 'order_unverified', 'status': 'captured',
+             'amount': 9085, 'created_at': DAY + 3600},
+            {'id': 'pay_paid', 'order_id': 'order_paid', 'status': 'captured',
+             'amount': 9085, 'created_at': DAY + 7200},
+        ])
+        self.orders = FakeListing([
+            {'id': 'order_unverified', 'status': 'paid', 'amount': 9085, 'created_at': DAY + 3000},
+            {'id': 'order_paid', 'status': 'paid', 'amount': 9085, 'created_at': DAY + 7000},
+            {'id': 'order_never_paid', 'status': 'attempted', 'amount': 9085, 'created_at': DAY + 8000},
+        ])
+
+    def reconcile(self, *args):
+        client = mock.Mock(payment=self.payments, order=self.orders)
+        out = StringIO()
+        with mock.patch('payments_razorpay.management.commands.reconcile_payments.get_razorpay_client',
+                        return_value=client):
+            call_command('reconcile_payments', '--from', '2026-01-01', '--to', '2026-01-01',
+                         '--slice-seconds', '21600', '--concurrency', '2', '--checkpoint', self.checkpoint,
+                         '--json', *args, stdout=out, stderr=StringIO())
+        return out.getvalue()
+
+    def mismatches(self, output):
+        return sorted(
+            (line['kind'], line['order_id'])
+            for line in map(json.loads, (text for text in output.splitlines() if text.startswith('{')))
+        )
+
+    def test_payments_and_orders_are_both_checked(self, notify, success):
+        output = self.reconcile()
+
+        self.assertEqual(self.mismatches(output), [
+            ('captured_not_verified', 'order_unverified'),
+            ('paid_not_captured', 'order_never_paid'),
+        ])
+        self.assertIn('orders=3', output)
+        self.assertIn('payments=2', output)
+        self.assertFalse(os.path.exists(self.checkpoint))
+
+    def test_orders_resume_from_their_own_checkpoint(self, notify, success):
+        self.orders.fail = True
+        with self.assertRaises(razorpay.errors.ServerError):
+            self.reconcile()
+        with open(self.checkpoint) as f:
+            saved = json.load(f)
+        self.assertEqual(saved['next_from'], {'payment': DAY + 86400})
+
+        payment_calls = self.payments.calls
+        self.orders.fail = False
+        output = self.reconcile()
+
+        self.assertEqual(self.payments.calls, payment_calls)
+        self.assertIn('Resuming orders from 2026-01-01 00:00:00 UTC', output)
+        self.assertEqual(self.mismatches(output), [('paid_not_captured', 'order_never_paid')])
+        self.assertIn('captured_not_verified=1', output)
@@ -1,8 +1,15 @@
 from django.urls import path
-from .views import CreatePaymentAPIView,VerifyPaymentAPIView
+from .views import CreatePaymentAPIView,VerifyPaymentAPIView,VerificationStatusAPIView,RazorpayWebhookAPIView
+from .async_views import AsyncCreatePaymentAPIView, AsyncVerifyPaymentAPIView
 
 urlpatterns = [
     path('create-payment/', CreatePaymentAPIView.as_view(), name='create-payment'),
     path('payment/verify/', VerifyPaymentAPIView.as_view(), name='verify-payment'),
+    path('payment/verify/status/<str:handle>/', VerificationStatusAPIView.as_view(), name='verify-payment-status'),
+    path('payment/webhook/', RazorpayWebhookAPIView.as_view(), name='razorpay-webhook'),
+
+    # Native async variants (non-blocking under ASGI)
+    path('async/create-payment/', AsyncCreatePaymentAPIView.as_view(), name='async-create-payment'),
+    path('async/payment/verify/', AsyncVerifyPaymentAPIView.as_view(), name='async-verify-payment'),
 
 ]
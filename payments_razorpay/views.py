@@ -1,14 +1,49 @@
+import functools
+import hashlib
+import json
 import logging
+import time
+import uuid
 import razorpay
 import requests
 from datetime import datetime
+from decimal import Decimal
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FuturesTimeoutError, wait
 
 from rest_framework.views import APIView
 from rest_framework.response import Response
 from rest_framework import status, serializers
-from sendgrid import SendGridAPIClient
 from sendgrid.helpers.mail import Mail
 from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.db.models import Q
+from django.urls import reverse
+from django.utils import timezone
+
+from mailer.dispatcher import deliver
+from mailer.rendering import load_templates
+from mailer.transport import get_transport
+from payments.breakers import CircuitOpen, unavailable_response
+from payments.deadlines import (
+    CREATE_PAYMENT_DEADLINE,
+    VERIFY_PAYMENT_DEADLINE,
+    UpstreamTimeout,
+    deadline,
+    timeout_response,
+    upstream_call,
+    upstream_timeout,
+    with_deadline,
+)
+from payments.events import log_event, ms_since
+from payments.metrics import task_duration
+
+from usd.tokens import QuoteTokenError, verify_quote_token
+
+from .clients import RAZORPAY_ERRORS, get_razorpay_client
+from .digest import PAYMENT_INITIATED_DIGEST, PAYMENT_INITIATED_RECIPIENTS, initiated_digest
+from .idempotency import request_fingerprint, run_idempotent
+from .lru import LRUCache
+from .models import PaymentOrder, WebhookEvent
 
 # === API KEYS & CONFIG ===
 SENDGRID_API_KEY = settings.SENDGRID_API_KEY
@@ -17,14 +52,23 @@ RAZORPAY_KEY_SECRET = settings.RAZORPAY_KEY_SECRET
 FIXER_API_KEY = settings.FIXER_API_KEY
 ADMIN_EMAIL = settings.ADMIN_EMAIL
 FROM_EMAIL = settings.FROM_EMAIL
-logger = logging.getLogger(__name__)
-
-# === Logging configuration ===
-logging.basicConfig(
-    filename="payment_logs.log",
-    level=logging.INFO,
-    format="%(asctime)s %(levelname)s %(message)s"
+PAYMENT_VERIFY_FAST_ACK = getattr(settings, 'PAYMENT_VERIFY_FAST_ACK', False)
+VERIFY_FOLLOWUP_WORKERS = getattr(settings, 'VERIFY_FOLLOWUP_WORKERS', 4)
+VERIFY_STATUS_TTL = getattr(settings, 'VERIFY_STATUS_TTL', 24 * 60 * 60)
+RAZORPAY_FETCH_TIMEOUT = getattr(settings, 'RAZORPAY_FETCH_TIMEOUT', 5)
+RAZORPAY_FETCH_DEADLINE = getattr(settings, 'RAZORPAY_FETCH_DEADLINE', 8)
+QUOTE_TOKEN_REQUIRED = getattr(settings, 'QUOTE_TOKEN_REQUIRED', False)
+PAYMENT_VERIFY_UPSTREAM_CHECK = getattr(settings, 'PAYMENT_VERIFY_UPSTREAM_CHECK', False)
+VERIFY_RESULT_CACHE_SIZE = getattr(settings, 'VERIFY_RESULT_CACHE_SIZE', 10000)
+RAZORPAY_WEBHOOK_SECRET = getattr(settings, 'RAZORPAY_WEBHOOK_SECRET', None)
+
+# === Customer email templates (compiled once per worker) ===
+SUCCESS_HTML, SUCCESS_TEXT, FAILURE_HTML, FAILURE_TEXT = load_templates(
+    __file__,
+    'payment_success.html', 'payment_success.txt',
+    'payment_failure.html', 'payment_failure.txt',
 )
+logger = logging.getLogger(__name__)
 
 # === Helper function to send admin email ===
 def send_admin_notification(order_details, payment_details=None, email_type="payment_created"):
@@ -32,8 +76,6 @@ def send_admin_notification(order_details, payment_details=None, email_type="pay
     Send admin notification email for different payment events - Razorpay style format
     """
     try:
-        sg = SendGridAPIClient(SENDGRID_API_KEY)
-        
         if email_type == "payment_verified":
             subject = f"Razorpay : Payment in advolcano.io (Order ID : {payment_details.get('razorpay_order_id', 'N/A')}) State: Payment Completed"
             
@@ -156,177 +198,56 @@ Advolcano.io Payment System
             plain_text_content=email_body
         )
         
-        response = sg.send(message)
-        logger.info(f"✅ Admin email sent successfully - Type: {email_type}, Status Code: {response.status_code}")
+        response = deliver(message, category="payment_admin")
+        logger.info(f"✅ Admin email queued - Type: {email_type}, Status Code: {response.status_code}")
         return True
         
     except Exception as e:
         logger.error(f"❌ Failed to send admin email ({email_type}): {str(e)}")
         return False
 
+# === Helpers shared by the customer payment emails ===
+@functools.lru_cache(maxsize=1024)
+def _customer_email_minute(minute):
+    return datetime.fromtimestamp(minute * 60).strftime('%B %d, %Y at %I:%M %p IST')
+
+def customer_email_time(timestamp=None):
+    """
+    Payment time as shown to customers (now, unless a Unix timestamp is given).
+    The format stops at minutes, so each minute is only formatted once.
+    """
+    if not isinstance(timestamp, (int, float)):
+        timestamp = time.time()
+    return _customer_email_minute(int(timestamp // 60))
+
+def customer_email_context(order_details, payment_details, formatted_time):
+    """Fields shared by the customer success and failure email templates"""
+    return {
+        'name': order_details.get('name', 'N/A'),
+        'email': order_details.get('email', 'N/A'),
+        'order_id': payment_details.get('razorpay_order_id', 'N/A'),
+        'formatted_time': formatted_time,
+        'amount_usd': order_details.get('amount_usd', 0),
+        'amount_inr': order_details.get('amount_inr', 0),
+        'commission': order_details.get('commission', 0),
+        'gst': order_details.get('gst', 0),
+        'total_amount': order_details.get('total_amount', 0),
+    }
+
 # === Helper function to send user payment success email ===
 def send_user_success_email(order_details, payment_details):
     """
     Send payment success confirmation email to user
     """
     try:
-        sg = SendGridAPIClient(SENDGRID_API_KEY)
-        
-        # Format timestamp
-        timestamp = payment_details.get('timestamp', datetime.now())
-        if isinstance(timestamp, (int, float)):
-            formatted_time = datetime.fromtimestamp(timestamp).strftime('%B %d, %Y at %I:%M %p IST')
-        else:
-            formatted_time = datetime.now().strftime('%B %d, %Y at %I:%M %p IST')
+        formatted_time = customer_email_time(payment_details.get('timestamp'))
         
         # Updated subject line to use "Payment Process"
         subject = f"Payment Process Complete - Order {payment_details.get('razorpay_order_id', 'N/A')} | AdVolcano"
         
-        # Create HTML email body with "Payment Process" naming
-        html_body = f"""
-<!DOCTYPE html>
-<html>
-<head>
-    <meta charset="UTF-8">
-    <style>
-        body {{ font-family: Arial, sans-serif; margin: 0; padding: 20px; background-color: #f5f5f5; }}
-        .container {{ max-width: 600px; margin: 0 auto; background-color: white; border-radius: 8px; overflow: hidden; box-shadow: 0 2px 10px rgba(0,0,0,0.1); }}
-        .header {{ background-color: #4CAF50; color: white; padding: 20px; text-align: center; }}
-        .header h1 {{ margin: 0; font-size: 24px; }}
-        .content {{ padding: 30px; }}
-        .order-id {{ background-color: #e8f5e8; padding: 15px; border-radius: 5px; margin: 20px 0; text-align: center; font-weight: bold; }}
-        .section {{ margin-bottom: 30px; }}
-        .section h3 {{ color: #333; border-bottom: 2px solid #4CAF50; padding-bottom: 5px; margin-bottom: 15px; }}
-        .details-row {{ display: flex; justify-content: space-between; margin: 10px 0; padding: 8px 0; }}
-        .details-label {{ font-weight: 500; color: #555; }}
-        .details-value {{ color: #333; }}
-        .total-row {{ background-color: #4CAF50; color: white; padding: 15px; margin: 10px 0; border-radius: 5px; font-weight: bold; font-size: 18px; }}
-        .next-steps {{ background-color: #fff3cd; border: 1px solid #ffeaa7; border-radius: 5px; padding: 20px; margin: 20px 0; }}
-        .next-steps h3 {{ color: #856404; margin-top: 0; }}
-        .next-steps ol {{ color: #856404; }}
-        .important {{ background-color: #e7f3ff; border-left: 4px solid #2196F3; padding: 15px; margin: 20px 0; }}
-        .footer {{ text-align: center; padding: 20px; background-color: #333; color: white; }}
-        .support-link {{ color: #4CAF50; text-decoration: none; }}
-    </style>
-</head>
-<body>
-    <div class="container">
-        <div class="header">
-            <h1>Payment Process Complete</h1>
-        </div>
-        
-        <div class="content">
-            <p>Dear <strong>{order_details.get('name', 'N/A')}</strong>,</p>
-            
-            <p>Thank you for your order with <a href="https://advolcano.io" style="color: #4CAF50; text-decoration: none;">advolcano.io</a>. We have received your payment with the following details:</p>
-            
-            <div class="order-id">
-                Order ID: {payment_details.get('razorpay_order_id', 'N/A')}
-            </div>
-            
-            <div class="section">
-                <h3>Customer Details</h3>
-                <div class="details-row">
-                    <span class="details-label">AdVolcano Name :</span>
-                    <span class="details-value">{order_details.get('name', 'N/A')}</span>
-                </div>
-                <div class="details-row">
-                    <span class="details-label">AdVolcano Email :</span>
-                    <span class="details-value">{order_details.get('email', 'N/A')}</span>
-                </div>
-                <div class="details-row">
-                    <span class="details-label">Date & Time :</span>
-                    <span class="details-value">{formatted_time}</span>
-                </div>
-            </div>
-            
-            <div class="section">
-                <h3>Payment Summary</h3>
-                <div class="details-row">
-                    <span class="details-label">Base Amount (USD)</span>
-                    <span class="details-value">${order_details.get('amount_usd', 0):.2f}</span>
-                </div>
-                <div class="details-row">
-                    <span class="details-label">Base Amount (INR)</span>
-                    <span class="details-value">₹{order_details.get('amount_inr', 0):.2f}</span>
-                </div>
-                <div class="details-row">
-                    <span class="details-label">Platform Fee</span>
-                    <span class="details-value">₹{order_details.get('commission', 0):.2f}</span>
-                </div>
-                <div class="details-row">
-                    <span class="details-label">TAX (GST - 18%)</span>
-                    <span class="details-value">₹{order_details.get('gst', 0):.2f}</span>
-                </div>
-                <div class="total-row">
-                    <div style="display: flex; justify-content: space-between;">
-                        <span>TOTAL AMOUNT:</span>
-                        <span>₹{order_details.get('total_amount', 0):.2f}</span>
-                    </div>
-                </div>
-            </div>
-            
-            <div class="next-steps">
-                <h3>Next Steps</h3>
-                <ol>
-                    <li>We'll credit your AdVolcano wallet within 24hrs</li>
-                </ol>
-            </div>
-            
-            <div class="important">
-                <strong>Important:</strong> This order will reflect in your wallet in 24 to 48 hours. For any communication related to this payment please quote your payment order ID <strong>{payment_details.get('razorpay_order_id', 'N/A')}</strong>.
-            </div>
-            
-            <p>Need help? Contact us at <a href="mailto:support@advolcano.io" class="support-link">support@advolcano.io</a></p>
-            
-            <p>Best regards,<br>
-            <strong>AdVolcano Team</strong></p>
-        </div>
-        
-        <div class="footer">
-            © 2025 AdVolcano. All rights reserved.
-        </div>
-    </div>
-</body>
-</html>
-"""
-        
-        # Plain text version
-        plain_text_body = f"""
-Payment Process Complete
-
-Dear {order_details.get('name', 'N/A')},
-
-Thank you for your order with advolcano.io. We have received your payment with the following details:
-
-Order ID: {payment_details.get('razorpay_order_id', 'N/A')}
-
-Customer Details
-AdVolcano Name : {order_details.get('name', 'N/A')}
-AdVolcano Email : {order_details.get('email', 'N/A')}
-Date & Time : {formatted_time}
-
-Payment Summary
-Base Amount (USD): ${order_details.get('amount_usd', 0):.2f}
-Base Amount (INR): ₹{order_details.get('amount_inr', 0):.2f}
-Platform Fee: ₹{order_details.get('commission', 0):.2f}
-TAX (GST - 18%): ₹{order_details.get('gst', 0):.2f}
-TOTAL AMOUNT: ₹{order_details.get('total_amount', 0):.2f}
-
-Next Steps
-1. Payment confirmed on Razorpay gateway
-2. We'll credit your AdVolcano wallet within 24hrs
-3. Order will be processed after payment confirmation
-
-Important: This order will reflect in your wallet in 24 to 48 hours. For any communication related to this payment please quote your payment order ID {payment_details.get('razorpay_order_id', 'N/A')}.
-
-Need help? Contact us at support@advolcano.io
-
-Best regards,
-AdVolcano Team
-
-© 2025 AdVolcano. All rights reserved.
-"""
+        context = customer_email_context(order_details, payment_details, formatted_time)
+        html_body = SUCCESS_HTML.render(context)
+        plain_text_body = SUCCESS_TEXT.render(context)
 
         message = Mail(
             from_email=FROM_EMAIL,
@@ -336,8 +257,8 @@ AdVolcano Team
             html_content=html_body
         )
         
-        response = sg.send(message)
-        logger.info(f"✅ User success email sent to {order_details.get('email')} - Status Code: {response.status_code}")
+        response = deliver(message, category="payment_receipt")
+        logger.info(f"✅ User success email queued for {order_details.get('email')} - Status Code: {response.status_code}")
         return True
         
     except Exception as e:
@@ -350,205 +271,112 @@ def send_user_failure_email(order_details, payment_details):
     Send payment failure notification email to user
     """
     try:
-        sg = SendGridAPIClient(SENDGRID_API_KEY)
-        
-        # Format timestamp
-        timestamp = payment_details.get('timestamp', datetime.now())
-        if isinstance(timestamp, (int, float)):
-            formatted_time = datetime.fromtimestamp(timestamp).strftime('%B %d, %Y at %I:%M %p IST')
-        else:
-            formatted_time = datetime.now().strftime('%B %d, %Y at %I:%M %p IST')
+        formatted_time = customer_email_time(payment_details.get('timestamp'))
         
         subject = f"Payment Failed - Order {payment_details.get('razorpay_order_id', 'N/A')} | AdVolcano"
         
-        # Create HTML email body for payment failure
-        html_body = f"""
-<!DOCTYPE html>
-<html>
-<head>
-    <meta charset="UTF-8">
-    <style>
-        body {{ font-family: Arial, sans-serif; margin: 0; padding: 20px; background-color: #f5f5f5; }}
-        .container {{ max-width: 600px; margin: 0 auto; background-color: white; border-radius: 8px; overflow: hidden; box-shadow: 0 2px 10px rgba(0,0,0,0.1); }}
-        .header {{ background-color: #dc3545; color: white; padding: 20px; text-align: center; }}
-        .header h1 {{ margin: 0; font-size: 24px; }}
-        .content {{ padding: 30px; }}
-        .order-id {{ background-color: #f8d7da; padding: 15px; border-radius: 5px; margin: 20px 0; text-align: center; font-weight: bold; color: #721c24; }}
-        .section {{ margin-bottom: 30px; }}
-        .section h3 {{ color: #333; border-bottom: 2px solid #dc3545; padding-bottom: 5px; margin-bottom: 15px; }}
-        .details-row {{ display: flex; justify-content: space-between; margin: 10px 0; padding: 8px 0; }}
-        .details-label {{ font-weight: 500; color: #555; }}
-        .details-value {{ color: #333; }}
-        .total-row {{ background-color: #dc3545; color: white; padding: 15px; margin: 10px 0; border-radius: 5px; font-weight: bold; font-size: 18px; }}
-        .retry-steps {{ background-color: #fff3cd; border: 1px solid #ffeaa7; border-radius: 5px; padding: 20px; margin: 20px 0; }}
-        .retry-steps h3 {{ color: #856404; margin-top: 0; }}
-        .retry-steps ol {{ color: #856404; }}
-        .error-info {{ background-color: #f8d7da; border-left: 4px solid #dc3545; padding: 15px; margin: 20px 0; color: #721c24; }}
-        .footer {{ text-align: center; padding: 20px; background-color: #333; color: white; }}
-        .support-link {{ color: #dc3545; text-decoration: none; }}
-        .retry-button {{ display: inline-block; background-color: #28a745; color: white; padding: 12px 24px; text-decoration: none; border-radius: 5px; margin: 10px 0; }}
-    </style>
-</head>
-<body>
-    <div class="container">
-        <div class="header">
-            <h1>⚠️ Payment Failed</h1>
-        </div>
-        
-        <div class="content">
-            <p>Dear <strong>{order_details.get('name', 'N/A')}</strong>,</p>
-            
-            <p>We're sorry to inform you that your payment for <a href="https://advolcano.io" style="color: #dc3545; text-decoration: none;">advolcano.io</a> could not be processed.</p>
-            
-            <div class="order-id">
-                Order ID: {payment_details.get('razorpay_order_id', 'N/A')}
-            </div>
-            
-            <div class="error-info">
-                <strong>Payment Status:</strong> Failed<br>
-                <strong>Reason:</strong> {payment_details.get('failure_reason', 'Payment verification failed')}<br>
-                <strong>Failed On:</strong> {formatted_time}
-            </div>
-            
-            <div class="section">
-                <h3>Order Details</h3>
-                <div class="details-row">
-                    <span class="details-label">AdVolcano Name :</span>
-                    <span class="details-value">{order_details.get('name', 'N/A')}</span>
-                </div>
-                <div class="details-row">
-                    <span class="details-label">AdVolcano Email :</span>
-                    <span class="details-value">{order_details.get('email', 'N/A')}</span>
-                </div>
-                <div class="details-row">
-                    <span class="details-label">Order ID :</span>
-                    <span class="details-value">{payment_details.get('razorpay_order_id', 'N/A')}</span>
-                </div>
-            </div>
-            
-            <div class="section">
-                <h3>Payment Summary</h3>
-                <div class="details-row">
-                    <span class="details-label">Base Amount (USD)</span>
-                    <span class="details-value">${order_details.get('amount_usd', 0):.2f}</span>
-                </div>
-                <div class="details-row">
-                    <span class="details-label">Base Amount (INR)</span>
-                    <span class="details-value">₹{order_details.get('amount_inr', 0):.2f}</span>
-                </div>
-                <div class="details-row">
-                    <span class="details-label">Platform Fee</span>
-                    <span class="details-value">₹{order_details.get('commission', 0):.2f}</span>
-                </div>
-                <div class="details-row">
-                    <span class="details-label">TAX (GST - 18%)</span>
-                    <span class="details-value">₹{order_details.get('gst', 0):.2f}</span>
-                </div>
-                <div class="total-row">
-                    <div style="display: flex; justify-content: space-between;">
-                        <span>TOTAL AMOUNT:</span>
-                        <span>₹{order_details.get('total_amount', 0):.2f}</span>
-                    </div>
-                </div>
-            </div>
-            
-            <div class="retry-steps">
-                <h3>What to do next?</h3>
-                <ol>
-                    <li>Check your internet connection and try again</li>
-                    <li>Ensure you have sufficient balance in your payment method</li>
-                    <li>Try using a different payment method (card/UPI/net banking)</li>
-                    <li>Contact your bank if the issue persists</li>
-                    <li>Contact our support team for assistance</li>
-                </ol>
-                
-                <div style="text-align: center; margin-top: 20px;">
-                    <a href="https://advolcano.io/retry-payment?order_id={payment_details.get('razorpay_order_id', 'N/A')}" class="retry-button">Retry Payment</a>
-                </div>
-            </div>
-            
-            <p>If you continue to experience issues, please contact us at <a href="mailto:support@advolcano.io" class="support-link">support@advolcano.io</a> with your Order ID: <strong>{payment_details.get('razorpay_order_id', 'N/A')}</strong></p>
-            
-            <p>Best regards,<br>
-            <strong>AdVolcano Team</strong></p>
-        </div>
+        context = customer_email_context(order_details, payment_details, formatted_time)
+        context['failure_reason'] = payment_details.get('failure_reason', 'Payment verification failed')
+        html_body = FAILURE_HTML.render(context)
+        plain_text_body = FAILURE_TEXT.render(context)
+
+        message = Mail(
+            from_email=FROM_EMAIL,
+            to_emails=order_details.get('email'),
+            subject=subject,
+            plain_text_content=plain_text_body,
+            html_content=html_body
+        )
         
-        <div class="footer">
-            © 2025 AdVolcano. All rights reserved.
-        </div>
-    </div>
-</body>
-</html>
-"""
+        response = deliver(message, category="payment_failure")
+        logger.info(f"✅ User failure email queued for {order_details.get('email')} - Status Code: {response.status_code}")
+        return True
         
-        # Plain text version
-        plain_text_body = f"""
-⚠️ Payment Failed
-
-Dear {order_details.get('name', 'N/A')},
+    except Exception as e:
+        logger.error(f"❌ Failed to send user failure email: {str(e)}")
+        return False
 
-We're sorry to inform you that your payment for advolcano.io could not be processed.
+# === Helper function to send the per-order "Payment Initiated" admin email ===
+def send_payment_initiated_email(order_id, data):
+    """
+    Send the plain-text "Payment Initiated" email to finance for a single order
+    """
+    subject = f"Payment in advolcano.io (Order ID : {order_id}) State: Payment Initiated"
 
-Order ID: {payment_details.get('razorpay_order_id', 'N/A')}
+    email_body = f"""
+Hello Admin,
 
-Payment Status: Failed
-Reason: {payment_details.get('failure_reason', 'Payment verification failed')}
-Failed On: {formatted_time}
+A new payment order has been created in advolcano.io.
 
+--------------------------------------------------------
 Order Details
-AdVolcano Name : {order_details.get('name', 'N/A')}
-AdVolcano Email : {order_details.get('email', 'N/A')}
-Order ID : {payment_details.get('razorpay_order_id', 'N/A')}
+--------------------------------------------------------
+Shop            : advolcano.io
+Order ID        : {order_id}
+Amount          : INR {data['total_amount']:.2f}
 
+--------------------------------------------------------
 Payment Summary
-Base Amount (USD): ${order_details.get('amount_usd', 0):.2f}
-Base Amount (INR): ₹{order_details.get('amount_inr', 0):.2f}
-Platform Fee: ₹{order_details.get('commission', 0):.2f}
-TAX (GST - 18%): ₹{order_details.get('gst', 0):.2f}
-TOTAL AMOUNT: ₹{order_details.get('total_amount', 0):.2f}
-
-What to do next?
-1. Check your internet connection and try again
-2. Ensure you have sufficient balance in your payment method
-3. Try using a different payment method (card/UPI/net banking)
-4. Contact your bank if the issue persists
-5. Contact our support team for assistance
+--------------------------------------------------------
+Advolcano Name  : {data['name']}
+Advolcano Email : {data['email']}
 
-Retry Payment: https://advolcano.io/retry-payment?order_id={payment_details.get('razorpay_order_id', 'N/A')}
+Amount (USD)    : ${data['amount_usd']:.2f}
+Amount (INR)    : ₹{data['amount_inr']:.2f}
+Platform Fee    : ₹{data['commission']:.2f}
+TAX             : ₹{data['gst']:.2f}
+Total Amount    : ₹{data['total_amount']:.2f}
 
-If you continue to experience issues, please contact us at support@advolcano.io with your Order ID: {payment_details.get('razorpay_order_id', 'N/A')}
+--------------------------------------------------------
 
 Best regards,
-AdVolcano Team
-
-© 2025 AdVolcano. All rights reserved.
+Advolcano.io Payments Team
 """
 
+    try:
         message = Mail(
             from_email=FROM_EMAIL,
-            to_emails=order_details.get('email'),
+            to_emails=PAYMENT_INITIATED_RECIPIENTS,
             subject=subject,
-            plain_text_content=plain_text_body,
-            html_content=html_body
+            plain_text_content=email_body
         )
-        
-        response = sg.send(message)
-        logger.info(f"✅ User failure email sent to {order_details.get('email')} - Status Code: {response.status_code}")
-        return True
-        
+        deliver(message, category="payment_initiated")
+        logger.info("Admin email queued")
     except Exception as e:
-        logger.error(f"❌ Failed to send user failure email: {str(e)}")
-        return False
+        logger.error(f"Failed to send admin email: {e}")
 
 # === Serializers ===
 class PaymentSerializer(serializers.Serializer):
+    AMOUNT_FIELDS = ('amount_usd', 'amount_inr', 'commission', 'gst', 'total_amount')
+
     name = serializers.CharField(max_length=255)
     email = serializers.EmailField()
-    amount_usd = serializers.FloatField(min_value=0.01)
-    amount_inr = serializers.FloatField(min_value=0.01)
-    commission = serializers.FloatField(min_value=0.0)
-    gst = serializers.FloatField(min_value=0.0)
-    total_amount = serializers.FloatField(min_value=0.01)
+    # Signed quote from /api/quotes/batch; when present it supplies the amounts
+    quote_token = serializers.CharField(max_length=1000, required=False)
+    amount_usd = serializers.FloatField(min_value=0.01, required=False)
+    amount_inr = serializers.FloatField(min_value=0.01, required=False)
+    commission = serializers.FloatField(min_value=0.0, required=False)
+    gst = serializers.FloatField(min_value=0.0, required=False)
+    total_amount = serializers.FloatField(min_value=0.01, required=False)
+
+    def validate(self, attrs):
+        token = attrs.pop('quote_token', None)
+        if token:
+            try:
+                quote = verify_quote_token(token)
+            except QuoteTokenError as e:
+                raise serializers.ValidationError({"quote_token": [str(e)]})
+            # The signed breakdown wins over anything the client sent alongside it
+            attrs.update({field: quote[field] for field in self.AMOUNT_FIELDS})
+            attrs['quote_rate'] = quote['rate']
+            return attrs
+
+        if QUOTE_TOKEN_REQUIRED:
+            raise serializers.ValidationError({"quote_token": ["This field is required."]})
+        missing = [field for field in self.AMOUNT_FIELDS if field not in attrs]
+        if missing:
+            raise serializers.ValidationError({field: ["This field is required."] for field in missing})
+        return attrs
 
 class AdminSetupSerializer(serializers.Serializer):
     admin_name = serializers.CharField(max_length=255)
@@ -572,7 +400,7 @@ class AdminSetupAPIView(APIView):
         
         try:
             # Test SendGrid API key
-            test_sg = SendGridAPIClient(data['sendgrid_api_key'])
+            test_sg = get_transport(data['sendgrid_api_key'])
             test_message = Mail(
                 from_email=data['from_email'],
                 to_emails=data['admin_email'],
@@ -580,8 +408,12 @@ class AdminSetupAPIView(APIView):
                 plain_text_content="This is a test email to verify your SendGrid configuration is working correctly."
             )
             
-            # Send test email
-            response = test_sg.send(test_message)
+            # Send test email (raises SendGridError on a non-2xx status)
+            try:
+                response = test_sg.send(test_message)
+            finally:
+                if data['sendgrid_api_key'] != SENDGRID_API_KEY:
+                    test_sg.close()  # one-off transport for a key under test, not cached
             
             if response.status_code not in [200, 202]:
                 return Response({
@@ -602,7 +434,8 @@ class AdminSetupAPIView(APIView):
                 }
             }
             
-            test_order = test_client.order.create(data=test_order_data)
+            with upstream_call('razorpay', operation='order.create') as timeout:
+                test_order = test_client.order.create(data=test_order_data, timeout=timeout)
             
             if not test_order.get('id'):
                 return Response({
@@ -627,12 +460,18 @@ class AdminSetupAPIView(APIView):
                 "message": "All configurations are working correctly. You can now process payments."
             }, status=status.HTTP_200_OK)
             
-        except razorpay.errors.RazorpayError as e:
+        except RAZORPAY_ERRORS as e:
             logger.error(f"❌ Razorpay test failed: {str(e)}")
             return Response({
                 "error": "Razorpay configuration failed",
                 "details": str(e)
             }, status=status.HTTP_400_BAD_REQUEST)
+
+        except UpstreamTimeout as e:
+            return timeout_response(e)
+
+        except CircuitOpen as e:
+            return unavailable_response(e)
             
         except Exception as e:
             logger.error(f"❌ Admin setup failed: {str(e)}")
@@ -653,101 +492,420 @@ class AdminSetupAPIView(APIView):
             "status": "Configuration active"
         }, status=status.HTTP_200_OK)
 
+# === Local order store ===
+CENT = Decimal('0.01')
+
+
+def _money(value):
+    return Decimal(str(value)).quantize(CENT)
+
+
+def record_payment_order(order_id, data):
+    """
+    Save the order locally so verification can skip fetching its notes.
+    A failed write is logged only; verification then falls back to Razorpay.
+    """
+    try:
+        PaymentOrder.objects.create(
+            order_id=order_id,
+            name=data['name'],
+            email=data['email'],
+            amount_usd=_money(data['amount_usd']),
+            amount_inr=_money(data['amount_inr']),
+            commission=_money(data['commission']),
+            gst=_money(data['gst']),
+            total_amount=_money(data['total_amount']),
+            quote_rate=data.get('quote_rate'),
+        )
+    except Exception as e:
+        logger.error(f"❌ Could not store order locally: OrderID={order_id}: {str(e)}")
+
+
+def build_order_data(data):
+    """Razorpay order payload for a validated PaymentSerializer result"""
+    order_data = {
+        "amount": int(round(data['total_amount'] * 100)),  # Convert to paise
+        "currency": "INR",
+        "payment_capture": 1,
+        "notes": {
+            "name": data['name'],
+            "email": data['email'],
+            "amount_usd": str(data['amount_usd']),
+            "amount_inr": str(data['amount_inr']),
+            "commission": str(data['commission']),
+            "gst": str(data['gst']),
+            "total_amount": str(data['total_amount']),
+        }
+    }
+    if 'quote_rate' in data:
+        order_data["notes"]["quote_rate"] = str(data['quote_rate'])
+    return order_data
+
+
+def on_order_created(order_id, data, duration_ms=None):
+    """Store the order locally, log it and send (or digest) the Payment Initiated email"""
+    record_payment_order(order_id, data)
+
+    log_event(
+        'order.created', order_id=order_id,
+        amount_usd=data['amount_usd'], amount_inr=data['amount_inr'],
+        total_amount=data['total_amount'], duration_ms=duration_ms
+    )
+
+    logger.info(
+        f"Order created: name={data['name']} email={data['email']} "
+        f"USD={data['amount_usd']} INR={data['amount_inr']} "
+        f"Commission={data['commission']} GST={data['gst']} "
+        f"Total={data['total_amount']} OrderID={order_id}"
+    )
+
+    # === Send ONLY Admin Email (same template as before) ===
+    if PAYMENT_INITIATED_DIGEST:
+        # Coalesced into one summary email per window / batch
+        initiated_digest.add(
+            order_id, data['name'], data['email'],
+            data['amount_usd'], data['total_amount']
+        )
+    else:
+        send_payment_initiated_email(order_id, data)
+
+
 class CreatePaymentAPIView(APIView):
+    @with_deadline(CREATE_PAYMENT_DEADLINE, "create-payment")
     def post(self, request):
         serializer = PaymentSerializer(data=request.data)
         if not serializer.is_valid():
             return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
         data = serializer.validated_data
-        total_amount_paise = int(round(data['total_amount'] * 100))  # Convert to paise
 
+        # Double-clicked "Pay" / client retries: one order per Idempotency-Key
+        idempotency_key = request.headers.get('Idempotency-Key')
+        if idempotency_key:
+            return run_idempotent(
+                "create-payment", idempotency_key,
+                request_fingerprint(request.data),
+                lambda: self.create_order(data)
+            )
+        return self.create_order(data)
+
+    def create_order(self, data):
+        started = time.monotonic()
         try:
-            client = razorpay.Client(auth=(RAZORPAY_KEY_ID, RAZORPAY_KEY_SECRET))
+            client = get_razorpay_client(RAZORPAY_KEY_ID, RAZORPAY_KEY_SECRET)
+            order = client.order.create(data=build_order_data(data))
+            on_order_created(order.get('id'), data, duration_ms=ms_since(started))
 
-            order_data = {
-                "amount": total_amount_paise,
-                "currency": "INR",
-                "payment_capture": 1,
-                "notes": {
-                    "name": data['name'],
-                    "email": data['email'],
-                    "amount_usd": str(data['amount_usd']),
-                    "amount_inr": str(data['amount_inr']),
-                    "commission": str(data['commission']),
-                    "gst": str(data['gst']),
-                    "total_amount": str(data['total_amount']),
-                }
-            }
+            return Response({
+                "order_id": order.get("id"),
+                "razorpay_key": RAZORPAY_KEY_ID,
+                "amount_inr": round(float(data['total_amount']), 2),
+            }, status=status.HTTP_200_OK)
 
-            order = client.order.create(data=order_data)
+        except CircuitOpen as e:
+            log_event('order.failed', reason='circuit_open', duration_ms=ms_since(started))
+            return unavailable_response(e)
 
-            logging.info(
-                f"Order created: name={data['name']} email={data['email']} "
-                f"USD={data['amount_usd']} INR={data['amount_inr']} "
-                f"Commission={data['commission']} GST={data['gst']} "
-                f"Total={data['total_amount']} OrderID={order.get('id')}"
-            )
+        except UpstreamTimeout as e:
+            log_event('order.failed', reason='timeout', duration_ms=ms_since(started))
+            return timeout_response(e)
 
-            # === Send ONLY Admin Email (same template as before) ===
-            subject = f"Payment in advolcano.io (Order ID : {order.get('id')}) State: Payment Initiated"
+        except (*RAZORPAY_ERRORS, requests.RequestException) as e:
+            logger.error(f"Razorpay order creation failed: {e}")
+            log_event('order.failed', reason='upstream_error', error=str(e), duration_ms=ms_since(started))
+            return Response({"error": "Could not create order"}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
 
-            email_body = f"""
-Hello Admin,
+        except Exception as e:
+            logger.error(f"Unexpected error creating order: {e}")
+            log_event('order.failed', reason='error', error=str(e), duration_ms=ms_since(started))
+            return Response({"error": "Could not create order"}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
 
-A new payment order has been created in advolcano.io.
 
---------------------------------------------------------
-Order Details
---------------------------------------------------------
-Shop            : advolcano.io
-Order ID        : {order.get('id')}
-Amount          : INR {data['total_amount']:.2f}
+# === Verification follow-up: fetch order/payment details and notify ===
+upstream_executor = ThreadPoolExecutor(
+    max_workers=getattr(settings, 'RAZORPAY_POOL_SIZE', 10), thread_name_prefix="razorpay_fetch"
+)
 
---------------------------------------------------------
-Payment Summary
---------------------------------------------------------
-Advolcano Name  : {data['name']}
-Advolcano Email : {data['email']}
 
-Amount (USD)    : ${data['amount_usd']:.2f}
-Amount (INR)    : ₹{data['amount_inr']:.2f}
-Platform Fee    : ₹{data['commission']:.2f}
-TAX             : ₹{data['gst']:.2f}
-Total Amount    : ₹{data['total_amount']:.2f}
+class PaymentDetailsUnavailable(Exception):
+    """A verified payment has no local order and Razorpay's copy could not be fetched."""
 
---------------------------------------------------------
 
-Best regards,
-Advolcano.io Payments Team
-"""
+def details_unavailable_response():
+    return Response(
+        {"error": "Payment verified but order details are unavailable, please retry"},
+        status=status.HTTP_502_BAD_GATEWAY
+    )
 
-            try:
-                sg = SendGridAPIClient(SENDGRID_API_KEY)
-                message = Mail(
-                    from_email=FROM_EMAIL,
-                    to_emails=["finance@zimzel.net"],  
-                    subject=subject,
-                    plain_text_content=email_body
+
+def order_details_from_notes(order):
+    """Customer details from a Razorpay order's notes"""
+    notes = order.get('notes', {})
+    return {
+        'name': notes.get('name', 'N/A'),
+        'email': notes.get('email', 'N/A'),
+        'amount_usd': float(notes.get('amount_usd', 0)),
+        'amount_inr': float(notes.get('amount_inr', 0)),
+        'commission': float(notes.get('commission', 0)),
+        'gst': float(notes.get('gst', 0)),
+        'total_amount': float(notes.get('total_amount', 0))
+    }
+
+
+def fetch_verified_payment_details(client, razorpay_order_id, razorpay_payment_id):
+    """
+    Fetch order notes and payment timestamp from Razorpay for a verified payment.
+
+    The two fetches are independent, so they run concurrently: each call gets
+    RAZORPAY_FETCH_TIMEOUT and both share a RAZORPAY_FETCH_DEADLINE budget,
+    all capped by what is left of the request deadline. Returns
+    ``(order_details, payment_info)``; ``order_details`` is None if either
+    fetch failed.
+    """
+    # Worked out here: the executor threads do not see the request deadline
+    fetch_timeout = upstream_timeout('razorpay', RAZORPAY_FETCH_TIMEOUT)
+    fetch_deadline = upstream_timeout('razorpay', RAZORPAY_FETCH_DEADLINE)
+
+    order_future = upstream_executor.submit(
+        client.order.fetch, razorpay_order_id, timeout=fetch_timeout
+    )
+    payment_future = upstream_executor.submit(
+        client.payment.fetch, razorpay_payment_id, timeout=fetch_timeout
+    )
+    wait([order_future, payment_future], timeout=fetch_deadline)
+
+    admin_order_details = None
+    payment_fetched = False
+    payment_info = {
+        'razorpay_order_id': razorpay_order_id,
+        'razorpay_payment_id': razorpay_payment_id,
+        'timestamp': datetime.now().timestamp()
+    }
+
+    try:
+        admin_order_details = order_details_from_notes(order_future.result(timeout=0))
+        logger.info(f"📋 Order details retrieved: {admin_order_details}")
+
+    except FuturesTimeoutError:
+        order_future.cancel()
+        logger.error(f"❌ Order fetch exceeded {fetch_deadline:.2f}s deadline: OrderID={razorpay_order_id}")
+    except Exception as e:
+        logger.error(f"❌ Failed to fetch order details: {str(e)}")
+
+    try:
+        payment_details = payment_future.result(timeout=0)
+        payment_info['timestamp'] = payment_details.get('created_at', payment_info['timestamp'])
+        payment_fetched = True
+
+    except FuturesTimeoutError:
+        payment_future.cancel()
+        logger.error(f"❌ Payment fetch exceeded {fetch_deadline:.2f}s deadline: PaymentID={razorpay_payment_id}")
+    except Exception as e:
+        logger.error(f"❌ Failed to fetch payment details: {str(e)}")
+
+    return (admin_order_details if payment_fetched else None), payment_info
+
+
+def check_upstream_order(client, order):
+    """Optional consistency check: compare the local order with Razorpay's copy."""
+    try:
+        upstream = client.order.fetch(order.order_id, timeout=RAZORPAY_FETCH_TIMEOUT)
+    except Exception as e:
+        logger.warning(f"⚠️ Upstream order check failed: OrderID={order.order_id}: {str(e)}")
+        return False
+
+    if upstream.get('amount') != order.total_amount_paise:
+        logger.error(
+            f"❌ Order amount mismatch: OrderID={order.order_id} "
+            f"local={order.total_amount_paise} razorpay={upstream.get('amount')}"
+        )
+        return False
+    return True
+
+
+def claim_verified_payment(client, razorpay_order_id, razorpay_payment_id, prefetched=None):
+    """
+    Mark the order paid and return ``(claimed, order_details, payment_info)``.
+
+    Only the request whose conditional update moves the order out of "created"
+    gets ``claimed=True``, so concurrent or repeated verifications, from any
+    worker, send the success emails once. Details come from the local store
+    (one primary-key lookup); orders created before the store existed, or
+    whose write failed, are fetched from Razorpay (unless the caller already
+    did: ``prefetched``) and recorded here. If those fetches failed nothing
+    is recorded or claimed: ``PaymentDetailsUnavailable`` is raised and the
+    next verification tries again.
+    """
+    paid_at = timezone.now()
+    payment_info = {
+        'razorpay_order_id': razorpay_order_id,
+        'razorpay_payment_id': razorpay_payment_id,
+        'timestamp': paid_at.timestamp()
+    }
+
+    order = PaymentOrder.objects.filter(pk=razorpay_order_id).first()
+    if order is None:
+        logger.warning(f"⚠️ No local record for OrderID={razorpay_order_id}, fetching from Razorpay")
+        admin_order_details, payment_info = prefetched or fetch_verified_payment_details(
+            client, razorpay_order_id, razorpay_payment_id
+        )
+        if admin_order_details is None:
+            raise PaymentDetailsUnavailable(f"Order details unavailable for OrderID={razorpay_order_id}")
+        try:
+            with transaction.atomic():
+                PaymentOrder.objects.create(
+                    order_id=razorpay_order_id,
+                    **{field: admin_order_details[field] for field in ('name', 'email')},
+                    **{field: _money(admin_order_details[field]) for field in PaymentSerializer.AMOUNT_FIELDS},
+                    status=PaymentOrder.STATUS_PAID,
+                    payment_id=razorpay_payment_id,
+                    paid_at=paid_at
                 )
-                sg.send(message)
-                logging.info("Admin email sent successfully")
-            except Exception as e:
-                logging.error(f"Failed to send admin email: {e}")
+        except IntegrityError:
+            return False, admin_order_details, payment_info
+        return True, admin_order_details, payment_info
 
-            return Response({
-                "order_id": order.get("id"),
-                "razorpay_key": RAZORPAY_KEY_ID,
-                "amount_inr": round(data['total_amount'], 2),
-            }, status=status.HTTP_200_OK)
+    # A failed attempt can still be followed by a successful one on the same order
+    claimed = PaymentOrder.objects.filter(
+        pk=razorpay_order_id, status__in=[PaymentOrder.STATUS_CREATED, PaymentOrder.STATUS_FAILED]
+    ).update(
+        status=PaymentOrder.STATUS_PAID,
+        payment_id=razorpay_payment_id,
+        paid_at=paid_at
+    )
 
-        except razorpay.errors.RazorpayError as e:
-            logging.error(f"Razorpay order creation failed: {e}")
-            return Response({"error": "Could not create order"}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+    if claimed and PAYMENT_VERIFY_UPSTREAM_CHECK:
+        upstream_executor.submit(check_upstream_order, client, order)
+
+    return bool(claimed), order.notification_details(), payment_info
+
+
+def complete_verified_payment(razorpay_order_id, razorpay_payment_id, prefetched=None):
+    """
+    Mark a verified payment paid and send the admin and user success emails,
+    once per order
+    """
+    client = get_razorpay_client(RAZORPAY_KEY_ID, RAZORPAY_KEY_SECRET)
+    claimed, admin_order_details, payment_info = claim_verified_payment(
+        client, razorpay_order_id, razorpay_payment_id, prefetched
+    )
+
+    if not claimed:
+        # Another verification already handled this order: report its outcome
+        order = PaymentOrder.objects.filter(pk=razorpay_order_id).first()
+        logger.info(f"🔁 Payment already verified, emails not resent: OrderID={razorpay_order_id}")
+        return {
+            "admin_notified": order.admin_notified if order else None,
+            "user_notified": order.user_notified if order else None,
+            "already_verified": True,
+        }
+
+    # === SEND ADMIN SUCCESS EMAIL ===
+    admin_email_sent = send_admin_notification(
+        admin_order_details,
+        payment_info,
+        email_type="payment_verified"
+    )
+
+    # === SEND USER SUCCESS EMAIL ===
+    user_email_sent = send_user_success_email(admin_order_details, payment_info)
+
+    if admin_email_sent:
+        logger.info(f"📧 ✅ Admin success email sent for OrderID={razorpay_order_id}")
+    else:
+        logger.error(f"📧 ❌ Admin success email failed for OrderID={razorpay_order_id}")
+
+    if user_email_sent:
+        logger.info(f"📧 ✅ User success email sent for OrderID={razorpay_order_id}")
+    else:
+        logger.error(f"📧 ❌ User success email failed for OrderID={razorpay_order_id}")
+
+    PaymentOrder.objects.filter(pk=razorpay_order_id).update(
+        admin_notified=admin_email_sent,
+        user_notified=user_email_sent
+    )
+
+    return {
+        "admin_notified": admin_email_sent,
+        "user_notified": user_email_sent,
+    }
+
+
+# === Repeat verify calls: memoized per (order_id, payment_id) ===
+verification_results = LRUCache(maxsize=VERIFY_RESULT_CACHE_SIZE, ttl=VERIFY_STATUS_TTL)
+
+
+# === Fast-acknowledge mode: follow-up runs in the background ===
+verification_executor = ThreadPoolExecutor(
+    max_workers=VERIFY_FOLLOWUP_WORKERS, thread_name_prefix="payment_verify"
+)
+
+
+def set_verification_status(handle, state, **details):
+    PaymentOrder.objects.filter(verify_handle=handle).update(verify_status={"state": state, **details})
+
+
+def get_verification_status(handle):
+    return PaymentOrder.objects.filter(verify_handle=handle).values_list('verify_status', flat=True).first()
+
+
+def start_verification_followup(razorpay_order_id, razorpay_payment_id):
+    """
+    Record a fast-acknowledged verification on its order and queue the
+    follow-up; returns the status handle. Repeat verifications of an order
+    get the handle already recorded, unless its follow-up failed. Orders with
+    no local record return None: the caller verifies them in full.
+    """
+    handle = uuid.uuid4().hex
+    claimed = PaymentOrder.objects.filter(
+        Q(verify_handle__isnull=True) | Q(verify_status__state="failed"), pk=razorpay_order_id
+    ).update(
+        verify_handle=handle,
+        verify_status={"state": "pending", "order_id": razorpay_order_id, "payment_id": razorpay_payment_id}
+    )
+    if not claimed:
+        return PaymentOrder.objects.filter(pk=razorpay_order_id).values_list('verify_handle', flat=True).first()
+    verification_executor.submit(run_verification_followup, handle, razorpay_order_id, razorpay_payment_id)
+    logger.info(f"⏩ Verification follow-up queued: OrderID={razorpay_order_id}, Handle={handle}")
+    return handle
+
+
+def run_verification_followup(handle, razorpay_order_id, razorpay_payment_id):
+    """Background stage for fast-acknowledged verifications"""
+    started = time.monotonic()
+    try:
+        with deadline(VERIFY_PAYMENT_DEADLINE, "verify-payment follow-up"):
+            outcome = complete_verified_payment(razorpay_order_id, razorpay_payment_id)
+        set_verification_status(
+            handle, "completed",
+            order_id=razorpay_order_id,
+            payment_id=razorpay_payment_id,
+            **outcome
+        )
+        task_duration.observe(time.monotonic() - started, 'payment.verify_followup', 'completed')
+    except Exception as e:
+        task_duration.observe(time.monotonic() - started, 'payment.verify_followup', 'failed')
+        logger.error(f"❌ Verification follow-up failed for OrderID={razorpay_order_id}: {str(e)}")
+        set_verification_status(
+            handle, "failed",
+            order_id=razorpay_order_id,
+            payment_id=razorpay_payment_id,
+            error=str(e)
+        )
+
+
+def log_payment_failure(razorpay_order_id, razorpay_payment_id, reason, started):
+    """payment.verify_failed event for the sync and async verify views"""
+    log_event(
+        'payment.verify_failed', order_id=razorpay_order_id, payment_id=razorpay_payment_id,
+        reason=reason, duration_ms=ms_since(started)
+    )
 
 
 class VerifyPaymentAPIView(APIView):
+    @with_deadline(VERIFY_PAYMENT_DEADLINE, "verify-payment")
     def post(self, request):
+        started = time.monotonic()
         data = request.data
 
         razorpay_order_id = data.get('razorpay_order_id')
@@ -762,8 +920,8 @@ class VerifyPaymentAPIView(APIView):
             )
 
         try:
-            # Initialize Razorpay client
-            client = razorpay.Client(auth=(RAZORPAY_KEY_ID, RAZORPAY_KEY_SECRET))
+            # Shared Razorpay client
+            client = get_razorpay_client(RAZORPAY_KEY_ID, RAZORPAY_KEY_SECRET)
 
             # Verify Razorpay signature
             params_dict = {
@@ -773,93 +931,130 @@ class VerifyPaymentAPIView(APIView):
             }
 
             client.utility.verify_payment_signature(params_dict)
-            logger.info(f"✅ Payment verified: OrderID={razorpay_order_id}, PaymentID={razorpay_payment_id}")
 
-            # === FETCH ORDER DETAILS FROM RAZORPAY ===
-            try:
-                order_details = client.order.fetch(razorpay_order_id)
-                payment_details = client.payment.fetch(razorpay_payment_id)
-                
-                # Extract customer details from order notes
-                notes = order_details.get('notes', {})
-                
-                admin_order_details = {
-                    'name': notes.get('name', 'N/A'),
-                    'email': notes.get('email', 'N/A'),
-                    'amount_usd': float(notes.get('amount_usd', 0)),
-                    'amount_inr': float(notes.get('amount_inr', 0)),
-                    'commission': float(notes.get('commission', 0)),
-                    'gst': float(notes.get('gst', 0)),
-                    'total_amount': float(notes.get('total_amount', 0))
-                }
-                
-                payment_info = {
-                    'razorpay_order_id': razorpay_order_id,
-                    'razorpay_payment_id': razorpay_payment_id,
-                    'timestamp': payment_details.get('created_at', datetime.now().timestamp())
-                }
-                
-                logger.info(f"📋 Order details retrieved: {admin_order_details}")
-                
-            except Exception as e:
-                logger.error(f"❌ Failed to fetch order/payment details: {str(e)}")
-                # Fallback details if fetch fails
-                admin_order_details = {
-                    'name': 'N/A',
-                    'email': 'N/A',
-                    'amount_usd': 0,
-                    'amount_inr': 0,
-                    'commission': 0,
-                    'gst': 0,
-                    'total_amount': 0
-                }
-                payment_info = {
-                    'razorpay_order_id': razorpay_order_id,
-                    'razorpay_payment_id': razorpay_payment_id,
-                    'timestamp': datetime.now().timestamp()
-                }
+            # Refreshes and frontend retries: answer from memory once verified
+            result_key = (razorpay_order_id, razorpay_payment_id)
+            cached = verification_results.get(result_key)
+            if cached is not None:
+                return Response(cached, status=status.HTTP_200_OK)
 
-            # === SEND ADMIN SUCCESS EMAIL ===
-            admin_email_sent = send_admin_notification(
-                admin_order_details, 
-                payment_info, 
-                email_type="payment_verified"
-            )
-
-            # === SEND USER SUCCESS EMAIL ===
-            user_email_sent = send_user_success_email(admin_order_details, payment_info)
-
-            if admin_email_sent:
-                logger.info(f"📧 ✅ Admin success email sent for OrderID={razorpay_order_id}")
-            else:
-                logger.error(f"📧 ❌ Admin success email failed for OrderID={razorpay_order_id}")
+            logger.info(f"✅ Payment verified: OrderID={razorpay_order_id}, PaymentID={razorpay_payment_id}")
 
-            if user_email_sent:
-                logger.info(f"📧 ✅ User success email sent for OrderID={razorpay_order_id}")
-            else:
-                logger.error(f"📧 ❌ User success email failed for OrderID={razorpay_order_id}")
+            # === Acknowledge now, fetch + notify in the background ===
+            handle = None
+            if PAYMENT_VERIFY_FAST_ACK:
+                handle = start_verification_followup(razorpay_order_id, razorpay_payment_id)
+            if handle is not None:
+                log_event(
+                    'payment.verified', order_id=razorpay_order_id, payment_id=razorpay_payment_id,
+                    fast_ack=True, duration_ms=ms_since(started)
+                )
 
-            return Response(
-                {
+                response_data = {
                     "status": "Payment verified successfully",
-                    "admin_notified": admin_email_sent,
-                    "user_notified": user_email_sent,
+                    "verification_handle": handle,
+                    "status_url": reverse('verify-payment-status', args=[handle]),
                     "order_id": razorpay_order_id,
                     "payment_id": razorpay_payment_id
-                },
-                status=status.HTTP_200_OK
+                }
+                verification_results.set(result_key, response_data)
+                return Response(response_data, status=status.HTTP_200_OK)
+
+            outcome = complete_verified_payment(razorpay_order_id, razorpay_payment_id)
+            log_event(
+                'payment.verified', order_id=razorpay_order_id, payment_id=razorpay_payment_id,
+                fast_ack=False, duration_ms=ms_since(started), **outcome
             )
 
+            response_data = {
+                "status": "Payment verified successfully",
+                **outcome,
+                "order_id": razorpay_order_id,
+                "payment_id": razorpay_payment_id
+            }
+            if outcome["admin_notified"] is not None:
+                # Not while a concurrent verification is still sending its emails
+                verification_results.set(result_key, response_data)
+            return Response(response_data, status=status.HTTP_200_OK)
+
         except razorpay.errors.SignatureVerificationError as e:
             logger.error(f"❌ Signature verification failed: {str(e)}")
+            log_payment_failure(razorpay_order_id, razorpay_payment_id, 'signature', started)
             return Response(
                 {"error": "Invalid payment signature"},
                 status=status.HTTP_400_BAD_REQUEST
             )
 
+        except UpstreamTimeout as e:
+            log_payment_failure(razorpay_order_id, razorpay_payment_id, 'timeout', started)
+            return timeout_response(e)
+
+        except PaymentDetailsUnavailable as e:
+            logger.error(f"❌ {str(e)}, payment left for the next verification")
+            log_payment_failure(razorpay_order_id, razorpay_payment_id, 'upstream_error', started)
+            return details_unavailable_response()
+
         except Exception as e:
             logger.error(f"❌ Unexpected error during verification: {str(e)}")
+            log_payment_failure(razorpay_order_id, razorpay_payment_id, 'error', started)
             return Response(
                 {"error": "Internal server error"},
                 status=status.HTTP_500_INTERNAL_SERVER_ERROR
-            )
\ No newline at end of file
+            )
+
+
+class VerificationStatusAPIView(APIView):
+    """
+    Status of the background follow-up for a fast-acknowledged verification
+    """
+    def get(self, request, handle):
+        verification = get_verification_status(handle)
+        if verification is None:
+            return Response(
+                {"error": "Unknown verification handle"},
+                status=status.HTTP_404_NOT_FOUND
+            )
+        return Response({"verification_handle": handle, **verification}, status=status.HTTP_200_OK)
+
+
+# === Razorpay webhooks: store now, apply in batches (manage.py process_webhooks) ===
+class RazorpayWebhookAPIView(APIView):
+    """
+    Receives payment.captured, payment.failed and order.paid events. The raw
+    event is stored after a signature check and applied by process_webhooks,
+    so Razorpay gets its 200 without waiting on emails or lookups.
+    """
+    authentication_classes = []
+    permission_classes = []
+
+    def post(self, request):
+        if not RAZORPAY_WEBHOOK_SECRET:
+            logger.error("❌ Webhook received but RAZORPAY_WEBHOOK_SECRET is not configured")
+            return Response({"error": "Webhooks not configured"}, status=status.HTTP_503_SERVICE_UNAVAILABLE)
+
+        body = request.body.decode('utf-8')
+        signature = request.headers.get('X-Razorpay-Signature', '')
+        try:
+            client = get_razorpay_client(RAZORPAY_KEY_ID, RAZORPAY_KEY_SECRET)
+            client.utility.verify_webhook_signature(body, signature, RAZORPAY_WEBHOOK_SECRET)
+            payload = json.loads(body)
+        except razorpay.errors.SignatureVerificationError:
+            logger.warning("⚠️ Webhook signature verification failed")
+            return Response({"error": "Invalid webhook signature"}, status=status.HTTP_400_BAD_REQUEST)
+        except ValueError:
+            return Response({"error": "Invalid JSON"}, status=status.HTTP_400_BAD_REQUEST)
+
+        # Razorpay repeats the same event id on redelivery
+        event_id = request.headers.get('X-Razorpay-Event-Id') or hashlib.sha256(body.encode()).hexdigest()
+        try:
+            with transaction.atomic():
+                WebhookEvent.objects.create(
+                    event_id=event_id,
+                    event=str(payload.get('event', ''))[:50],
+                    payload=payload
+                )
+            logger.info(f"📥 Webhook queued: {payload.get('event')} EventID={event_id}")
+        except IntegrityError:
+            logger.info(f"🔁 Duplicate webhook ignored: EventID={event_id}")
+
+        return Response({"status": "received"}, status=status.HTTP_200_OK)
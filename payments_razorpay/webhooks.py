@@ -0,0 +1,183 @@
+import logging
+from datetime import timedelta
+
+from django.conf import settings
+from django.utils import timezone
+
+from .models import PaymentOrder, WebhookEvent
+from .views import (
+    complete_verified_payment,
+    send_admin_notification,
+    send_user_failure_email,
+)
+
+logger = logging.getLogger(__name__)
+
+# === Webhook processing configuration ===
+WEBHOOK_MAX_ATTEMPTS = getattr(settings, 'WEBHOOK_MAX_ATTEMPTS', 5)
+WEBHOOK_CLAIM_LEASE = getattr(settings, 'WEBHOOK_CLAIM_LEASE', 10 * 60)
+
+SUCCESS_EVENTS = ('payment.captured', 'order.paid')
+FAILURE_EVENTS = ('payment.failed',)
+
+
+def _entity(payload, name):
+    return (payload.get('payload', {}).get(name) or {}).get('entity') or {}
+
+
+def release_stale_claims(lease=WEBHOOK_CLAIM_LEASE):
+    """Return events stuck in 'processing' (worker died mid-batch) to the pending pool."""
+    cutoff = timezone.now() - timedelta(seconds=lease)
+    released = WebhookEvent.objects.filter(
+        status=WebhookEvent.STATUS_PROCESSING, claimed_at__lt=cutoff
+    ).update(status=WebhookEvent.STATUS_PENDING, claimed_at=None)
+    if released:
+        logger.warning(f"Released {released} stale webhook claims")
+    return released
+
+
+def claim_batch(batch_size=100):
+    """Claim up to ``batch_size`` pending events, oldest first, one conditional update each."""
+    now = timezone.now()
+    candidate_ids = list(
+        WebhookEvent.objects.filter(status=WebhookEvent.STATUS_PENDING)
+        .order_by('received_at').values_list('event_id', flat=True)[:batch_size]
+    )
+    claimed_ids = [
+        event_id for event_id in candidate_ids
+        if WebhookEvent.objects.filter(
+            event_id=event_id, status=WebhookEvent.STATUS_PENDING
+        ).update(status=WebhookEvent.STATUS_PROCESSING, claimed_at=now)
+    ]
+    return list(WebhookEvent.objects.filter(event_id__in=claimed_ids).order_by('received_at'))
+
+
+def apply_payment_success(payload):
+    """
+    payment.captured / order.paid: same path as a browser verification, so the
+    PaymentOrder guard keeps the success emails to one set per order.
+    """
+    payment = _entity(payload, 'payment')
+    order_id = payment.get('order_id') or _entity(payload, 'order').get('id')
+    payment_id = payment.get('id')
+    if not order_id or not payment_id:
+        return False
+
+    outcome = complete_verified_payment(order_id, payment_id)
+    if not outcome.get('already_verified'):
+        logger.info(f"✅ Payment confirmed by webhook: OrderID={order_id}, PaymentID={payment_id}")
+    return True
+
+
+def _failure_already_notified(order_id):
+    """Whether a payment.failed for this order (with no local row) has already been applied."""
+    return WebhookEvent.objects.filter(
+        event__in=FAILURE_EVENTS, status=WebhookEvent.STATUS_PROCESSED,
+        payload__payload__payment__entity__order_id=order_id,
+    ).exists()
+
+
+def apply_payment_failure(payload):
+    """
+    payment.failed: mark the order failed and send the failure emails, once
+    per order. Razorpay redelivers events and a customer can fail several
+    attempts on one order; only the move out of 'created' notifies, so an
+    order already failed (or paid) is left alone.
+    """
+    payment = _entity(payload, 'payment')
+    order_id = payment.get('order_id')
+    payment_id = payment.get('id')
+    if not order_id:
+        return False
+
+    order = PaymentOrder.objects.filter(pk=order_id).first()
+    if order is not None:
+        updated = PaymentOrder.objects.filter(
+            pk=order_id, status=PaymentOrder.STATUS_CREATED
+        ).update(status=PaymentOrder.STATUS_FAILED, payment_id=payment_id or '')
+        if not updated:
+            logger.info(f"Ignoring payment.failed for already failed or paid OrderID={order_id}")
+            return False
+        order_details = order.notification_details()
+    elif _failure_already_notified(order_id):
+        logger.info(f"Ignoring repeated payment.failed for unknown OrderID={order_id}")
+        return False
+    else:
+        notes = payment.get('notes') or {}
+        total_amount = (payment.get('amount') or 0) / 100
+        order_details = {
+            'name': notes.get('name', 'N/A'),
+            'email': payment.get('email') or notes.get('email', 'N/A'),
+            'amount_usd': float(notes.get('amount_usd', 0)),
+            'amount_inr': float(notes.get('amount_inr', 0)),
+            'commission': float(notes.get('commission', 0)),
+            'gst': float(notes.get('gst', 0)),
+            'total_amount': float(notes.get('total_amount', total_amount)),
+        }
+
+    payment_info = {
+        'razorpay_order_id': order_id,
+        'razorpay_payment_id': payment_id,
+        'timestamp': payment.get('created_at') or timezone.now().timestamp(),
+        'failure_reason': payment.get('error_description') or 'Payment failed',
+    }
+
+    send_admin_notification(order_details, payment_info, email_type="payment_failed")
+    if order_details['email'] != 'N/A':
+        send_user_failure_email(order_details, payment_info)
+    logger.info(f"❌ Payment failure recorded by webhook: OrderID={order_id}, PaymentID={payment_id}")
+    return True
+
+
+def process_batch(batch_size=100, max_attempts=WEBHOOK_MAX_ATTEMPTS):
+    """
+    Claim and apply one batch of events. Returns ``(processed, failed)``.
+
+    payment.captured and order.paid usually arrive together for one payment;
+    only the first of them in a batch is applied. Likewise only the first
+    payment.failed per order in a batch.
+    """
+    processed = failed = 0
+    confirmed_orders = set()
+    failed_orders = set()
+
+    for webhook in claim_batch(batch_size):
+        webhook.attempts += 1
+        payload = webhook.payload
+        try:
+            if webhook.event in SUCCESS_EVENTS:
+                order_id = _entity(payload, 'payment').get('order_id') or _entity(payload, 'order').get('id')
+                if order_id in confirmed_orders:
+                    applied = False
+                else:
+                    applied = apply_payment_success(payload)
+                    confirmed_orders.add(order_id)
+            elif webhook.event in FAILURE_EVENTS:
+                order_id = _entity(payload, 'payment').get('order_id')
+                if order_id in failed_orders:
+                    applied = False
+                else:
+                    applied = apply_payment_failure(payload)
+                    failed_orders.add(order_id)
+            else:
+                applied = False
+        except Exception as e:
+            webhook.last_error = f"{type(e).__name__}: {e}"[:2000]
+            webhook.status = (
+                WebhookEvent.STATUS_FAILED if webhook.attempts >= max_attempts
+                else WebhookEvent.STATUS_PENDING
+            )
+            webhook.claimed_at = None
+            webhook.save(update_fields=['attempts', 'status', 'claimed_at', 'last_error'])
+            logger.error(f"❌ Webhook {webhook.event_id} ({webhook.event}) attempt {webhook.attempts} failed: {e}")
+            failed += 1
+            continue
+
+        webhook.status = WebhookEvent.STATUS_PROCESSED if applied else WebhookEvent.STATUS_IGNORED
+        webhook.processed_at = timezone.now()
+        webhook.claimed_at = None
+        webhook.last_error = ''
+        webhook.save(update_fields=['attempts', 'status', 'processed_at', 'claimed_at', 'last_error'])
+        processed += 1
+
+    return processed, failed
@@ -0,0 +1,84 @@
+import json
+import random
+import time
+from decimal import Decimal, ROUND_HALF_UP
+
+from django.core.management.base import BaseCommand
+from django.test import Client
+
+from usd.quotes import GST_RATE, PLATFORM_FEE_RATE, quote_batch
+from usd.rates import ExchangeRate, rate_service
+
+
+class Command(BaseCommand):
+    help = 'Benchmark batch quoting throughput (quote_batch, an unchecked per-item Decimal loop, and the HTTP endpoint)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--size', type=int, default=10000, help='Items per batch')
+        parser.add_argument('--repeat', type=int, default=20, help='Batches per measurement')
+        parser.add_argument('--rate', default='87.75', help='USD->INR rate to price with')
+        parser.add_argument('--seed', type=int, default=1)
+
+    def handle(self, *args, **options):
+        size, repeat = options['size'], options['repeat']
+        exchange_rate = ExchangeRate(Decimal(options['rate']), time.time(), 'bench')
+        rng = random.Random(options['seed'])
+        amounts = [f"{rng.randint(1, 5_000_000) / 100:.2f}" for _ in range(size)]
+
+        self.stdout.write(f'Batch size {size}, {repeat} batches, rate {exchange_rate.rate}')
+
+        # As used by the endpoint: parse, check, price, format and totals
+        elapsed = self._time(repeat, lambda: quote_batch(amounts, exchange_rate))
+        self._report('quote_batch', size, repeat, elapsed)
+
+        # Bare per-item Decimal loop: no input checks, no totals
+        elapsed = self._time(repeat, lambda: self._decimal_loop(amounts, exchange_rate.rate))
+        self._report('per-item Decimal baseline', size, repeat, elapsed)
+
+        # Same numbers either way
+        if quote_batch(amounts, exchange_rate)[1] != self._decimal_loop(amounts, exchange_rate.rate):
+            self.stdout.write(self.style.ERROR('Mismatch between quote_batch and per-item results!'))
+            return
+
+        # Full endpoint, rate served from the warm cache
+        rate_service._memory = exchange_rate
+        client = Client()
+        body = json.dumps({'amounts_usd': amounts})
+        http_repeat = max(1, repeat // 4)
+
+        def post():
+            response = client.post('/api/quotes/batch', body, content_type='application/json')
+            assert response.status_code == 200, response.content[:200]
+
+        elapsed = self._time(http_repeat, post)
+        self._report('POST /api/quotes/batch', size, http_repeat, elapsed)
+        self.stdout.write(self.style.SUCCESS('Results match the Decimal baseline'))
+
+    def _time(self, repeat, func):
+        func()  # warm-up
+        started = time.perf_counter()
+        for _ in range(repeat):
+            func()
+        return time.perf_counter() - started
+
+    def _report(self, label, size, repeat, elapsed):
+        per_batch_ms = elapsed / repeat * 1000
+        items_per_sec = size * repeat / elapsed
+        self.stdout.write(f'  {label:<40} {per_batch_ms:9.2f} ms/batch  {items_per_sec:14,.0f} items/s')
+
+    def _decimal_loop(self, amounts, rate):
+        cent = Decimal('0.01')
+        rows = []
+        for amount in amounts:
+            usd = Decimal(amount)
+            inr = (usd * rate).quantize(cent, ROUND_HALF_UP)
+            commission = (inr * PLATFORM_FEE_RATE).quantize(cent, ROUND_HALF_UP)
+            gst = (commission * GST_RATE).quantize(cent, ROUND_HALF_UP)
+            rows.append({
+                'amount_usd': str(usd.quantize(cent)),
+                'amount_inr': str(inr),
+                'commission': str(commission),
+                'gst': str(gst),
+                'total_amount': str(inr + commission + gst),
+            })
+        return rows
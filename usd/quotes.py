@@ -0,0 +1,103 @@
+from decimal import Decimal, InvalidOperation, ROUND_HALF_UP
+
+from django.conf import settings
+
+from .rates import get_usd_inr_rate
+
+# === Pricing configuration ===
+PLATFORM_FEE_RATE = Decimal(str(getattr(settings, 'PLATFORM_FEE_RATE', '0.03')))
+GST_RATE = Decimal(str(getattr(settings, 'GST_RATE', '0.18')))
+MAX_QUOTE_BATCH = getattr(settings, 'MAX_QUOTE_BATCH', 20000)
+# Largest single amount; keeps every step of a quote well inside Decimal's 28 digits
+MAX_QUOTE_AMOUNT_USD = Decimal(str(getattr(settings, 'MAX_QUOTE_AMOUNT_USD', '1000000')))
+
+CENT = Decimal('0.01')
+QUOTE_FIELDS = ('amount_usd', 'amount_inr', 'commission', 'gst', 'total_amount')
+
+
+class QuoteError(ValueError):
+    """
+    An amount in a quote request is not a positive USD value with at most 2
+    decimals, up to MAX_QUOTE_AMOUNT_USD.
+    """
+
+
+def _check_amount(index, amount):
+    if isinstance(amount, bool):
+        raise QuoteError(f"amounts_usd[{index}]: not a number")
+    try:
+        value = Decimal(str(amount))
+    except (InvalidOperation, ValueError):
+        raise QuoteError(f"amounts_usd[{index}]: not a number")
+    if not value.is_finite() or value <= 0:
+        raise QuoteError(f"amounts_usd[{index}]: must be greater than zero")
+    if value > MAX_QUOTE_AMOUNT_USD:
+        raise QuoteError(f"amounts_usd[{index}]: must be at most {MAX_QUOTE_AMOUNT_USD}")
+    try:
+        exact = value.quantize(CENT)
+    except InvalidOperation:
+        raise QuoteError(f"amounts_usd[{index}]: out of range")
+    if value != exact:
+        raise QuoteError(f"amounts_usd[{index}]: at most 2 decimal places")
+
+
+def quote_batch(amounts, exchange_rate=None):
+    """
+    Price USD amounts (numbers or numeric strings) with one rate lookup per batch.
+
+    One pass per item parses, checks, prices and formats it, rounding each
+    step half-up to the paisa, so results are decimal-exact:
+
+        amount_inr   = usd * rate
+        commission   = amount_inr * PLATFORM_FEE_RATE
+        gst          = commission * GST_RATE
+        total_amount = amount_inr + commission + gst
+
+    Floats go through ``str`` so 10.1 means 10.10 rather than its binary value.
+    Anything that is not a positive amount with at most 2 decimals, up to
+    MAX_QUOTE_AMOUNT_USD, raises QuoteError with the offending index.
+
+    Returns ``(exchange_rate, quotes, totals)``: one row of 2-decimal strings
+    per amount, field names as in PaymentSerializer, and the column totals.
+    """
+    if exchange_rate is None:
+        exchange_rate = get_usd_inr_rate()
+    rate = exchange_rate.rate
+
+    quotes = []
+    append = quotes.append
+    total_usd = total_inr = total_commission = total_gst = Decimal('0.00')
+    for index, amount in enumerate(amounts):
+        try:
+            value = Decimal(str(amount))
+            usd = value.quantize(CENT)
+            valid = usd == value and 0 < value <= MAX_QUOTE_AMOUNT_USD and not isinstance(amount, bool)
+        except (InvalidOperation, ValueError):
+            valid = False
+        if not valid:
+            # Slow path only to name the problem
+            _check_amount(index, amount)
+
+        amount_inr = (usd * rate).quantize(CENT, ROUND_HALF_UP)
+        commission = (amount_inr * PLATFORM_FEE_RATE).quantize(CENT, ROUND_HALF_UP)
+        gst = (commission * GST_RATE).quantize(CENT, ROUND_HALF_UP)
+        append({
+            'amount_usd': str(usd),
+            'amount_inr': str(amount_inr),
+            'commission': str(commission),
+            'gst': str(gst),
+            'total_amount': str(amount_inr + commission + gst),
+        })
+        total_usd += usd
+        total_inr += amount_inr
+        total_commission += commission
+        total_gst += gst
+
+    totals = {
+        'amount_usd': str(total_usd),
+        'amount_inr': str(total_inr),
+        'commission': str(total_commission),
+        'gst': str(total_gst),
+        'total_amount': str(total_inr + total_commission + total_gst),
+    }
+    return exchange_rate, quotes, totals
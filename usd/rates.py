@@ -0,0 +1,242 @@
+import json
+import logging
+import os
+import tempfile
+import threading
+import time
+from dataclasses import dataclass
+from decimal import Decimal, InvalidOperation
+
+from requests import Session
+from django.conf import settings
+
+from payments.deadlines import upstream_call
+
+logger = logging.getLogger(__name__)
+
+# === FX configuration ===
+FX_PROVIDER = getattr(settings, 'FX_PROVIDER', 'fixer')
+FX_RATE_TTL = getattr(settings, 'FX_RATE_TTL', 60 * 60)
+FX_MAX_STALE = getattr(settings, 'FX_MAX_STALE', 24 * 60 * 60)
+FX_CACHE_FILE = getattr(settings, 'FX_CACHE_FILE', os.path.join(tempfile.gettempdir(), 'advolcano_fx_rate.json'))
+FX_FAKE_RATE = getattr(settings, 'FX_FAKE_RATE', '87.75')
+FX_FIXER_URL = getattr(settings, 'FX_FIXER_URL', 'https://data.fixer.io/api/latest')
+FX_FETCH_TIMEOUT = getattr(settings, 'FX_FETCH_TIMEOUT', 5)
+
+RATE_PLACES = Decimal('0.000001')
+REFRESH_LEASE_SECONDS = 60
+
+
+class RateUnavailable(Exception):
+    """No usable USD->INR rate: the provider failed and nothing fresh enough is cached."""
+
+
+@dataclass(frozen=True)
+class ExchangeRate:
+    rate: Decimal
+    fetched_at: float
+    source: str
+
+    def age(self, now=None):
+        return (now or time.time()) - self.fetched_at
+
+    def as_dict(self):
+        return {'rate': str(self.rate), 'fetched_at': self.fetched_at, 'source': self.source}
+
+    @classmethod
+    def from_dict(cls, data):
+        return cls(Decimal(data['rate']), float(data['fetched_at']), data['source'])
+
+
+# === Providers ===
+class FixerRateProvider:
+    """
+    USD->INR from Fixer's ``latest`` endpoint.
+
+    Fixer's base currency is EUR on most plans, so both legs are requested and
+    the cross rate INR/USD is computed here.
+    """
+
+    name = 'fixer'
+
+    def __init__(self, api_key, url=FX_FIXER_URL, timeout=FX_FETCH_TIMEOUT):
+        self.api_key = api_key
+        self.url = url
+        self.timeout = timeout
+        self.session = Session()
+
+    def fetch(self):
+        if not self.api_key:
+            raise RateUnavailable("FIXER_API_KEY is not configured")
+        with upstream_call('fixer', self.timeout, 'latest') as timeout:
+            response = self.session.get(
+                self.url,
+                params={'access_key': self.api_key, 'symbols': 'USD,INR'},
+                timeout=timeout,
+            )
+        response.raise_for_status()
+        data = response.json()
+        if not data.get('success', False):
+            raise RateUnavailable(f"Fixer error: {data.get('error')}")
+        try:
+            rates = data['rates']
+            rate = Decimal(str(rates['INR'])) / Decimal(str(rates['USD']))
+        except (KeyError, InvalidOperation, ZeroDivisionError) as e:
+            raise RateUnavailable(f"Unexpected Fixer payload: {e}")
+        return rate.quantize(RATE_PLACES)
+
+
+class FakeRateProvider:
+    """Fixed rate for offline development and tests (FX_PROVIDER = "fake")."""
+
+    name = 'fake'
+
+    def __init__(self, rate=FX_FAKE_RATE):
+        self.rate = Decimal(str(rate)).quantize(RATE_PLACES)
+        self.calls = 0
+
+    def fetch(self):
+        self.calls += 1
+        return self.rate
+
+
+# === Service ===
+class ExchangeRateService:
+    """
+    Two-level USD->INR cache: process memory in front of a JSON file shared by
+    every worker on the host.
+
+    - fresh (younger than ``ttl``): served from memory, no I/O
+    - stale: served immediately while a single background refresh runs; the
+      shared file plus a lock-file lease keep workers from all hitting Fixer.
+      Until the lease runs out the stale value is served from memory, without
+      looking at the file again
+    - older than ``max_stale``, or nothing cached: refreshed synchronously
+    """
+
+    def __init__(self, provider, ttl=FX_RATE_TTL, max_stale=FX_MAX_STALE, cache_file=FX_CACHE_FILE,
+                 lease_seconds=REFRESH_LEASE_SECONDS):
+        self.provider = provider
+        self.ttl = ttl
+        self.max_stale = max_stale
+        self.cache_file = cache_file
+        self.lease_seconds = lease_seconds
+        self._memory = None
+        self._lock = threading.Lock()
+        self._refreshing = False
+        self._recheck_at = 0.0  # monotonic time before which a stale value skips the file
+
+    def get_rate(self):
+        """Current ``ExchangeRate``. Raises ``RateUnavailable`` if none can be produced."""
+        current = self._memory
+        if current is not None and current.age() < self.ttl:
+            return current
+
+        # Stale, but the file and the refresh were checked within the lease
+        if current is not None and current.age() < self.max_stale and time.monotonic() < self._recheck_at:
+            return current
+
+        # Another worker may already have refreshed the shared file
+        shared = self._read_file()
+        if shared is not None and (current is None or shared.fetched_at > current.fetched_at):
+            self._memory = current = shared
+            if current.age() < self.ttl:
+                return current
+
+        if current is not None and current.age() < self.max_stale:
+            self._recheck_at = time.monotonic() + self.lease_seconds
+            self._refresh_in_background()
+            return current
+
+        return self.refresh()
+
+    def refresh(self):
+        """Fetch from the provider now and update both cache levels."""
+        try:
+            rate = self.provider.fetch()
+        except Exception as e:
+            logger.error(f"Exchange rate refresh via {self.provider.name} failed: {e}")
+            raise RateUnavailable(str(e)) from e
+        fresh = ExchangeRate(rate, time.time(), self.provider.name)
+        self._memory = fresh
+        self._write_file(fresh)
+        logger.info(f"USD->INR rate refreshed: {rate} ({self.provider.name})")
+        return fresh
+
+    def _refresh_in_background(self):
+        with self._lock:
+            if self._refreshing:
+                return
+            self._refreshing = True
+        threading.Thread(target=self._background_refresh, name="fx_refresh", daemon=True).start()
+
+    def _background_refresh(self):
+        try:
+            if not self._acquire_lease():
+                return
+            try:
+                self.refresh()
+            finally:
+                self._release_lease()
+        except RateUnavailable:
+            pass
+        finally:
+            with self._lock:
+                self._refreshing = False
+
+    # --- shared file ---
+    def _read_file(self):
+        try:
+            with open(self.cache_file, 'r', encoding='utf-8') as f:
+                return ExchangeRate.from_dict(json.load(f))
+        except (OSError, ValueError, KeyError, InvalidOperation):
+            return None
+
+    def _write_file(self, exchange_rate):
+        directory = os.path.dirname(self.cache_file) or '.'
+        try:
+            os.makedirs(directory, exist_ok=True)
+            fd, tmp_path = tempfile.mkstemp(dir=directory, prefix='.fx_rate_')
+            with os.fdopen(fd, 'w', encoding='utf-8') as f:
+                json.dump(exchange_rate.as_dict(), f)
+            os.replace(tmp_path, self.cache_file)
+        except OSError as e:
+            logger.warning(f"Could not write exchange rate cache {self.cache_file}: {e}")
+
+    def _lease_path(self):
+        return f"{self.cache_file}.lock"
+
+    def _acquire_lease(self):
+        path = self._lease_path()
+        try:
+            if time.time() - os.path.getmtime(path) > self.lease_seconds:
+                os.remove(path)
+        except OSError:
+            pass
+        try:
+            os.close(os.open(path, os.O_CREAT | os.O_EXCL | os.O_WRONLY))
+            return True
+        except OSError:
+            return False
+
+    def _release_lease(self):
+        try:
+            os.remove(self._lease_path())
+        except OSError:
+            pass
+
+
+def build_provider(name=FX_PROVIDER):
+    if name == 'fake':
+        return FakeRateProvider()
+    if name == 'fixer':
+        return FixerRateProvider(settings.FIXER_API_KEY)
+    raise ValueError(f"Unknown FX provider: {name}")
+
+
+rate_service = ExchangeRateService(build_provider())
+
+
+def get_usd_inr_rate():
+    """Cached USD->INR ``ExchangeRate`` for quoting."""
+    return rate_service.get_rate()
@@ -0,0 +1,10 @@
+from rest_framework import serializers
+
+from .quotes import MAX_QUOTE_BATCH
+
+
+class QuoteBatchSerializer(serializers.Serializer):
+    # Items are parsed to exact Decimals by quotes.quote_batch; DRF only checks the shape
+    amounts_usd = serializers.ListField(min_length=1, max_length=MAX_QUOTE_BATCH)
+    # Signing costs ~15us per quote, so tokens are only issued when asked for
+    with_tokens = serializers.BooleanField(default=False)
@@ -1,3 +1,228 @@
-from django.test import TestCase
+import os
+import tempfile
+import threading
+import time
+from decimal import Decimal
+from unittest import mock
 
-# Create your tests here.
+from django.core import signing
+from django.test import SimpleTestCase
+
+from .quotes import MAX_QUOTE_AMOUNT_USD, QuoteError, quote_batch
+from .rates import ExchangeRate, ExchangeRateService, FakeRateProvider, RateUnavailable
+from .tokens import QuoteTokenError, sign_quote, verify_quote_token
+
+RATE = ExchangeRate(Decimal('87.75'), 0.0, 'test')
+
+
+class QuoteRoundingTests(SimpleTestCase):
+    def quote(self, *amounts):
+        return quote_batch(amounts, RATE)[1]
+
+    def test_each_step_rounds_half_up_to_the_paisa(self):
+        # 10.10 * 87.75 = 886.275 -> 886.28 (a float product rounds it down)
+        self.assertEqual(self.quote('10.10'), [{
+            'amount_usd': '10.10',
+            'amount_inr': '886.28',
+            'commission': '26.59',   # 26.5884
+            'gst': '4.79',           # 4.7862
+            'total_amount': '917.66',
+        }])
+
+    def test_smallest_amount(self):
+        self.assertEqual(self.quote('0.01')[0], {
+            'amount_usd': '0.01',
+            'amount_inr': '0.88',    # 0.8775
+            'commission': '0.03',    # 0.0264
+            'gst': '0.01',           # 0.0054
+            'total_amount': '0.92',
+        })
+
+    def test_floats_are_read_as_written(self):
+        self.assertEqual([row['amount_usd'] for row in self.quote(10.1, 3)], ['10.10', '3.00'])
+
+    def test_totals_add_up_the_rows(self):
+        _, quotes, totals = quote_batch(['10.10', '0.01'], RATE)
+        self.assertEqual(totals, {
+            'amount_usd': '10.11', 'amount_inr': '887.16', 'commission': '26.62',
+            'gst': '4.80', 'total_amount': '918.58',
+        })
+
+    def test_empty_batch(self):
+        _, quotes, totals = quote_batch([], RATE)
+        self.assertEqual(quotes, [])
+        self.assertEqual(totals['total_amount'], '0.00')
+
+    def test_largest_amount_is_quoted_exactly(self):
+        row = self.quote(str(MAX_QUOTE_AMOUNT_USD))[0]
+        self.assertEqual(Decimal(row['amount_inr']), MAX_QUOTE_AMOUNT_USD * RATE.rate)
+
+
+class ParseAmountsTests(SimpleTestCase):
+    def assertRejected(self, amounts, message):
+        with self.assertRaisesMessage(QuoteError, message):
+            quote_batch(amounts, RATE)
+
+    def test_invalid_amounts_name_the_first_bad_index(self):
+        self.assertRejected([1, '1.001'], 'amounts_usd[1]: at most 2 decimal places')
+        self.assertRejected([1, 0], 'amounts_usd[1]: must be greater than zero')
+        self.assertRejected(['abc'], 'amounts_usd[0]: not a number')
+        self.assertRejected([True], 'amounts_usd[0]: not a number')
+        self.assertRejected(['NaN'], 'amounts_usd[0]: must be greater than zero')
+
+    def test_amounts_above_the_maximum_are_rejected(self):
+        self.assertRejected([1, 1e25], 'amounts_usd[1]: must be at most')
+        self.assertRejected([MAX_QUOTE_AMOUNT_USD + Decimal('0.01')], 'amounts_usd[0]: must be at most')
+
+
+class QuoteTokenTests(SimpleTestCase):
+    ROW = {
+        'amount_usd': '10.10', 'amount_inr': '886.28', 'commission': '26.59',
+        'gst': '4.79', 'total_amount': '917.66',
+    }
+
+    def test_round_trip(self):
+        quote = verify_quote_token(sign_quote(self.ROW, RATE.rate))
+        self.assertEqual(quote['total_amount'], Decimal('917.66'))
+        self.assertEqual(quote['rate'], Decimal('87.75'))
+
+    def test_tampered_amount_is_rejected(self):
+        token = sign_quote(self.ROW, RATE.rate)
+        signer = signing.TimestampSigner(salt='usd.quote')
+        _, timestamp, signature = token.rsplit(':', 2)
+        forged = signing.TimestampSigner(salt='usd.quote', key='not-the-secret').sign_object(
+            [*self.ROW.values()][:-1] + ['1.00', '87.75']
+        )
+        for bad in (
+            f"{forged.rsplit(':', 2)[0]}:{timestamp}:{signature}",   # other payload, original signature
+            forged,                                                   # signed with another key
+            token[:-1] + ('A' if token[-1] != 'A' else 'B'),          # signature altered
+            signer.sign_object(['917.66']),                           # wrong shape
+            'garbage',
+        ):
+            with self.assertRaisesMessage(QuoteTokenError, 'Invalid quote token'):
+                verify_quote_token(bad)
+
+    def test_expired_token_is_rejected(self):
+        token = sign_quote(self.ROW, RATE.rate)
+        with mock.patch('time.time', return_value=time.time() + 61):
+            with self.assertRaisesMessage(QuoteTokenError, 'expired'):
+                verify_quote_token(token, max_age=60)
+
+
+class BlockingProvider(FakeRateProvider):
+    """Fake provider whose fetch waits for ``release`` (a background refresh in flight)."""
+
+    def __init__(self, rate='88.00'):
+        super().__init__(rate)
+        self.release = threading.Event()
+        self.fetched = threading.Event()
+
+    def fetch(self):
+        self.release.wait(5)
+        rate = super().fetch()
+        self.fetched.set()
+        return rate
+
+
+class FailingProvider:
+    name = 'failing'
+
+    def fetch(self):
+        raise ConnectionError('fixer down')
+
+
+class RateServiceTests(SimpleTestCase):
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.cache_file = os.path.join(directory.name, 'fx_rate.json')
+
+    def service(self, provider, **kwargs):
+        return ExchangeRateService(provider, ttl=60, max_stale=600, cache_file=self.cache_file, **kwargs)
+
+    def stale_rate(self, age=120):
+        return ExchangeRate(Decimal('87.00'), time.time() - age, 'fake')
+
+    def wait_for_refresh(self, service):
+        deadline = time.monotonic() + 5
+        while service._refreshing:
+            self.assertLess(time.monotonic(), deadline, 'background refresh did not finish')
+            time.sleep(0.01)
+
+    def test_fresh_rate_is_served_from_memory(self):
+        provider = FakeRateProvider()
+        service = self.service(provider)
+        service.get_rate()
+
+        with mock.patch.object(service, '_read_file') as read_file:
+            self.assertEqual(service.get_rate().rate, Decimal('87.75'))
+
+        read_file.assert_not_called()
+        self.assertEqual(provider.calls, 1)
+
+    def test_workers_share_the_file_cache(self):
+        self.service(FakeRateProvider('88.10')).get_rate()
+        provider = FakeRateProvider()
+
+        rate = self.service(provider).get_rate()
+
+        self.assertEqual((rate.rate, rate.source), (Decimal('88.10'), 'fake'))
+        self.assertEqual(provider.calls, 0)
+
+    def test_stale_rate_is_served_while_one_background_refresh_runs(self):
+        provider = BlockingProvider()
+        service = self.service(provider)
+        service._memory = self.stale_rate()
+
+        served = [service.get_rate().rate for _ in range(3)]
+        self.assertEqual(served, [Decimal('87.00')] * 3)
+
+        provider.release.set()
+        self.wait_for_refresh(service)
+        self.assertEqual(provider.calls, 1)
+        self.assertEqual(service.get_rate().rate, Decimal('88.00'))
+        self.assertEqual(service._read_file().rate, Decimal('88.00'))
+
+    def test_stale_rate_rechecks_the_file_only_after_the_lease(self):
+        # Another worker holds the refresh lease
+        open(f"{self.cache_file}.lock", 'w').close()
+        provider = FakeRateProvider('88.00')
+        service = self.service(provider, lease_seconds=0.2)
+        service._memory = self.stale_rate()
+
+        with mock.patch.object(service, '_read_file', wraps=service._read_file) as read_file:
+            for _ in range(5):
+                self.assertEqual(service.get_rate().rate, Decimal('87.00'))
+            self.wait_for_refresh(service)
+            self.assertEqual(read_file.call_count, 1)
+            self.assertEqual(provider.calls, 0)
+
+            # The other worker's lease ran out without a refresh: this one takes over
+            time.sleep(0.25)
+            service.get_rate()
+            self.wait_for_refresh(service)
+
+        self.assertEqual(read_file.call_count, 2)
+        self.assertEqual(provider.calls, 1)
+        self.assertEqual(service.get_rate().rate, Decimal('88.00'))
+        self.assertFalse(os.path.exists(f"{self.cache_file}.lock"))
+
+    def test_stale_rate_picks_up_another_workers_refresh(self):
+        service = self.service(FailingProvider())
+        service._memory = self.stale_rate()
+        self.service(FakeRateProvider('88.20')).refresh()
+
+        self.assertEqual(service.get_rate().rate, Decimal('88.20'))
+
+    def test_rate_past_max_stale_is_refreshed_synchronously(self):
+        provider = FakeRateProvider('88.00')
+        service = self.service(provider)
+        service._memory = self.stale_rate(age=601)
+
+        self.assertEqual(service.get_rate().rate, Decimal('88.00'))
+        self.assertEqual(provider.calls, 1)
+
+    def test_nothing_cached_and_provider_down_is_unavailable(self):
+        with self.assertRaises(RateUnavailable):
+            self.service(FailingProvider()).get_rate()
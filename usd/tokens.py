@@ -0,0 +1,47 @@
+from decimal import Decimal, InvalidOperation
+
+from django.conf import settings
+from django.core import signing
+
+from .quotes import QUOTE_FIELDS
+
+# === Quote token configuration ===
+QUOTE_TOKEN_TTL = getattr(settings, 'QUOTE_TOKEN_TTL', 15 * 60)
+QUOTE_TOKEN_SALT = 'usd.quote'
+
+_signer = signing.TimestampSigner(salt=QUOTE_TOKEN_SALT)
+
+
+class QuoteTokenError(ValueError):
+    """A quote token is malformed, tampered with or expired."""
+
+
+def sign_quote(row, rate):
+    """
+    Compact signed token for one quote row (``format_quotes`` output) and its rate.
+
+    The payload is positional (QUOTE_FIELDS order, then the rate) to keep the
+    token short; the signer adds a timestamp that bounds its lifetime.
+    """
+    return _signer.sign_object([*(row[field] for field in QUOTE_FIELDS), str(rate)])
+
+
+def verify_quote_token(token, max_age=QUOTE_TOKEN_TTL):
+    """
+    Check a quote token with one HMAC and return its breakdown as Decimals,
+    keyed like PaymentSerializer, plus ``rate``. No database or FX lookups.
+    """
+    try:
+        values = _signer.unsign_object(token, max_age=max_age)
+    except signing.SignatureExpired:
+        raise QuoteTokenError("Quote has expired, please request a new one")
+    except (signing.BadSignature, ValueError):
+        raise QuoteTokenError("Invalid quote token")
+
+    if not isinstance(values, list) or len(values) != len(QUOTE_FIELDS) + 1:
+        raise QuoteTokenError("Invalid quote token")
+    try:
+        amounts = [Decimal(value) for value in values]
+    except (InvalidOperation, TypeError):
+        raise QuoteTokenError("Invalid quote token")
+    return dict(zip((*QUOTE_FIELDS, 'rate'), amounts))
@@ -0,0 +1,8 @@
+from django.urls import path, re_path
+from .views import ExchangeRateAPIView, QuoteBatchAPIView
+
+urlpatterns = [
+    path('exchange-rate/', ExchangeRateAPIView.as_view(), name='exchange-rate'),
+    # Accept both /quotes/batch and /quotes/batch/ (a POST can't follow APPEND_SLASH redirects)
+    re_path(r'^quotes/batch/?$', QuoteBatchAPIView.as_view(), name='quote-batch'),
+]
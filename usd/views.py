@@ -1,3 +1,73 @@
-from django.shortcuts import render
+from datetime import datetime, timezone
 
-# Create your views here.
+from rest_framework.views import APIView
+from rest_framework.response import Response
+from rest_framework import status
+
+from .quotes import QuoteError, quote_batch
+from .rates import RateUnavailable, rate_service
+from .serializers import QuoteBatchSerializer
+from .tokens import QUOTE_TOKEN_TTL, sign_quote
+
+
+def _rate_details(exchange_rate):
+    return {
+        "rate": str(exchange_rate.rate),
+        "source": exchange_rate.source,
+        "fetched_at": datetime.fromtimestamp(exchange_rate.fetched_at, tz=timezone.utc).isoformat(),
+        "stale": exchange_rate.age() >= rate_service.ttl,
+    }
+
+
+class ExchangeRateAPIView(APIView):
+    """
+    Current server-side USD->INR rate (cached; never blocks on Fixer while a value is cached)
+    """
+    def get(self, request):
+        try:
+            exchange_rate = rate_service.get_rate()
+        except RateUnavailable as e:
+            return Response(
+                {"error": "Exchange rate unavailable", "details": str(e)},
+                status=status.HTTP_503_SERVICE_UNAVAILABLE
+            )
+
+        return Response({
+            "base": "USD",
+            "quote": "INR",
+            **_rate_details(exchange_rate),
+        }, status=status.HTTP_200_OK)
+
+
+class QuoteBatchAPIView(APIView):
+    """
+    Price many USD amounts at once: INR amount, platform fee, GST and total for each
+    """
+    def post(self, request):
+        serializer = QuoteBatchSerializer(data=request.data)
+        if not serializer.is_valid():
+            return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+
+        try:
+            exchange_rate, quotes, totals = quote_batch(serializer.validated_data['amounts_usd'])
+        except QuoteError as e:
+            return Response({"amounts_usd": [str(e)]}, status=status.HTTP_400_BAD_REQUEST)
+        except RateUnavailable as e:
+            return Response(
+                {"error": "Exchange rate unavailable", "details": str(e)},
+                status=status.HTTP_503_SERVICE_UNAVAILABLE
+            )
+
+        response_data = {
+            **_rate_details(exchange_rate),
+            "count": len(quotes),
+            "quotes": quotes,
+            "totals": totals,
+        }
+        if serializer.validated_data['with_tokens']:
+            # Clients pass quote_token to create-payment instead of the amounts
+            for quote in quotes:
+                quote["quote_token"] = sign_quote(quote, exchange_rate.rate)
+            response_data["quote_expires_in"] = QUOTE_TOKEN_TTL
+
+        return Response(response_data, status=status.HTTP_200_OK)